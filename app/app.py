@@ -1,11 +1,28 @@
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from app.routes.web_routes import router as web_router
 from app.routes.api_routes import router as api_router
+from app.services.job_service import get_job_service
 
-app = FastAPI(title="Категории из JSON")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Схема базы создаётся и мигрирует один раз при запуске, а не перед каждым обходом.
+    # Без неё запись, фильтры и статистика не работают, поэтому ошибка останавливает запуск
+    try:
+        get_job_service().parsing_service.db_manager.create_tables()
+    except Exception as e:
+        print(f"Ошибка при подготовке базы данных: {e}")
+        raise
+    yield
+    # Останавливаем фоновые задачи парсинга вместе с приложением
+    get_job_service().shutdown()
+
+
+app = FastAPI(title="Категории из JSON", lifespan=lifespan)
 templates = Jinja2Templates(directory="app/templates")
 
 # Подключаем статику
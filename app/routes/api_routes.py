@@ -1,10 +1,19 @@
-from fastapi import APIRouter, HTTPException
-from fastapi import APIRouter
+import csv
+import io
+import json
+from itertools import chain
+from typing import Iterator, List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from config.settings import Config
+from database.models import Product, ProductFilter
 from app.services.category_service import CategoryService
+from app.services.job_service import get_job_service
 
 router = APIRouter()
 
 category_service = CategoryService()
+job_service = get_job_service()
 
 
 @router.get("/categories/{parent_id}")
@@ -13,4 +22,139 @@ def get_children(parent_id: int):
     children_list = category_service.get_children(parent_id)
     if not children_list and not category_service.get_category(parent_id):
         raise HTTPException(404, detail="Категория не найдена")
-    return [{"id": ch.id, "name": ch.name} for ch in children_list]
\ No newline at end of file
+    return [{"id": ch.id, "name": ch.name} for ch in children_list]
+
+
+def category_params(shard: Optional[str] = None, query: Optional[str] = None,
+                    category_id: Optional[int] = None) -> Tuple[Optional[str], Optional[str]]:
+    """Категория из параметров запроса: shard и query либо category_id из дерева категорий."""
+    if category_id is not None:
+        category = category_service.get_category(category_id)
+        if category is None:
+            raise HTTPException(404, detail="Категория не найдена")
+        return category.shard, category.query
+    return shard, query
+
+
+def product_filter(category: Tuple[Optional[str], Optional[str]] = Depends(category_params),
+                   min_price: Optional[float] = None, max_price: Optional[float] = None,
+                   min_rating: Optional[float] = None, max_rating: Optional[float] = None) -> ProductFilter:
+    """Условия отбора товаров из параметров запроса."""
+    shard, query = category
+    return ProductFilter(shard, query, min_price, max_price, min_rating, max_rating)
+
+
+def stats_category(category: Tuple[Optional[str], Optional[str]] = Depends(category_params)) -> Tuple[str, str]:
+    """Категория для статистики: нужны и shard, и query."""
+    shard, query = category
+    if not shard or not query:
+        raise HTTPException(400, detail="Укажите shard и query или category_id")
+    return shard, query
+
+
+@router.get("/products")
+def list_products(cursor: Optional[int] = None, limit: Optional[int] = Query(None, ge=1),
+                  filters: ProductFilter = Depends(product_filter)):
+    """API для постраничного списка товаров (next_cursor передаётся в cursor следующего запроса)."""
+    limit = min(limit or Config.STORAGE_CONFIG['page_size'], Config.STORAGE_CONFIG['max_page_size'])
+    page = job_service.parsing_service.get_products_page(cursor, limit, filters)
+    return {
+        "items": [product.to_dict() for product in page.products],
+        "next_cursor": page.next_cursor
+    }
+
+
+@router.get("/products/export")
+def export_products(format: str = Query('ndjson', pattern='^(ndjson|csv)$'),
+                    limit: Optional[int] = Query(None, ge=1),
+                    filters: ProductFilter = Depends(product_filter)):
+    """API для выгрузки товаров в NDJSON или CSV потоком из серверного курсора."""
+    chunks = job_service.parsing_service.repository.iter_products(filters, limit)
+    try:
+        # Первая порция читается сразу, чтобы ошибка запроса вернулась кодом ответа
+        first = next(chunks, [])
+    except ValueError as e:
+        raise HTTPException(400, detail=str(e))
+
+    rows = chain([first], chunks)
+    if format == 'csv':
+        return StreamingResponse(_csv_lines(rows), media_type='text/csv; charset=utf-8',
+                                 headers={'Content-Disposition': 'attachment; filename="products.csv"'})
+    return StreamingResponse(_ndjson_lines(rows), media_type='application/x-ndjson')
+
+
+def _ndjson_lines(chunks: Iterator[List[Product]]) -> Iterator[str]:
+    """Порции товаров в виде строк NDJSON, по одному блоку на порцию"""
+    for products in chunks:
+        if products:
+            yield ''.join(json.dumps(product.to_dict(), ensure_ascii=False) + '\n' for product in products)
+
+
+def _csv_lines(chunks: Iterator[List[Product]]) -> Iterator[str]:
+    """Порции товаров в виде CSV с заголовком"""
+    fieldnames = list(Product.__dataclass_fields__)
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+    writer.writeheader()
+    for products in chunks:
+        writer.writerows(product.to_dict() for product in products)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+@router.get("/stats/summary")
+def stats_summary(category: Tuple[str, str] = Depends(stats_category)):
+    """API для сводки по категории: перцентили цены, скидка, рейтинг."""
+    summary = job_service.parsing_service.repository.stats.get_summary(*category)
+    if summary is None:
+        raise HTTPException(404, detail="Статистика категории ещё не посчитана")
+    return summary
+
+
+@router.get("/stats/histogram")
+def stats_histogram(metric: str = Query('price', pattern='^(price|discount|rating)$'),
+                    category: Tuple[str, str] = Depends(stats_category)):
+    """API для гистограммы цены, глубины скидки или рейтинга в категории."""
+    return job_service.parsing_service.repository.stats.get_histogram(*category, metric)
+
+
+@router.get("/stats/top")
+def stats_top(limit: int = Query(10, ge=1, le=Config.STATS_CONFIG['top_n']),
+              category: Tuple[str, str] = Depends(stats_category)):
+    """API для товаров категории с наибольшим числом отзывов."""
+    return job_service.parsing_service.repository.stats.get_top_reviewed(*category, limit)
+
+
+@router.post("/stats/refresh")
+def stats_refresh(category: Tuple[str, str] = Depends(stats_category)):
+    """API для пересчёта статистики категории без нового обхода."""
+    if not job_service.parsing_service.refresh_stats(*category):
+        raise HTTPException(500, detail="Не удалось пересчитать статистику")
+    return job_service.parsing_service.repository.stats.get_summary(*category)
+
+
+@router.get("/jobs")
+def list_jobs():
+    """API для списка фоновых задач парсинга."""
+    return [job.to_dict() for job in job_service.list_jobs()]
+
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """API для прогресса задачи парсинга."""
+    job = job_service.get(job_id)
+    if job is None:
+        raise HTTPException(404, detail="Задача не найдена")
+    return job.to_dict()
+
+
+@router.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    """API для отмены задачи парсинга."""
+    job = job_service.cancel(job_id)
+    if job is None:
+        raise HTTPException(404, detail="Задача не найдена")
+    return job.to_dict()
@@ -2,20 +2,25 @@ from fastapi import APIRouter, Request, Form
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from typing import Optional
+from urllib.parse import urlencode
 from app.services.category_service import CategoryService
 from app.services.update_service import UpdateService
-from app.services.parsing_service import ParsingService
+from app.services.job_service import get_job_service
+from database.models import ProductFilter
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
 category_service = CategoryService()
 update_service = UpdateService()
-parsing_service = ParsingService()
+job_service = get_job_service()
+parsing_service = job_service.parsing_service
 
 
 @router.get("/", response_class=HTMLResponse)
 async def index(request: Request, selected_path: Optional[str] = None, update_status: Optional[str] = None,
-                parsing_status: Optional[str] = None, error_message: Optional[str] = None):
+                parsing_status: Optional[str] = None, error_message: Optional[str] = None,
+                job_id: Optional[str] = None, cursor: Optional[int] = None,
+                shard: Optional[str] = None, query: Optional[str] = None):
     """Главная страница с выбором категорий."""
     context = category_service.build_page_context(request, selected_path, update_status)
 
@@ -23,13 +28,20 @@ async def index(request: Request, selected_path: Optional[str] = None, update_st
     if parsing_status:
         context.update({
             'parsing_status': parsing_status,
-            'error_message': error_message
+            'error_message': error_message,
+            'job_id': job_id
         })
 
-    # Если есть данные о товарах, добавляем их
+    # Если есть данные о товарах, добавляем одну страницу спарсенной категории:
+    # её получение по индексу (shard, query_params, id) не зависит от размера таблицы
     if parsing_status == 'success':
-        products = parsing_service.get_latest_products()
-        context['products'] = products
+        filters = ProductFilter(shard, query) if shard and query else None
+        page = parsing_service.get_products_page(cursor, filters=filters)
+        context['products'] = page.products
+        if page.next_cursor is not None:
+            params = dict(request.query_params)
+            params['cursor'] = page.next_cursor
+            context['next_page_url'] = f"/?{urlencode(params)}"
 
     return templates.TemplateResponse("index.html", context)
 
@@ -81,13 +93,9 @@ async def parse_products(
         if category_name:
             parsing_service.debug_category_search(category_name)
 
-        # Запускаем парсинг
-        success = await parsing_service.parse_category_products(category_url, category_name, max_pages)
-
-        if success:
-            redirect_url = f"/?selected_path={selected_path}&parsing_status=success"
-        else:
-            redirect_url = f"/?selected_path={selected_path}&parsing_status=error&error_message=Не удалось получить данные. Проверьте параметры категории."
+        # Ставим парсинг в очередь фоновых задач; прогресс страница получает через /api/jobs
+        job = job_service.submit(category_url, category_name, max_pages)
+        redirect_url = f"/?selected_path={selected_path}&parsing_status=processing&job_id={job.id}"
 
     except Exception as e:
         print(f"Ошибка в parse_products: {e}")
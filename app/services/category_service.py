@@ -1,18 +1,20 @@
 from typing import Optional, Dict, Any, List
 from fastapi import Request
-from app.utils.category_tree_loader import CategoryTreeLoader
+from app.utils.category_tree_loader import CategoryTreeLoader, get_category_tree, reload_category_tree
 from app.utils.helpers import get_level_name
 
 
 class CategoryService:
     """Сервис для работы с категориями."""
 
-    def __init__(self):
-        self.tree_loader = CategoryTreeLoader()
+    @property
+    def tree_loader(self) -> CategoryTreeLoader:
+        """Общее для процесса дерево категорий."""
+        return get_category_tree()
 
     def reload_data(self):
         """Перезагружает данные о категориях."""
-        self.tree_loader = CategoryTreeLoader()
+        reload_category_tree()
 
     def get_category(self, category_id: int):
         """Получает категорию по ID."""
@@ -52,29 +54,33 @@ class CategoryService:
             "category_path": []
         }
 
+        # Берём одно дерево на весь запрос и ищем каждую категорию один раз
+        tree = self.tree_loader
+        categories = {cat_id: tree.get_category(cat_id) for cat_id in path_ids}
+
         # Формируем путь с именами категорий для отображения
         for cat_id in path_ids:
-            category = self.get_category(cat_id)
+            category = categories[cat_id]
             if category:
                 context["category_path"].append({"id": cat_id, "name": category.name})
 
         # Строим уровни категорий
         for i, cat_id in enumerate(path_ids):
-            category = self.get_category(cat_id)
+            category = categories[cat_id]
             if category:
                 if i == 0:
                     # Первый уровень - корневые категории
                     context["category_levels"].append({
                         "level": i + 1,
                         "level_name": get_level_name(i + 1),
-                        "categories": self.get_root_categories(),
+                        "categories": tree.get_root_categories(),
                         "selected": cat_id
                     })
                 else:
                     # Следующие уровни - дети предыдущего
                     parent_id = path_ids[i - 1]
-                    parent_category = self.get_category(parent_id)
-                    children = self.get_children(parent_id)
+                    parent_category = categories[parent_id]
+                    children = parent_category.children if parent_category else ()
                     if children:
                         context["category_levels"].append({
                             "level": i + 1,
@@ -85,7 +91,7 @@ class CategoryService:
 
                 # Добавляем следующий уровень если есть дети
                 if i == len(path_ids) - 1:  # Последний элемент в пути
-                    children = self.get_children(cat_id)
+                    children = category.children
                     if children:
                         context["category_levels"].append({
                             "level": i + 2,
@@ -0,0 +1,212 @@
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from config.settings import Config
+from app.services.parsing_service import ParsingService
+
+# Состояния задачи
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCESS = 'success'
+ERROR = 'error'
+CANCELLED = 'cancelled'
+FINISHED_STATUSES = (SUCCESS, ERROR, CANCELLED)
+
+
+@dataclass
+class CrawlJob:
+    """Фоновая задача парсинга категории и её прогресс"""
+    id: str
+    category_url: str
+    category_name: str
+    max_pages: Optional[int]
+    total_pages: Optional[int] = None  # Страниц в этом запуске, когда известна последняя страница
+    shard: Optional[str] = None  # Параметры категории, известные после её поиска в дереве
+    query: Optional[str] = None
+    status: str = QUEUED
+    pages_done: int = 0
+    products_parsed: int = 0
+    products_saved: int = 0
+    errors: int = 0
+    error_message: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def record_page(self, products: int, errors: int) -> None:
+        """Получена очередная страница с products товарами"""
+        self.pages_done += 1
+        self.products_parsed += products
+        self.errors = errors
+
+    def record_saved(self, written: int) -> None:
+        """Запись подтвердила сохранение written товаров"""
+        self.products_saved = written
+
+    def eta(self) -> Optional[float]:
+        """Оценка оставшегося времени в секундах по средней скорости обхода страниц"""
+        total = self.total_pages or self.max_pages
+        if self.status != RUNNING or not total or not self.pages_done or not self.started_at:
+            return None
+        elapsed = time.time() - self.started_at
+        remaining = max(total - self.pages_done, 0)
+        return round(elapsed / self.pages_done * remaining, 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'category_url': self.category_url,
+            'category_name': self.category_name,
+            'max_pages': self.max_pages,
+            'total_pages': self.total_pages,
+            'shard': self.shard,
+            'query': self.query,
+            'status': self.status,
+            'pages_done': self.pages_done,
+            'products_parsed': self.products_parsed,
+            'products_saved': self.products_saved,
+            'errors': self.errors,
+            'error_message': self.error_message,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'eta_seconds': self.eta(),
+            'cancel_requested': self.cancel_requested
+        }
+
+
+class JobService:
+    """Очередь фоновых задач парсинга с ограниченным пулом рабочих потоков.
+
+    Каждая задача выполняется в своём потоке со своим циклом событий, поэтому
+    долгий обход не блокирует веб-сервер. Отмена выставляет флаг, по которому
+    обход прерывает и ожидание текущей страницы (повторы, паузы ограничителя
+    запросов): уже полученные товары сохраняются, а контрольная точка
+    позволяет продолжить обход позже.
+    """
+
+    def __init__(self, parsing_service: Optional[ParsingService] = None,
+                 max_workers: Optional[int] = None, history_size: Optional[int] = None):
+        config = Config.JOB_CONFIG
+        self.parsing_service = parsing_service or ParsingService()
+        self.history_size = history_size or config['history_size']
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or config['max_workers'],
+                                            thread_name_prefix='crawl-job')
+        self._jobs: 'OrderedDict[str, CrawlJob]' = OrderedDict()
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, category_url: str, category_name: str, max_pages: Optional[int] = 3) -> CrawlJob:
+        """Ставит парсинг категории в очередь и сразу возвращает задачу.
+
+        Если эта категория уже парсится или ждёт очереди, возвращается
+        существующая задача: два обхода одной категории мешали бы друг другу.
+        Категория сравнивается по найденным (shard, query), так как разные
+        ссылки меню могут вести в одну категорию.
+        """
+        shard, query = self.parsing_service.get_category_params(category_url, category_name)
+        resolved = (shard, query) if shard and query else None
+        with self._lock:
+            for job in self._jobs.values():
+                if job.finished:
+                    continue
+                if job.category_url == category_url or (resolved and (job.shard, job.query) == resolved):
+                    return job
+
+            job = CrawlJob(uuid.uuid4().hex, category_url, category_name, max_pages, shard=shard, query=query)
+            self._jobs[job.id] = job
+            self._futures[job.id] = self._executor.submit(self._run, job)
+            self._prune()
+        print(f"Задача {job.id} поставлена в очередь: '{category_name}'")
+        return job
+
+    def get(self, job_id: str) -> Optional[CrawlJob]:
+        return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[CrawlJob]:
+        """Задачи, начиная с самых новых"""
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def cancel(self, job_id: str) -> Optional[CrawlJob]:
+        """Отменяет задачу: ожидающая снимается с очереди, выполняющаяся
+        прерывает обход, не дожидаясь ответа на текущий запрос"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return job
+            job.cancel_event.set()
+            future = self._futures.get(job_id)
+            if future is not None and future.cancel():
+                self._finish(job, CANCELLED)
+        print(f"Запрошена отмена задачи {job_id}")
+        return job
+
+    def shutdown(self) -> None:
+        """Отменяет все задачи и останавливает пул (при остановке приложения)"""
+        for job in self.list_jobs():
+            self.cancel(job.id)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job: CrawlJob) -> None:
+        """Выполняет задачу в рабочем потоке"""
+        if job.cancel_requested:
+            self._finish(job, CANCELLED)
+            return
+        job.status = RUNNING
+        job.started_at = time.time()
+        try:
+            success = asyncio.run(self.parsing_service.parse_category_products(
+                job.category_url, job.category_name, job.max_pages, job=job))
+        except Exception as e:
+            print(f"Ошибка в задаче {job.id}: {e}")
+            job.error_message = str(e)
+            success = False
+
+        if job.cancel_requested:
+            self._finish(job, CANCELLED)
+        elif success:
+            self._finish(job, SUCCESS)
+        else:
+            job.error_message = job.error_message or "Не удалось получить данные. Проверьте параметры категории."
+            self._finish(job, ERROR)
+
+    def _finish(self, job: CrawlJob, status: str) -> None:
+        job.status = status
+        job.finished_at = time.time()
+        self._futures.pop(job.id, None)
+        print(f"Задача {job.id} завершена: {status}")
+
+    def _prune(self) -> None:
+        """Удаляет самые старые завершённые задачи сверх history_size"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(len(finished) - self.history_size, 0)]:
+            del self._jobs[job_id]
+
+
+_job_service: Optional[JobService] = None
+_job_service_lock = threading.Lock()
+
+
+def get_job_service() -> JobService:
+    """Общая для процесса очередь задач парсинга"""
+    global _job_service
+    if _job_service is None:
+        with _job_service_lock:
+            if _job_service is None:
+                _job_service = JobService()
+    return _job_service
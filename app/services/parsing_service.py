@@ -2,7 +2,7 @@ import asyncio
 import re
 import sys
 import os
-from typing import List, Optional, Tuple
+from typing import List, Optional, Tuple, TYPE_CHECKING
 from urllib.parse import urlparse, parse_qs
 
 # Добавляем корневую папку проекта в путь для импортов
@@ -10,16 +10,27 @@ project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(_
 sys.path.insert(0, project_root)
 
 from database.connection import DatabaseManager
-from database.models import ProductRepository, Product
-from parsing.wb_parser import WBParser
-from app.utils.category_tree_loader import CategoryTreeLoader
+from database.models import ProductRepository, ProductBatchWriter, Product, ProductPage, ProductFilter
+from parsing.wb_parser import WBParser, wait_unless_cancelled
+from parsing.crawl_checkpoint import CheckpointStore
+from app.utils.category_tree_loader import CategoryTreeLoader, get_category_tree
+
+if TYPE_CHECKING:
+    from app.services.job_service import CrawlJob
 
 
 class ParsingService:
+    MAX_CATEGORY_PAGES = 500  # Граница поиска последней страницы при обходе без лимита
+
     def __init__(self):
         self.db_manager = DatabaseManager()
         self.repository = ProductRepository(self.db_manager)
-        self.tree_loader = CategoryTreeLoader()
+        self.checkpoints = CheckpointStore()
+
+    @property
+    def tree_loader(self) -> CategoryTreeLoader:
+        """Общее для процесса дерево категорий."""
+        return get_category_tree()
 
     def find_category_by_id(self, category_id: int) -> Optional[any]:
         """Находит категорию по ID в дереве."""
@@ -47,11 +58,9 @@ class ParsingService:
                 # Метод 3: Поиск по имени категории
                 if category_name:
                     print(f"Ищем по имени категории: {category_name}")
-                    for cat_id, cat_node in self.tree_loader.cat_index.items():
-                        if cat_node.name.lower() == category_name.lower():
-                            category = cat_node
-                            print(f"Найдена категория по имени: {cat_node.name}")
-                            break
+                    category = self.tree_loader.find_category_by_name(category_name)
+                    if category:
+                        print(f"Найдена категория по имени: {category.name}")
 
             if not category:
                 # Метод 4: Поиск по частичному совпадению URL
@@ -169,43 +178,103 @@ class ParsingService:
         print(f"Тестовый URL: {test_url}")
         return test_url
 
-    async def parse_category_products(self, category_url: str, category_name: str, max_pages: int = 3) -> bool:
-        """Запускает парсинг товаров для выбранной категории."""
+    async def parse_category_products(self, category_url: str, category_name: str, max_pages: int = 3,
+                                      job: Optional['CrawlJob'] = None) -> bool:
+        """Запускает парсинг товаров для выбранной категории.
+
+        С job прогресс обхода передаётся в фоновую задачу, а её отмена
+        прерывает обход, в том числе ожидание повторов и пауз ограничителя запросов.
+        """
         try:
             print(f"Начинаем парсинг категории '{category_name}'")
             print(f"URL: {category_url}")
 
-            # Получаем параметры категории
-            shard, query = self.get_category_params(category_url, category_name)
+            # Получаем параметры категории; задача находит их ещё при постановке в очередь
+            if job and job.shard and job.query:
+                shard, query = job.shard, job.query
+            else:
+                shard, query = self.get_category_params(category_url, category_name)
 
             if not shard or not query:
                 print("Не удалось получить параметры для парсинга")
                 return False
 
+            if job:
+                job.shard, job.query = shard, query
             print(f"Используем параметры: shard='{shard}', query='{query}'")
             print(f"Максимум страниц: {max_pages}")
 
             # Создаем тестовый URL для проверки
             test_url = self.test_parser_url(shard, query)
 
-            # Создаем парсер
-            parser = WBParser(shard, query)
+            # Создаем парсер; страницы разбираются сразу в столбцы для записи в базу
+            parser = WBParser(shard, query, columnar=True)
 
             try:
-                # Создаем таблицы если их нет
-                self.db_manager.create_tables()
-
-                # Парсим данные (асинхронно в отдельном потоке чтобы не блокировать UI)
-                products = await asyncio.get_event_loop().run_in_executor(
-                    None,
-                    lambda: parser.parse_all_pages(
+                # Таблицы создаются при запуске приложения; здесь только
+                # добавляются секции истории цен, если начался новый месяц
+                self.db_manager.price_history.ensure_partitions()
+
+                # Прерванный обход продолжается с контрольной точки. Таблица не
+                # очищается: товары обновляются по артикулу, повторный обход
+                # меняет только изменившиеся строки
+                checkpoint, resumed = self.checkpoints.resume_or_start(shard, query)
+                if resumed and checkpoint.completed_pages:
+                    print(f"Продолжаем прерванный обход со страницы {checkpoint.start_page}, "
+                          f"повторяем страницы с ошибками: {checkpoint.retry_pages}")
+                # max_pages - число страниц этого запуска, а лимит парсера - номер последней страницы
+                page_limit = checkpoint.last_page + max_pages if max_pages else None
+
+                # Ограничиваем обход последней страницей категории: её номер берётся из
+                # общего числа товаров в ответе или находится поиском, а загруженные
+                # при этом страницы обход берёт без повторного запроса
+                cancel = job.cancel_event if job else None
+                max_check = page_limit or self.MAX_CATEGORY_PAGES
+                probe = asyncio.ensure_future(
+                    asyncio.to_thread(parser.find_last_page, checkpoint.start_page, max_check, cancel=cancel))
+                if not await wait_unless_cancelled(probe, cancel):
+                    print("Парсинг отменён")
+                    return False
+                last_page = probe.result()
+                if last_page < max_check:
+                    page_limit = last_page
+                if job and page_limit:
+                    # Прогресс и оценка времени - по числу страниц, которые действительно будут обойдены
+                    job.total_pages = len(checkpoint.retry_pages) + max(page_limit - checkpoint.last_page, 0)
+
+                def save_checkpoint(written: int) -> None:
+                    checkpoint.rows_written(written)
+                    self.checkpoints.save(checkpoint)
+                    if job:
+                        job.record_saved(written)
+
+                # Парсим данные асинхронно в общем цикле событий, не занимая поток,
+                # и сохраняем их пачками по мере получения страниц
+                with ProductBatchWriter(self.repository, on_write=save_checkpoint) as writer:
+                    pages = parser.iter_pages_async(
                         delay=0.5,
                         skip_errors=True,
-                        max_pages=max_pages
+                        max_pages=page_limit,
+                        checkpoint=checkpoint,
+                        cancel=cancel
                     )
-                )
-
-                if not products:
+                    try:
+                        async for products in pages:
+                            writer.add(products)
+                            if job:
+                                job.record_page(len(products), len(parser.error_pages))
+                                if job.cancel_requested:
+                                    print("Парсинг отменён")
+                                    break
+                    finally:
+                        # Останавливаем запросы, ещё выполняющиеся в обходе
+                        await pages.aclose()
+                save_checkpoint(writer.count)
+
+                if writer.count:
+                    self.refresh_stats(shard, query)
+
+                if not writer.count and not checkpoint.completed_pages:
                     print("Не удалось получить товары")
                     print("Возможные причины:")
                     print("1. Неправильные параметры shard/query")
@@ -213,111 +282,25 @@ class ParsingService:
                     print("3. Проблемы с доступом к API")
                     return False
 
-                # Сохраняем в базу данных
-                self.repository.save_products(products, if_exists='replace')
-
-                print(f"Успешно спарсено и сохранено {len(products)} товаров")
+                print(f"Успешно спарсено и сохранено {writer.count} товаров")
                 return True
 
             finally:
-                parser.close()
+                await parser.aclose()
 
         except Exception as e:
             print(f"Ошибка при парсинге: {e}")
+            if job:
+                # Причина сбоя видна в статусе задачи (/api/jobs/{id})
+                job.error_message = str(e)
             return False
 
     def get_latest_products(self, limit: int = None) -> List[Product]:
         """Получает последние спарсенные товары из базы данных."""
         try:
-            with self.db_manager.get_connection() as conn:
-                with conn.cursor() as cur:
-                    # Сначала проверяем структуру таблицы
-                    cur.execute("""
-                                SELECT column_name, data_type
-                                FROM information_schema.columns
-                                WHERE table_name = 'wb_products'
-                                ORDER BY ordinal_position;
-                                """)
-
-                    columns = cur.fetchall()
-                    print(f"Структура таблицы wb_products: {columns}")
-
-                    # Определяем доступные столбцы
-                    column_names = [col[0] for col in columns]
-
-                    # Проверяем какой столбец с ценой существует
-                    price_column = None
-                    if 'price_with_discount' in column_names:
-                        price_column = 'price_with_discount'
-                    elif 'price_witch_discount' in column_names:
-                        price_column = 'price_witch_discount'
-                    else:
-                        print("Не найден столбец с ценой со скидкой")
-                        return []
-
-                    # Строим запрос только для существующих столбцов
-                    select_columns = []
-                    if 'name' in column_names:
-                        select_columns.append('name')
-                    if 'price_no_discounts' in column_names:
-                        select_columns.append('price_no_discounts')
-                    if price_column:
-                        select_columns.append(f'{price_column} as price_with_discount')
-                    if 'rating' in column_names:
-                        select_columns.append('rating')
-                    if 'number_of_reviews' in column_names:
-                        select_columns.append('number_of_reviews')
-
-                    if not select_columns:
-                        print("Не найдены необходимые столбцы в таблице")
-                        return []
-
-                    # Определяем столбец для сортировки
-                    order_column = None
-                    if 'created_at' in column_names:
-                        order_column = 'created_at DESC'
-                    elif any('serial' in col[1].lower() for col in columns):
-                        # Ищем serial столбец (обычно это первичный ключ)
-                        for col_name, col_type in columns:
-                            if 'serial' in col_type.lower():
-                                order_column = f'{col_name} DESC'
-                                break
-                    else:
-                        # Используем первый столбец для сортировки
-                        order_column = f'{column_names[0]} DESC'
-
-                    # Выполняем запрос
-                    query = f"""
-                        SELECT {', '.join(select_columns)}
-                        FROM wb_products 
-                        ORDER BY {order_column}
-                        LIMIT %s;
-                    """
-
-                    print(f"Выполняем запрос: {query}")
-                    cur.execute(query, (limit,))
-                    rows = cur.fetchall()
-
-                    # Преобразуем в объекты Product
-                    products = []
-                    for row in rows:
-                        product_data = {}
-                        for i, col_name in enumerate(
-                                ['name', 'price_no_discounts', 'price_with_discount', 'rating', 'number_of_reviews']):
-                            if i < len(row):
-                                if col_name in ['price_no_discounts', 'price_with_discount', 'rating']:
-                                    product_data[col_name] = float(row[i]) if row[i] is not None else None
-                                elif col_name == 'number_of_reviews':
-                                    product_data[col_name] = int(row[i]) if row[i] is not None else None
-                                else:
-                                    product_data[col_name] = row[i]
-                            else:
-                                product_data[col_name] = None
-
-                        products.append(Product(**product_data))
-
-                    print(f"Получено {len(products)} товаров из БД")
-                    return products
+            products = self.repository.get_latest_products(limit)
+            print(f"Получено {len(products)} товаров из БД")
+            return products
 
         except Exception as e:
             print(f"Ошибка при получении товаров из БД: {e}")
@@ -325,15 +308,32 @@ class ParsingService:
             traceback.print_exc()
             return []
 
+    def refresh_stats(self, shard: str, query: str) -> bool:
+        """Пересчитывает сводную статистику категории; ошибка не прерывает парсинг."""
+        try:
+            return self.repository.stats.refresh(shard, query)
+        except Exception as e:
+            print(f"Ошибка при пересчёте статистики категории: {e}")
+            return False
+
+    def get_products_page(self, cursor: Optional[int] = None, limit: Optional[int] = None,
+                          filters: Optional[ProductFilter] = None) -> ProductPage:
+        """Получает страницу последних товаров из базы данных."""
+        try:
+            return self.repository.get_products_page(limit, cursor, filters)
+
+        except Exception as e:
+            print(f"Ошибка при получении товаров из БД: {e}")
+            import traceback
+            traceback.print_exc()
+            return ProductPage([])
+
     def debug_category_search(self, category_name: str) -> None:
         """Отладочный метод для поиска категории."""
         print(f"=== Отладка поиска категории '{category_name}' ===")
 
-        # Показываем все категории с похожими именами
-        matches = []
-        for cat_id, cat_node in self.tree_loader.cat_index.items():
-            if category_name.lower() in cat_node.name.lower():
-                matches.append(cat_node)
+        # Показываем все категории с похожими именами (самые релевантные первыми)
+        matches = self.tree_loader.search_categories(category_name)
 
         print(f"Найдено {len(matches)} категорий с похожими именами:")
         for cat in matches[:10]:  # Показываем первые 10
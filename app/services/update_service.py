@@ -1,4 +1,5 @@
 from typing import Optional, Dict, Any, List
+from pathlib import Path
 from fastapi import Request
 from app.utils.category_tree_loader import CategoryTreeLoader
 from app.utils.helpers import get_level_name
@@ -117,44 +118,106 @@ class CategoryService:
         return f"/?selected_path={path_str}"
 
 
-import subprocess
-import sys
-from pathlib import Path
+import asyncio
+import hashlib
+import json
+import os
+import httpx
+from app.utils.category_index import CategoryIndex, compile_index
+from app.utils.category_diff import diff_category_indexes, CategoryDiff
+from app.utils.category_tree_loader import get_category_tree, reload_category_tree, DEFAULT_DATA_FILE
+from parsing.search_category_json import URL, clean_nodes, save_menu
 
 
 class UpdateService:
     """Сервис для обновления категорий."""
 
-    def __init__(self):
-        # Убираем циклический импорт
-        pass
+    def __init__(self, data_file: str = DEFAULT_DATA_FILE, source_url: str = URL):
+        self.data_file = data_file
+        self.source_url = source_url
+        self.meta_file = os.path.splitext(data_file)[0] + '.meta.json'
+        self._lock = asyncio.Lock()
 
     async def update_categories(self, current_path: str = "") -> str:
         """Обновляет базу категорий из внешнего источника и возвращает URL для редиректа."""
         try:
-            # Запускаем скрипт
-            result = subprocess.run(
-                [sys.executable, str(Path("../parsing/search_category_json.py").resolve())],
-                capture_output=True,
-                text=True,
-                cwd=Path.cwd()
-            )
-
-            if result.returncode == 0:
-                # Перенаправляем с параметром успеха
-                redirect_url = "/?update_status=success"
-                if current_path:
-                    redirect_url += f"&selected_path={current_path}"
-                return redirect_url
-            else:
-                # Ошибка выполнения скрипта
-                error_msg = result.stderr or "Неизвестная ошибка при выполнении скрипта"
-                return self._build_error_url(error_msg, current_path)
+            # Одновременные нажатия "обновить" не должны скачивать меню дважды
+            async with self._lock:
+                status = await self.refresh_categories()
+
+            redirect_url = f"/?update_status={status}"
+            if current_path:
+                redirect_url += f"&selected_path={current_path}"
+            return redirect_url
 
         except Exception as e:
             # Общая ошибка
             return self._build_error_url(str(e), current_path)
 
+    async def refresh_categories(self) -> str:
+        """Скачивает меню условным запросом и применяет изменения к дереву.
+
+        Возвращает 'unchanged', если меню не изменилось, иначе 'success'.
+        """
+        meta = self._load_meta()
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+        async with httpx.AsyncClient(timeout=30) as client:
+            response = await client.get(self.source_url, headers=headers)
+
+        if response.status_code == 304:
+            print("Меню категорий не изменилось (304)")
+            return 'unchanged'
+        response.raise_for_status()
+
+        content_hash = hashlib.sha256(response.content).hexdigest()
+        meta.update({
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        })
+        if content_hash == meta.get('sha256') and os.path.exists(self.data_file):
+            print("Меню категорий не изменилось (совпадает хеш)")
+            self._save_meta(meta)
+            return 'unchanged'
+
+        # Разбор, сравнение и запись выполняем вне цикла событий
+        diff = await asyncio.to_thread(self._apply_menu, response.content)
+        meta['sha256'] = content_hash
+        self._save_meta(meta)
+        return 'unchanged' if diff.is_empty else 'success'
+
+    def _apply_menu(self, content: bytes) -> CategoryDiff:
+        """Сравнивает новое меню с текущим деревом и при изменениях подменяет его."""
+        data_clean = clean_nodes(json.loads(content))
+        new_index = CategoryIndex(compile_index(data_clean))
+        diff = diff_category_indexes(get_category_tree(self.data_file).index, new_index)
+        print(f"Изменения в меню категорий: {diff.summary()}")
+
+        if not diff.is_empty:
+            # Файлы пишутся атомарно, затем общее дерево подменяется целиком
+            save_menu(data_clean, Path(self.data_file))
+            reload_category_tree(self.data_file)
+        return diff
+
+    def _load_meta(self) -> Dict[str, Any]:
+        """Читает сохранённые валидаторы (ETag, Last-Modified, хеш содержимого)."""
+        try:
+            with open(self.meta_file, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_meta(self, meta: Dict[str, Any]) -> None:
+        """Сохраняет валидаторы для следующего условного запроса."""
+        tmp_path = f"{self.meta_file}.tmp"
+        with open(tmp_path, 'w', encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_file)
+
     def _build_error_url(self, error_msg: str, current_path: str) -> str:
         """Строит URL для редиректа при ошибке."""
         redirect_url = f"/?update_status=error&error_msg={error_msg}"
@@ -0,0 +1,49 @@
+from dataclasses import dataclass, field
+from typing import List, Tuple, Optional
+from app.utils.category_index import CategoryIndex
+
+
+@dataclass
+class CategoryDiff:
+    """Разница между двумя версиями дерева категорий по id узлов."""
+    added: List[int] = field(default_factory=list)
+    removed: List[int] = field(default_factory=list)
+    changed: List[int] = field(default_factory=list)  # Изменились поля или родитель
+    reordered: bool = False  # Тот же набор узлов, но другой порядок в меню
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.added or self.removed or self.changed or self.reordered)
+
+    def summary(self) -> str:
+        return (f"добавлено {len(self.added)}, удалено {len(self.removed)}, "
+                f"изменено {len(self.changed)}" + (", изменён порядок" if self.reordered else ""))
+
+
+def _node_signature(index: CategoryIndex, pos: int) -> Tuple[Optional[str], ...]:
+    """Поля узла, изменение которых требует обновить дерево"""
+    parent = index.parent(pos)
+    return (index.name(pos), index.url(pos), index.shard(pos), index.query(pos),
+            index.node_id(parent) if parent >= 0 else None)
+
+
+def diff_category_indexes(old: CategoryIndex, new: CategoryIndex) -> CategoryDiff:
+    """Сравнивает два индекса категорий поузлово."""
+    diff = CategoryDiff()
+    for pos in range(new.node_count):
+        category_id = new.node_id(pos)
+        old_pos = old.find(category_id)
+        if old_pos < 0:
+            diff.added.append(category_id)
+        elif _node_signature(old, old_pos) != _node_signature(new, pos):
+            diff.changed.append(category_id)
+
+    for pos in range(old.node_count):
+        if new.find(old.node_id(pos)) < 0:
+            diff.removed.append(old.node_id(pos))
+
+    if not (diff.added or diff.removed or diff.changed):
+        old_order = [old.node_id(pos) for pos in old.iter_document_order()]
+        new_order = [new.node_id(pos) for pos in new.iter_document_order()]
+        diff.reordered = old_order != new_order
+    return diff
@@ -0,0 +1,337 @@
+import glob
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from utils.helpers import default_file_mode
+
+# Формат скомпилированного индекса категорий (.idx), все числа little-endian:
+#   заголовок: magic, версия, число узлов, число корней, число URL, размер строк,
+#   размер и время изменения исходного JSON (для проверки актуальности);
+#   затем массивы по узлам в порядке обхода в ширину (дети узла идут подряд):
+#   id, родитель, глубина, начало и число детей, смещения и длины name/url/shard/query;
+#   отсортированные id с позициями узлов, позиции узлов в порядке исходного
+#   файла, позиции узлов с уникальными URL (по сортировке URL и в порядке
+#   первого появления) и общий блок строк UTF-8.
+MAGIC = b'WBCI'
+VERSION = 2
+HEADER = struct.Struct('<4sIIIIIQQ')
+NO_STRING = 0xFFFFFFFF  # Смещение для отсутствующей строки (None)
+STRING_FIELDS = ('name', 'url', 'shard', 'query')
+
+# (имя массива, формат элемента, длина: 'n' - по узлам, 'u' - по URL)
+SECTIONS = (
+    ('ids', 'q', 'n'),
+    ('parents', 'i', 'n'),
+    ('depths', 'i', 'n'),
+    ('child_start', 'i', 'n'),
+    ('child_count', 'i', 'n'),
+    *((f'{field}_{part}', 'I', 'n') for field in STRING_FIELDS for part in ('off', 'len')),
+    ('sorted_ids', 'q', 'n'),
+    ('sorted_pos', 'i', 'n'),
+    ('document_order', 'i', 'n'),
+    ('url_pos', 'i', 'u'),
+    ('url_order', 'i', 'u'),
+)
+
+
+def _align(offset: int) -> int:
+    """Выравнивает смещение по 8 байт"""
+    return (offset + 7) & ~7
+
+
+def _section_layout(node_count: int, url_count: int) -> Tuple[Dict[str, Tuple[int, int, str]], int]:
+    """Возвращает смещения массивов (начало, конец, формат) и начало блока строк"""
+    layout = {}
+    offset = _align(HEADER.size)
+    for name, fmt, size in SECTIONS:
+        length = (node_count if size == 'n' else url_count) * struct.calcsize(fmt)
+        layout[name] = (offset, offset + length, fmt)
+        offset = _align(offset + length)
+    return layout, offset
+
+
+def source_signature(source_path: str) -> Tuple[int, int]:
+    """Размер и время изменения исходного файла меню"""
+    stat = os.stat(source_path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def index_path(source_path: str, source: Tuple[int, int]) -> str:
+    """Файл индекса для данной версии меню (по размеру и времени изменения JSON).
+
+    Каждая версия меню получает свой файл, поэтому обновление меню не
+    заменяет индекс, отображённый в память работающим деревом: в Windows
+    замена отображённого файла завершается ошибкой.
+    """
+    base = os.path.splitext(source_path)[0]
+    return f"{base}.{source[0]:x}-{source[1]:x}.idx"
+
+
+def latest_index_path(source_path: str) -> Optional[str]:
+    """Самый свежий из сохранённых индексов меню (когда самого JSON нет)"""
+    paths = _index_paths(source_path)
+    return max(paths, key=os.path.getmtime) if paths else None
+
+
+def remove_stale_indexes(source_path: str, keep: str) -> None:
+    """Удаляет прежние версии индекса меню.
+
+    Файл, ещё открытый или отображённый (в Windows), остаётся и будет
+    удалён при следующем обновлении.
+    """
+    for path in _index_paths(source_path):
+        if os.path.abspath(path) != os.path.abspath(keep):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _index_paths(source_path: str) -> List[str]:
+    """Сохранённые версии индекса меню, включая индекс без версии в имени"""
+    base = os.path.splitext(source_path)[0]
+    paths = glob.glob(f"{glob.escape(base)}.*.idx")
+    if os.path.exists(f"{base}.idx"):
+        paths.append(f"{base}.idx")
+    return paths
+
+
+def compile_index(menu: List[Dict[str, Any]], source: Tuple[int, int] = (0, 0)) -> bytes:
+    """Компилирует меню категорий (список корней JSON) в бинарный индекс"""
+    # Порядок исходного файла (обход в глубину) нужен для совместимости поиска
+    document_nodes: List[Dict[str, Any]] = []
+    stack = list(reversed(menu))
+    while stack:
+        node = stack.pop()
+        document_nodes.append(node)
+        stack.extend(reversed(node.get('childs', [])))
+
+    # Раскладка в ширину: корни по возрастанию id, дети каждого узла подряд
+    layout_nodes = sorted(menu, key=lambda node: node['id'])
+    root_count = len(layout_nodes)
+    parents = [-1] * root_count
+    depths = [0] * root_count
+    child_start: List[int] = []
+    child_count: List[int] = []
+    position = 0
+    while position < len(layout_nodes):
+        children = layout_nodes[position].get('childs', [])
+        child_start.append(len(layout_nodes))
+        child_count.append(len(children))
+        layout_nodes.extend(children)
+        parents.extend([position] * len(children))
+        depths.extend([depths[position] + 1] * len(children))
+        position += 1
+
+    positions = {id(node): pos for pos, node in enumerate(layout_nodes)}
+    node_count = len(layout_nodes)
+
+    strings = bytearray()
+    string_offsets: Dict[bytes, int] = {}
+    columns: Dict[str, array] = {}
+    for field in STRING_FIELDS:
+        offsets, lengths = array('I'), array('I')
+        for node in layout_nodes:
+            value = node.get(field)
+            if value is None:
+                offsets.append(NO_STRING)
+                lengths.append(0)
+                continue
+            encoded = str(value).encode('utf-8')
+            # Одинаковые строки (shard, query) хранятся один раз
+            offset = string_offsets.get(encoded)
+            if offset is None:
+                offset = len(strings)
+                string_offsets[encoded] = offset
+                strings.extend(encoded)
+            offsets.append(offset)
+            lengths.append(len(encoded))
+        columns[f'{field}_off'] = offsets
+        columns[f'{field}_len'] = lengths
+
+    ids = [node['id'] for node in layout_nodes]
+    sorted_pairs = sorted((node_id, pos) for pos, node_id in enumerate(ids))
+
+    # При повторяющихся URL выигрывает последний узел в порядке файла
+    url_to_pos: Dict[bytes, int] = {}
+    for node in document_nodes:
+        if node.get('url'):
+            url_to_pos[node['url'].encode('utf-8')] = positions[id(node)]
+    url_pos = [pos for _, pos in sorted(url_to_pos.items())]
+    url_order = list(url_to_pos.values())
+
+    columns.update({
+        'ids': array('q', ids),
+        'parents': array('i', parents),
+        'depths': array('i', depths),
+        'child_start': array('i', child_start),
+        'child_count': array('i', child_count),
+        'sorted_ids': array('q', (node_id for node_id, _ in sorted_pairs)),
+        'sorted_pos': array('i', (pos for _, pos in sorted_pairs)),
+        'document_order': array('i', (positions[id(node)] for node in document_nodes)),
+        'url_pos': array('i', url_pos),
+        'url_order': array('i', url_order),
+    })
+
+    layout, strings_start = _section_layout(node_count, len(url_pos))
+    buffer = bytearray(strings_start + len(strings))
+    HEADER.pack_into(buffer, 0, MAGIC, VERSION, node_count, root_count, len(url_pos), len(strings), *source)
+    for name, (start, end, _) in layout.items():
+        column = columns[name]
+        if sys.byteorder != 'little':
+            column = array(column.typecode, column)
+            column.byteswap()
+        buffer[start:end] = column.tobytes()
+    buffer[strings_start:] = strings
+    return bytes(buffer)
+
+
+def write_index(menu: List[Dict[str, Any]], path: str, source_path: Optional[str] = None) -> bytes:
+    """Компилирует индекс и атомарно записывает его в файл.
+
+    Если файл этой версии уже открыт другим загрузчиком и не может быть
+    заменён, он остаётся: индекс одной версии меню всегда одинаков.
+    """
+    data = compile_index(menu, source_signature(source_path) if source_path else (0, 0))
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix=os.path.basename(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        # Индекс отображают в память и процессы других пользователей
+        os.chmod(tmp_path, default_file_mode())
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        if not os.path.exists(path):
+            raise
+    return data
+
+
+class CategoryIndex:
+    """Доступ к скомпилированному индексу категорий без распаковки в объекты.
+
+    Файл отображается в память (mmap), поэтому открытие индекса не зависит
+    от размера меню, а страницы читаются операционной системой по мере обращения.
+    """
+
+    def __init__(self, buffer: Any):
+        self._buffer = buffer
+        view = memoryview(buffer)
+        (magic, version, node_count, root_count, url_count, strings_size,
+         source_size, source_mtime) = HEADER.unpack_from(view, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Неподдерживаемый формат индекса категорий")
+
+        self.node_count = node_count
+        self.root_count = root_count
+        self.url_count = url_count
+        self.source = (source_size, source_mtime)
+
+        layout, strings_start = _section_layout(node_count, url_count)
+        for name, (start, end, fmt) in layout.items():
+            if sys.byteorder == 'little':
+                column: Sequence[int] = view[start:end].cast(fmt)
+            else:
+                column = array(fmt, view[start:end].tobytes())
+                column.byteswap()
+            setattr(self, name, column)
+        self._strings = view[strings_start:strings_start + strings_size]
+
+    @classmethod
+    def open(cls, path: str) -> 'CategoryIndex':
+        """Отображает файл индекса в память"""
+        with open(path, 'rb') as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def _string(self, field: str, pos: int) -> Optional[str]:
+        """Читает строковое поле узла"""
+        offset = getattr(self, f'{field}_off')[pos]
+        if offset == NO_STRING:
+            return None
+        return str(self._strings[offset:offset + getattr(self, f'{field}_len')[pos]], 'utf-8')
+
+    def node_id(self, pos: int) -> int:
+        return self.ids[pos]
+
+    def name(self, pos: int) -> Optional[str]:
+        return self._string('name', pos)
+
+    def url(self, pos: int) -> Optional[str]:
+        return self._string('url', pos)
+
+    def shard(self, pos: int) -> Optional[str]:
+        return self._string('shard', pos)
+
+    def query(self, pos: int) -> Optional[str]:
+        return self._string('query', pos)
+
+    def parent(self, pos: int) -> int:
+        """Позиция родителя или -1 для корня"""
+        return self.parents[pos]
+
+    def depth(self, pos: int) -> int:
+        """Глубина узла (0 для корня)"""
+        return self.depths[pos]
+
+    def ancestors(self, pos: int) -> List[int]:
+        """Позиции узлов от корня до указанного включительно, за O(глубины)"""
+        path = [0] * (self.depths[pos] + 1)
+        for level in range(len(path) - 1, -1, -1):
+            path[level] = pos
+            pos = self.parents[pos]
+        return path
+
+    def children(self, pos: int) -> range:
+        """Диапазон позиций дочерних узлов"""
+        start = self.child_start[pos]
+        return range(start, start + self.child_count[pos])
+
+    def roots(self) -> range:
+        """Диапазон позиций корневых узлов (по возрастанию id)"""
+        return range(self.root_count)
+
+    def find(self, category_id: int) -> int:
+        """Позиция узла по id или -1 (двоичный поиск)"""
+        low, high = 0, self.node_count
+        while low < high:
+            mid = (low + high) // 2
+            if self.sorted_ids[mid] < category_id:
+                low = mid + 1
+            else:
+                high = mid
+        if low < self.node_count and self.sorted_ids[low] == category_id:
+            return self.sorted_pos[low]
+        return -1
+
+    def find_url(self, url: str) -> int:
+        """Позиция узла по точному URL или -1 (двоичный поиск)"""
+        target = url.encode('utf-8')
+        low, high = 0, self.url_count
+        while low < high:
+            mid = (low + high) // 2
+            if self._url_bytes(self.url_pos[mid]) < target:
+                low = mid + 1
+            else:
+                high = mid
+        if low < self.url_count and self._url_bytes(self.url_pos[low]) == target:
+            return self.url_pos[low]
+        return -1
+
+    def _url_bytes(self, pos: int) -> bytes:
+        offset = self.url_off[pos]
+        return bytes(self._strings[offset:offset + self.url_len[pos]])
+
+    def iter_document_order(self) -> Iterator[int]:
+        """Позиции узлов в порядке исходного файла"""
+        return iter(self.document_order)
+
+    def iter_urls(self) -> Iterator[int]:
+        """Позиции узлов с уникальными URL в порядке их первого появления"""
+        return iter(self.url_order)
@@ -0,0 +1,147 @@
+import re
+from bisect import bisect_left
+from typing import Dict, List, Optional, Set, Tuple
+from app.utils.category_index import CategoryIndex
+
+NGRAM_SIZES = (2, 3)
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_name(name: str) -> str:
+    """Приводит название к виду для сравнения: регистр, ё, лишние пробелы"""
+    return _SPACES.sub(' ', name.casefold().replace('ё', 'е')).strip()
+
+
+def url_slug(url: str) -> str:
+    """Последний сегмент пути URL без параметров"""
+    return url.split('?')[0].rstrip('/').split('/')[-1].lower()
+
+
+def _ngrams(text: str, size: int) -> Set[str]:
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class CategorySearchIndex:
+    """Поисковый индекс по названиям категорий и последним сегментам URL.
+
+    Точное совпадение названия - словарь, префикс - двоичный поиск по
+    отсортированным названиям, подстрока - пересечение списков n-грамм
+    с последующей проверкой кандидатов. Строится один раз на дерево.
+    """
+
+    def __init__(self, index: CategoryIndex):
+        self.index = index
+        self._by_name: Dict[str, List[int]] = {}
+        self._names: Dict[int, str] = {}
+        self._sorted_names: List[Tuple[str, int]] = []  # (название, порядок в файле)
+        self._sorted_positions: List[int] = []  # порядок в файле -> позиция
+        self._name_grams: Dict[str, Set[int]] = {}
+        self._by_slug: Dict[str, List[int]] = {}
+        self._slug_grams: Dict[str, Set[int]] = {}
+        self._slugs: Dict[int, str] = {}
+        self._order: Dict[int, int] = {}
+        self._build()
+
+    def _build(self) -> None:
+        """Строит все индексы за один проход в порядке исходного файла"""
+        for order, pos in enumerate(self.index.iter_document_order()):
+            self._order[pos] = order
+            name = normalize_name(self.index.name(pos) or '')
+            self._names[pos] = name
+            self._by_name.setdefault(name, []).append(pos)
+            for size in NGRAM_SIZES:
+                for gram in _ngrams(name, size):
+                    self._name_grams.setdefault(gram, set()).add(pos)
+
+        self._sorted_names = sorted((name, self._order[pos]) for pos, name in self._names.items())
+        self._sorted_positions = list(self.index.iter_document_order())
+
+        # URL индексируются так же, как url_index: один узел на уникальный URL
+        for pos in self.index.iter_urls():
+            slug = url_slug(self.index.url(pos))
+            if not slug:
+                continue
+            self._slugs[pos] = slug
+            self._by_slug.setdefault(slug, []).append(pos)
+            for gram in _ngrams(slug, 3):
+                self._slug_grams.setdefault(gram, set()).add(pos)
+
+    def _candidates(self, query: str, grams_index: Dict[str, Set[int]], sizes: Tuple[int, ...],
+                    universe: Dict[int, str]) -> Set[int]:
+        """Позиции, содержащие все n-граммы запроса (надмножество совпадений)"""
+        size = max((s for s in sizes if s <= len(query)), default=0)
+        if not size:
+            return set(universe)
+        result: Optional[Set[int]] = None
+        for gram in sorted(_ngrams(query, size), key=lambda g: len(grams_index.get(g, ()))):
+            postings = grams_index.get(gram)
+            if not postings:
+                return set()
+            result = set(postings) if result is None else result & postings
+            if not result:
+                break
+        return result or set()
+
+    def find_by_name(self, name: str) -> int:
+        """Позиция первой категории с точно таким названием или -1"""
+        positions = self._by_name.get(normalize_name(name))
+        return positions[0] if positions else -1
+
+    def search_names(self, query: str, limit: Optional[int] = None) -> List[int]:
+        """Позиции категорий, чьё название содержит запрос.
+
+        Порядок: точное совпадение, затем начало названия, затем подстрока;
+        внутри группы - более короткие названия, затем порядок файла.
+        """
+        query = normalize_name(query)
+        if not query:
+            return []
+
+        exact = set(self._by_name.get(query, ()))
+        prefix = set()
+        start = bisect_left(self._sorted_names, (query, -1))
+        for name, order in self._sorted_names[start:]:
+            if not name.startswith(query):
+                break
+            prefix.add(self._sorted_positions[order])
+
+        matches = {pos for pos in self._candidates(query, self._name_grams, NGRAM_SIZES, self._names)
+                   if query in self._names[pos]}
+        matches |= exact | prefix
+
+        def rank(pos: int) -> Tuple[int, int, int]:
+            group = 0 if pos in exact else 1 if pos in prefix else 2
+            return group, len(self._names[pos]), self._order[pos]
+
+        ranked = sorted(matches, key=rank)
+        return ranked[:limit] if limit else ranked
+
+    def match_url(self, url: str, limit: Optional[int] = None) -> List[int]:
+        """Позиции категорий, у которых последний сегмент URL совпадает с запросом частично.
+
+        Порядок: точное совпадение сегмента, затем сегменты, содержащие
+        запрос (короче - точнее), затем сегменты, входящие в запрос (длиннее - точнее).
+        """
+        target = url_slug(url)
+        if not target:
+            return []
+
+        exact = set(self._by_slug.get(target, ()))
+        containing = {pos for pos in self._candidates(target, self._slug_grams, (3,), self._slugs)
+                      if target in self._slugs[pos]}
+        # Сегменты-подстроки запроса ищем перебором подстрок запроса, а не категорий
+        contained = set()
+        for i in range(len(target)):
+            for j in range(i + 1, len(target) + 1):
+                contained.update(self._by_slug.get(target[i:j], ()))
+
+        def rank(pos: int) -> Tuple[int, int, int]:
+            slug_length = len(self._slugs[pos])
+            if pos in exact:
+                return 0, 0, self._order[pos]
+            if pos in containing:
+                return 1, slug_length, self._order[pos]
+            return 2, -slug_length, self._order[pos]
+
+        ranked = sorted(exact | containing | contained, key=rank)
+        return ranked[:limit] if limit else ranked
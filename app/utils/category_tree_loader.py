@@ -1,83 +1,261 @@
 import json
-from typing import Dict, List, Any, Optional
-from dataclasses import dataclass
+import os
+import threading
+import time
+from collections.abc import Mapping, Sequence
+from typing import Dict, List, Optional, Tuple, Iterator, Union
+from app.utils.category_index import (CategoryIndex, compile_index, write_index, source_signature,
+                                      index_path, latest_index_path, remove_stale_indexes)
+from app.utils.category_search import CategorySearchIndex
+
+DEFAULT_DATA_FILE = "app/json/main-menu-ru-ru-v3.json"
 
 
-@dataclass
 class CategoryNode:
-    """Упрощённый узел дерева."""
-    id: int
-    name: str
-    url: Optional[str] = None
-    shard: Optional[str] = None
-    query: Optional[str] = None
-    children: List["CategoryNode"] = None
+    """Узел дерева категорий - лёгкое представление записи индекса.
+
+    Хранит только ссылку на индекс и позицию узла: поля читаются из массивов
+    индекса при обращении, дети задаются диапазоном позиций.
+    """
+
+    __slots__ = ('_index', '_pos')
+
+    def __init__(self, index: CategoryIndex, pos: int):
+        self._index = index
+        self._pos = pos
+
+    @property
+    def id(self) -> int:
+        return self._index.node_id(self._pos)
+
+    @property
+    def name(self) -> str:
+        return self._index.name(self._pos)
+
+    @property
+    def url(self) -> Optional[str]:
+        return self._index.url(self._pos)
+
+    @property
+    def shard(self) -> Optional[str]:
+        return self._index.shard(self._pos)
+
+    @property
+    def query(self) -> Optional[str]:
+        return self._index.query(self._pos)
+
+    @property
+    def depth(self) -> int:
+        return self._index.depth(self._pos)
+
+    @property
+    def parent_id(self) -> Optional[int]:
+        parent = self._index.parent(self._pos)
+        return self._index.node_id(parent) if parent >= 0 else None
+
+    @property
+    def children(self) -> "CategoryChildren":
+        return CategoryChildren(self._index, self._index.children(self._pos))
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, CategoryNode):
+            return NotImplemented
+        return self._index is other._index and self._pos == other._pos
+
+    def __hash__(self) -> int:
+        return hash((id(self._index), self._pos))
+
+    def __repr__(self) -> str:
+        return f"CategoryNode(id={self.id}, name={self.name!r}, url={self.url!r})"
+
+
+class CategoryChildren(Sequence):
+    """Дочерние категории узла: диапазон позиций в индексе без копирования узлов."""
+
+    __slots__ = ('_index', '_positions')
+
+    def __init__(self, index: CategoryIndex, positions: range):
+        self._index = index
+        self._positions = positions
+
+    def __getitem__(self, item: Union[int, slice]):
+        if isinstance(item, slice):
+            return tuple(CategoryNode(self._index, pos) for pos in self._positions[item])
+        return CategoryNode(self._index, self._positions[item])
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __iter__(self) -> Iterator[CategoryNode]:
+        return (CategoryNode(self._index, pos) for pos in self._positions)
+
+    def __repr__(self) -> str:
+        return f"CategoryChildren({list(self)!r})"
+
+
+class _CategoryIdIndex(Mapping):
+    """Отображение id → CategoryNode поверх индекса (в порядке исходного файла)."""
 
-    def __post_init__(self):
-        if self.children is None:
-            self.children = []
+    def __init__(self, index: CategoryIndex):
+        self._index = index
+
+    def __getitem__(self, category_id: int) -> CategoryNode:
+        pos = self._index.find(category_id)
+        if pos < 0:
+            raise KeyError(category_id)
+        return CategoryNode(self._index, pos)
+
+    def __iter__(self) -> Iterator[int]:
+        return (self._index.node_id(pos) for pos in self._index.iter_document_order())
+
+    def __len__(self) -> int:
+        return self._index.node_count
+
+    def values(self) -> Iterator[CategoryNode]:
+        return (CategoryNode(self._index, pos) for pos in self._index.iter_document_order())
+
+    def items(self) -> Iterator[Tuple[int, CategoryNode]]:
+        return ((self._index.node_id(pos), CategoryNode(self._index, pos))
+                for pos in self._index.iter_document_order())
+
+
+class _CategoryUrlIndex(Mapping):
+    """Отображение URL → CategoryNode поверх индекса."""
+
+    def __init__(self, index: CategoryIndex):
+        self._index = index
+
+    def __getitem__(self, url: str) -> CategoryNode:
+        pos = self._index.find_url(url)
+        if pos < 0:
+            raise KeyError(url)
+        return CategoryNode(self._index, pos)
+
+    def __iter__(self) -> Iterator[str]:
+        return (self._index.url(pos) for pos in self._index.iter_urls())
+
+    def __len__(self) -> int:
+        return self._index.url_count
+
+    def items(self) -> Iterator[Tuple[str, CategoryNode]]:
+        return ((self._index.url(pos), CategoryNode(self._index, pos)) for pos in self._index.iter_urls())
 
 
 class CategoryTreeLoader:
-    """Класс для загрузки и работы с деревом категорий."""
+    """Класс для загрузки и работы с деревом категорий.
+
+    Дерево читается из скомпилированного индекса рядом с JSON-файлом
+    (см. app.utils.category_index), который открывается через mmap при
+    первом обращении. Индекс у каждой версии меню свой: если для текущего
+    JSON его нет, он компилируется в новый файл, а прежние версии удаляются.
+    После загрузки дерево не изменяется, поэтому один экземпляр можно
+    безопасно разделять между сервисами (см. get_category_tree).
+    """
 
-    def __init__(self, data_file: str = "app/json/main-menu-ru-ru-v3.json"):
+    def __init__(self, data_file: str = DEFAULT_DATA_FILE):
         self.data_file = data_file
-        self.cat_index: Dict[int, CategoryNode] = {}
-        self.root_ids: List[int] = []
-        self.url_index: Dict[str, CategoryNode] = {}  # Индекс по URL
-        self._load_tree()
+        self.index_file: Optional[str] = None  # Индекс текущей версии меню (известен после открытия)
+        self.load_time = 0.0  # Время открытия индекса, секунд
+        self._index: Optional[CategoryIndex] = None
+        self._search: Optional[CategorySearchIndex] = None
+        self._lock = threading.Lock()
 
-    def _load_tree(self) -> None:
-        """Загружает дерево категорий из JSON-файла."""
+    @property
+    def index(self) -> CategoryIndex:
+        """Скомпилированный индекс категорий (открывается при первом обращении)."""
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = self._open_index()
+        return self._index
+
+    @property
+    def search(self) -> CategorySearchIndex:
+        """Поисковый индекс по названиям и URL (строится при первом поиске)."""
+        if self._search is None:
+            index = self.index
+            with self._lock:
+                if self._search is None:
+                    self._search = CategorySearchIndex(index)
+        return self._search
+
+    def load(self) -> 'CategoryTreeLoader':
+        """Открывает индекс заранее и возвращает загрузчик."""
+        _ = self.index
+        return self
+
+    def _open_index(self) -> CategoryIndex:
+        """Открывает актуальный индекс, при необходимости компилируя его из JSON."""
+        start = time.perf_counter()
+        source = source_signature(self.data_file) if os.path.exists(self.data_file) else None
+        self.index_file = index_path(self.data_file, source) if source else latest_index_path(self.data_file)
+
+        index = None
+        if self.index_file and os.path.exists(self.index_file):
+            try:
+                index = CategoryIndex.open(self.index_file)
+            except (OSError, ValueError) as e:
+                print(f"Не удалось открыть индекс категорий: {e}")
+            if index is not None and source is not None and index.source != source:
+                index = None
+
+        if index is None:
+            index = self._compile_index()
+        if self.index_file and source is not None:
+            remove_stale_indexes(self.data_file, keep=self.index_file)
+
+        self.load_time = time.perf_counter() - start
+        print(f"Индекс категорий открыт за {self.load_time:.3f} с ({index.node_count} категорий)")
+        return index
+
+    def _compile_index(self) -> CategoryIndex:
+        """Компилирует индекс из JSON-файла и сохраняет его рядом."""
         with open(self.data_file, encoding="utf-8") as f:
             data = json.load(f)
 
-        # Строим все узлы
-        for raw_root in data:
-            root = self._build_node(raw_root)
-            self._index_node(root)
-
-        # Находим корневые узлы
-        all_ids = set(self.cat_index.keys())
-        child_ids = {ch.id for node in self.cat_index.values() for ch in node.children}
-        self.root_ids = sorted(all_ids - child_ids)
-
-    def _build_node(self, data: Dict[str, Any]) -> CategoryNode:
-        """Рекурсивно строит узел дерева из JSON-данных."""
-        return CategoryNode(
-            id=data["id"],
-            name=data["name"],
-            url=data.get("url"),
-            shard=data.get("shard"),
-            query=data.get("query"),
-            children=[self._build_node(child) for child in data.get("childs", [])]
-        )
-
-    def _index_node(self, node: CategoryNode) -> None:
-        """Добавляет узел и его детей в индекс."""
-        self.cat_index[node.id] = node
-        if node.url:
-            self.url_index[node.url] = node
-        for child in node.children:
-            self._index_node(child)
+        try:
+            write_index(data, self.index_file, self.data_file)
+            return CategoryIndex.open(self.index_file)
+        except OSError as e:
+            # Каталог только для чтения - работаем с индексом в памяти
+            print(f"Не удалось сохранить индекс категорий: {e}")
+            return CategoryIndex(compile_index(data, source_signature(self.data_file)))
+
+    @property
+    def cat_index(self) -> Mapping:
+        """Индекс категорий по ID."""
+        return _CategoryIdIndex(self.index)
+
+    @property
+    def url_index(self) -> Mapping:
+        """Индекс категорий по URL."""
+        return _CategoryUrlIndex(self.index)
+
+    @property
+    def root_ids(self) -> List[int]:
+        """ID корневых категорий по возрастанию."""
+        index = self.index
+        return [index.node_id(pos) for pos in index.roots()]
 
     def get_category(self, category_id: int) -> Optional[CategoryNode]:
         """Возвращает категорию по ID."""
-        return self.cat_index.get(category_id)
+        pos = self.index.find(category_id)
+        return CategoryNode(self.index, pos) if pos >= 0 else None
 
     def get_category_by_url(self, url: str) -> Optional[CategoryNode]:
         """Возвращает категорию по URL."""
-        return self.url_index.get(url)
+        pos = self.index.find_url(url)
+        return CategoryNode(self.index, pos) if pos >= 0 else None
 
     def get_root_categories(self) -> List[CategoryNode]:
         """Возвращает список корневых категорий."""
-        return [self.cat_index[cat_id] for cat_id in self.root_ids]
+        index = self.index
+        return [CategoryNode(index, pos) for pos in index.roots()]
 
-    def get_children(self, parent_id: int) -> List[CategoryNode]:
+    def get_children(self, parent_id: int) -> Sequence:
         """Возвращает дочерние категории для указанного родителя."""
         parent = self.get_category(parent_id)
-        return parent.children if parent else []
+        return parent.children if parent else ()
 
     def get_category_url(self, category_id: int) -> Optional[str]:
         """Возвращает URL категории по её ID."""
@@ -99,48 +277,61 @@ class CategoryTreeLoader:
         return None, None
 
     def get_category_path(self, category_id: int) -> List[CategoryNode]:
-        """Возвращает путь от корня до указанной категории."""
+        """Возвращает путь от корня до указанной категории по ссылкам на родителей."""
+        index = self.index
+        pos = index.find(category_id)
+        if pos < 0:
+            return []
+        return [CategoryNode(index, ancestor) for ancestor in index.ancestors(pos)]
 
-        def find_path(node: CategoryNode, target_id: int, path: List[CategoryNode]) -> Optional[List[CategoryNode]]:
-            path.append(node)
-            if node.id == target_id:
-                return path.copy()
+    def get_category_depth(self, category_id: int) -> Optional[int]:
+        """Возвращает глубину категории (0 для корневой)."""
+        pos = self.index.find(category_id)
+        return self.index.depth(pos) if pos >= 0 else None
 
-            for child in node.children:
-                result = find_path(child, target_id, path)
-                if result:
-                    return result
+    def find_category_by_name(self, name: str) -> Optional[CategoryNode]:
+        """Возвращает первую категорию с указанным названием (без учёта регистра)."""
+        pos = self.search.find_by_name(name)
+        return CategoryNode(self.index, pos) if pos >= 0 else None
 
-            path.pop()
-            return None
+    def search_categories(self, query: str, limit: Optional[int] = None) -> List[CategoryNode]:
+        """Возвращает категории, в названии которых встречается запрос,
+        по убыванию релевантности."""
+        return [CategoryNode(self.index, pos) for pos in self.search.search_names(query, limit)]
 
-        for root_id in self.root_ids:
-            root = self.cat_index[root_id]
-            path = find_path(root, category_id, [])
-            if path:
-                return path
-        return []
+    def match_categories_by_url(self, target_url: str, limit: Optional[int] = None) -> List[CategoryNode]:
+        """Возвращает категории с частично совпадающим URL по убыванию релевантности."""
+        return [CategoryNode(self.index, pos) for pos in self.search.match_url(target_url, limit)]
 
     def find_best_match_url(self, target_url: str) -> Optional[CategoryNode]:
         """Находит наиболее подходящую категорию по части URL."""
-        # Очищаем URL от доменов и протоколов
-        clean_target = target_url.split('/')[-1] if '/' in target_url else target_url
-        clean_target = clean_target.split('?')[0]  # Убираем параметры
+        matches = self.match_categories_by_url(target_url, limit=1)
+        return matches[0] if matches else None
+
+
+# Общее для процесса дерево категорий: строится один раз и заменяется целиком
+_shared_trees: Dict[str, CategoryTreeLoader] = {}
+_shared_lock = threading.Lock()
 
-        best_match = None
-        best_score = 0
 
-        for url, category in self.url_index.items():
-            if not url:
-                continue
+def get_category_tree(data_file: str = DEFAULT_DATA_FILE) -> CategoryTreeLoader:
+    """Возвращает общее дерево категорий, загружая его при первом обращении."""
+    tree = _shared_trees.get(data_file)
+    if tree is None:
+        with _shared_lock:
+            tree = _shared_trees.get(data_file)
+            if tree is None:
+                tree = CategoryTreeLoader(data_file)
+                _shared_trees[data_file] = tree
+    return tree
 
-            clean_url = url.split('/')[-1] if '/' in url else url
 
-            # Простое сравнение по совпадению частей URL
-            if clean_target in clean_url or clean_url in clean_target:
-                score = len(clean_url) if clean_target in clean_url else len(clean_target)
-                if score > best_score:
-                    best_score = score
-                    best_match = category
+def reload_category_tree(data_file: str = DEFAULT_DATA_FILE) -> CategoryTreeLoader:
+    """Строит новое дерево и атомарно подменяет им общее.
 
-        return best_match
\ No newline at end of file
+    Пока новое дерево загружается, обращения продолжают обслуживаться старым.
+    """
+    tree = CategoryTreeLoader(data_file).load()
+    with _shared_lock:
+        _shared_trees[data_file] = tree
+    return tree
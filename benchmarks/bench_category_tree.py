@@ -0,0 +1,169 @@
+"""Замеры загрузки дерева категорий по реальному файлу меню.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_category_tree
+"""
+import json
+import os
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from app.utils.category_index import CategoryIndex, compile_index
+from app.utils.category_tree_loader import CategoryTreeLoader, get_category_tree, DEFAULT_DATA_FILE
+
+
+@dataclass
+class LegacyCategoryNode:
+    """Прежнее представление узла (dataclass со списком детей) - для сравнения"""
+    id: int
+    name: str
+    url: Optional[str] = None
+    shard: Optional[str] = None
+    query: Optional[str] = None
+    children: List["LegacyCategoryNode"] = field(default_factory=list)
+
+
+def build_legacy_tree(data_file: str) -> Dict[int, LegacyCategoryNode]:
+    """Строит дерево так же, как прежний CategoryTreeLoader"""
+    with open(data_file, encoding="utf-8") as f:
+        menu = json.load(f)
+    index: Dict[int, LegacyCategoryNode] = {}
+
+    def build(data: Dict[str, Any]) -> LegacyCategoryNode:
+        node = LegacyCategoryNode(
+            id=data["id"], name=data["name"], url=data.get("url"),
+            shard=data.get("shard"), query=data.get("query"),
+            children=[build(child) for child in data.get("childs", [])]
+        )
+        index[node.id] = node
+        return node
+
+    for raw_root in menu:
+        build(raw_root)
+    return index
+
+
+def build_array_index(data_file: str) -> CategoryIndex:
+    """Компилирует индекс из JSON и держит его в памяти"""
+    with open(data_file, encoding="utf-8") as f:
+        return CategoryIndex(compile_index(json.load(f)))
+
+
+def measure_node_memory(data_file: str = DEFAULT_DATA_FILE) -> None:
+    """Память, которая остаётся занятой деревом после загрузки (разобранный JSON освобождён)"""
+    tracemalloc.start()
+    legacy = build_legacy_tree(data_file)
+    legacy_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    in_memory = build_array_index(data_file)
+    array_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    mapped = CategoryTreeLoader(data_file).load()
+    mapped_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print(f"Память дерева ({len(legacy)} узлов):")
+    print(f"  dataclass-узлы со списками детей: {legacy_memory / 1024:.0f} КБ")
+    print(f"  массивы индекса в памяти:         {array_memory / 1024:.0f} КБ ({in_memory.node_count} узлов)")
+    print(f"  индекс через mmap (куча Python):  {mapped_memory / 1024:.1f} КБ, "
+          f"страницы файла {os.path.getsize(mapped.index_file) / 1024:.0f} КБ подгружаются по требованию")
+
+
+def legacy_category_path(roots: List[LegacyCategoryNode], category_id: int) -> List[LegacyCategoryNode]:
+    """Прежний поиск пути обходом в глубину по всем корням"""
+
+    def find_path(node, path):
+        path.append(node)
+        if node.id == category_id:
+            return path.copy()
+        for child in node.children:
+            result = find_path(child, path)
+            if result:
+                return result
+        path.pop()
+        return None
+
+    for root in roots:
+        path = find_path(root, [])
+        if path:
+            return path
+    return []
+
+
+def measure_paths(data_file: str = DEFAULT_DATA_FILE) -> None:
+    """Время построения пути до каждой категории: обход дерева против ссылок на родителей"""
+    legacy = build_legacy_tree(data_file)
+    child_ids = {child.id for node in legacy.values() for child in node.children}
+    roots = [legacy[cat_id] for cat_id in sorted(set(legacy) - child_ids)]
+    tree = CategoryTreeLoader(data_file).load()
+    ids = list(legacy)
+
+    start = time.perf_counter()
+    for cat_id in ids:
+        legacy_category_path(roots, cat_id)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for cat_id in ids:
+        tree.get_category_path(cat_id)
+    indexed_time = time.perf_counter() - start
+
+    print(f"Путь до категории ({len(ids)} запросов): обход дерева {legacy_time / len(ids) * 1e6:.1f} мкс, "
+          f"по родителям {indexed_time / len(ids) * 1e6:.1f} мкс на запрос")
+
+
+def measure_load(data_file: str = DEFAULT_DATA_FILE, repeats: int = 5) -> None:
+    """Время компиляции индекса из JSON и открытия готового индекса"""
+    compile_timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        with open(data_file, encoding="utf-8") as f:
+            compile_index(json.load(f))
+        compile_timings.append(time.perf_counter() - start)
+
+    CategoryTreeLoader(data_file).load()  # Гарантируем актуальный индекс на диске
+    open_timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        CategoryTreeLoader(data_file).load()
+        open_timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    tree = CategoryTreeLoader(data_file).load()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"Компиляция индекса из JSON: лучшее {min(compile_timings) * 1000:.1f} мс")
+    print(f"Открытие готового индекса: лучшее {min(open_timings) * 1000:.2f} мс, "
+          f"размер файла {os.path.getsize(tree.index_file) / 1024:.0f} КБ")
+    print(f"Память Python после открытия: {current / 1024:.1f} КБ (пик {peak / 1024:.1f} КБ), "
+          f"категорий: {tree.index.node_count}, корней: {tree.index.root_count}")
+
+
+def measure_shared(services: int = 3) -> None:
+    """Сравнивает отдельные деревья на каждый сервис с общим деревом"""
+    tracemalloc.start()
+    separate = [CategoryTreeLoader().load() for _ in range(services)]
+    separate_memory = tracemalloc.get_traced_memory()[0]
+    del separate
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    shared = [get_category_tree() for _ in range(services)]
+    shared_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print(f"{services} отдельных дерева: {separate_memory / 1024 / 1024:.2f} МБ, "
+          f"общее дерево: {shared_memory / 1024 / 1024:.2f} МБ ({len(shared)} ссылки)")
+
+
+if __name__ == '__main__':
+    measure_load()
+    measure_node_memory()
+    measure_paths()
+    measure_shared()
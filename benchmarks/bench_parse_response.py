@@ -0,0 +1,168 @@
+"""Время разбора одной страницы каталога: прежний путь (двойное декодирование
+и полный обход товаров) против разбора байтов выбранным JSON-бэкендом
+и разбора сразу в столбцовую пачку ProductBatch.
+
+Страницы берутся из кэша ответов (записываются при обычном парсинге),
+из JSON-файлов, переданных аргументами, или генерируются, если записей нет.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_parse_response [страница.json ...]
+"""
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+from config.settings import Config
+from database.models import Product
+from parsing.wb_parser import WBParser
+from utils.response_cache import ResponseCache
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+CATALOG_PREFIX = 'https://catalog.wb.ru/catalog/'
+
+
+def make_payload(count: int = 100, seed: int = 0) -> bytes:
+    """Синтетическая страница каталога со структурой ответа WB"""
+    rnd = random.Random(seed)
+    products = []
+    for i in range(count):
+        basic = rnd.randint(10000, 1000000)
+        price = {'basic': basic, 'product': int(basic * rnd.uniform(0.3, 1.0)), 'logistics': 0, 'return': 0}
+        products.append({
+            'id': 100000000 + seed * count + i,
+            'root': rnd.randint(1, 10 ** 8),
+            'kindId': 0,
+            'brand': f'Бренд {rnd.randint(1, 500)}',
+            'brandId': rnd.randint(1, 10 ** 6),
+            'siteBrandId': 0,
+            'colors': [{'name': 'чёрный', 'id': 0}],
+            'subjectId': rnd.randint(1, 9000),
+            'subjectParentId': rnd.randint(1, 900),
+            'name': f'Товар {seed}-{i}',
+            'entity': 'зонты',
+            'matchId': rnd.randint(1, 10 ** 8),
+            'supplier': f'Продавец {rnd.randint(1, 1000)}',
+            'supplierId': rnd.randint(1, 10 ** 6),
+            'supplierRating': round(rnd.uniform(3, 5), 1),
+            'supplierFlags': 0,
+            'pics': rnd.randint(1, 20),
+            'rating': rnd.randint(0, 5),
+            'reviewRating': round(rnd.uniform(0, 5), 1),
+            'nmReviewRating': round(rnd.uniform(0, 5), 1),
+            'feedbacks': rnd.randint(0, 50000),
+            'nmFeedbacks': rnd.randint(0, 50000),
+            'volume': 0,
+            'viewFlags': 0,
+            'sizes': [{
+                'name': size, 'origName': size, 'rank': 0, 'optionId': rnd.randint(1, 10 ** 9),
+                'wh': rnd.randint(1, 300000), 'time1': 2, 'time2': 30, 'dtype': 4,
+                'price': price, 'saleConditions': 0, 'payload': 'x' * 40
+            } for size in ('S', 'M', 'L', 'XL')],
+            'totalQuantity': rnd.randint(0, 1000),
+            'meta': {'tokens': [], 'presetId': 0},
+        })
+    return json.dumps({'state': 0, 'version': 2, 'data': {'products': products}}, ensure_ascii=False).encode('utf-8')
+
+
+def load_payloads(paths: List[str]) -> List[bytes]:
+    """Записанные страницы: файлы из аргументов или кэш ответов"""
+    if paths:
+        payloads = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                payloads.append(f.read())
+        return payloads
+
+    if os.path.exists(Config.CACHE_CONFIG['path']):
+        cache = ResponseCache()
+        try:
+            recorded = [body for _, body in cache.recorded(CATALOG_PREFIX)]
+        finally:
+            cache.close()
+        if recorded:
+            return recorded
+    return []
+
+
+def legacy_decode(body: bytes) -> Dict[str, Any]:
+    """Прежний путь HTTPClient: response.text.strip(), затем response.json()"""
+    if body.decode('utf-8').strip():
+        return json.loads(body.decode('utf-8'))
+    return {}
+
+
+def legacy_parse_response(response: Dict[str, Any], shard: str, query: str) -> List[Product]:
+    """Прежний WBParser.parse_response - для сравнения"""
+    products_raw = response.get("data", {}).get("products") or []
+    products = []
+    for product_data in products_raw:
+        price_dict = {}
+        for size in product_data.get("sizes", []):
+            price_dict = size.get("price") or {}
+            if price_dict:
+                break
+        products.append(Product(
+            name=product_data.get("name"),
+            price_no_discounts=float(price_dict.get("basic")) / 100 if price_dict.get("basic") else None,
+            price_with_discount=price_dict.get("product") / 100 if price_dict.get("product") else None,
+            rating=product_data.get("rating"),
+            number_of_reviews=product_data.get("nmFeedbacks"),
+            shard=shard,
+            query_params=query
+        ))
+    return products
+
+
+def measure(payloads: List[bytes], decode: Callable[[bytes], Any],
+            parse: Callable[[Any], List[Product]], repeats: int = 5) -> float:
+    """Лучшее среднее время разбора одной страницы, секунд"""
+    best: Optional[float] = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for body in payloads:
+            parse(decode(body))
+        elapsed = (time.perf_counter() - start) / len(payloads)
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(paths: List[str]) -> None:
+    payloads = load_payloads(paths)
+    source = 'записанные страницы'
+    if not payloads:
+        payloads = [make_payload(seed=seed) for seed in range(20)]
+        source = 'синтетические страницы'
+
+    parser = WBParser('bench', 'cat=0')
+    try:
+        size = sum(len(body) for body in payloads) / len(payloads)
+        print(f"{len(payloads)} страниц ({source}), в среднем {size / 1024:.0f} КБ")
+
+        variants = [
+            ('прежний путь (text + json)', legacy_decode,
+             lambda data: legacy_parse_response(data, parser.shard, parser.query)),
+            ('json.loads(bytes)', json.loads, parser.parse_response),
+        ]
+        if orjson is not None:
+            variants.append(('orjson.loads(bytes)', orjson.loads, parser.parse_response))
+            variants.append(('orjson + ProductBatch', orjson.loads, parser.parse_response_batch))
+        else:
+            print("orjson не установлен - замер только для стандартного json")
+
+        baseline = None
+        for title, decode, parse in variants:
+            elapsed = measure(payloads, decode, parse)
+            baseline = baseline or elapsed
+            print(f"  {title:<28} {elapsed * 1000:7.2f} мс на страницу (x{baseline / elapsed:.1f})")
+    finally:
+        parser.close()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,95 @@
+"""Сравнение скорости записи товаров: COPY FROM STDIN против pandas.to_sql('multi').
+
+COPY замеряется напрямую через ProductCopyStream. Отдельно замеряется
+save_products: в таблице с артикулом он пишет через временную таблицу
+и слияние, поэтому его время - это время пути слияния, а не чистого COPY.
+
+Запуск (нужна доступная PostgreSQL из .env):
+    python -m benchmarks.bench_save_products 10000 100000 1000000
+"""
+import random
+import sys
+import time
+from typing import List
+from database.connection import DatabaseManager
+from database.bulk_copy import ProductCopyStream
+from database.models import ProductRepository, Product
+
+BENCH_TABLE = 'wb_products_bench'
+
+
+def make_products(count: int) -> List[Product]:
+    """Генерирует синтетические товары"""
+    rnd = random.Random(42)
+    products = []
+    for i in range(count):
+        basic = rnd.randint(100, 100000) / 100
+        products.append(Product(
+            name=f"Товар №{i}\tс табуляцией" if i % 1000 == 0 else f"Товар №{i}",
+            price_no_discounts=basic,
+            price_with_discount=round(basic * rnd.uniform(0.3, 1.0), 2),
+            rating=round(rnd.uniform(0, 5), 1) if i % 10 else None,
+            number_of_reviews=rnd.randint(0, 50000),
+            shard='bench',
+            query_params='cat=0',
+            product_id=i
+        ))
+    return products
+
+
+def recreate_table(db_manager: DatabaseManager) -> None:
+    """Пересоздаёт таблицу для замеров по схеме wb_products"""
+    with db_manager.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+            cur.execute(f"CREATE TABLE {BENCH_TABLE} (LIKE wb_products INCLUDING ALL)")
+    db_manager.schema.invalidate(BENCH_TABLE)
+
+
+def copy_products(db_manager: DatabaseManager, products: List[Product]) -> None:
+    """Записывает товары одним COPY FROM STDIN, без слияния"""
+    schema = db_manager.schema.get_product_schema(BENCH_TABLE)
+    stream = ProductCopyStream(products, list(schema.fields))
+    with db_manager.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.copy_expert(schema.copy_query, stream)
+
+
+def measure(func, *args) -> float:
+    """Возвращает время выполнения функции в секундах"""
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main(sizes: List[int]) -> None:
+    db_manager = DatabaseManager()
+    repository = ProductRepository(db_manager)
+
+    try:
+        db_manager.create_tables()
+        print(f"{'Строк':>10} {'to_sql, с':>12} {'COPY, с':>10} {'Ускорение':>10} {'Слияние, с':>12}")
+
+        for size in sizes:
+            products = make_products(size)
+
+            recreate_table(db_manager)
+            legacy = measure(repository.save_products_to_sql, products, BENCH_TABLE)
+
+            recreate_table(db_manager)
+            copy = measure(copy_products, db_manager, products)
+
+            recreate_table(db_manager)
+            merge = measure(repository.save_products, products, BENCH_TABLE)
+
+            print(f"{size:>10} {legacy:>12.2f} {copy:>10.2f} {legacy / copy:>9.1f}x {merge:>12.2f}")
+
+    finally:
+        with db_manager.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+        db_manager.close()
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
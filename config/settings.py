@@ -17,13 +17,82 @@ class Config:
         'port': int(os.getenv('PORT', 5432))
     }
 
+    # Пул соединений с базой данных
+    POOL_CONFIG = {
+        'min_size': int(os.getenv('DB_POOL_MIN', 2)),  # Постоянно открытые соединения
+        'max_size': int(os.getenv('DB_POOL_MAX', 10)),  # Предел с учётом временных соединений
+        'timeout': 30,  # Сколько ждать свободное соединение, секунд
+        'recycle': 1800,  # Пересоздавать соединения старше, секунд
+        'pre_ping': True  # Проверять соединение перед выдачей из пула
+    }
+
+    # Настройки записи в базу данных
+    STORAGE_CONFIG = {
+        'batch_size': 1000,  # Сколько товаров записывается одной транзакцией
+        'page_size': 100,  # Товаров на странице списка
+        'max_page_size': 1000,  # Предел размера страницы, запрашиваемой через API
+        'stream_chunk_size': 5000  # Строк за одно чтение серверного курсора при выгрузке
+    }
+
     # Настройки парсера
     PARSER_CONFIG = {
         'timeout': 10,
         'retries': 3,
         'max_consecutive_errors': 5,
         'delay_range': (2, 5),
-        'rate_limit_delay': 20
+        'rate_limit_delay': 20,
+        'max_concurrency': 4  # Максимум страниц, запрашиваемых одновременно
+    }
+
+    # Общий ограничитель скорости запросов (на каждый хост)
+    RATE_LIMIT_CONFIG = {
+        'requests_per_second': 4.0,  # Начальная скорость
+        'burst': 4,  # Сколько запросов можно отправить подряд без ожидания
+        'min_rate': 0.2,
+        'max_rate': 10.0,
+        'increase_step': 0.05,  # Прибавка к скорости после успешного ответа
+        'decrease_factor': 0.5  # Множитель скорости после ответа 429
+    }
+
+    # Дисковый кэш ответов API
+    CACHE_CONFIG = {
+        'enabled': os.getenv('HTTP_CACHE', '1') == '1',  # HTTP_CACHE=0 отключает кэш
+        'path': os.getenv('HTTP_CACHE_PATH', '.cache/http_responses.sqlite3'),
+        'max_size_mb': 256,  # Предел размера кэша (сжатые ответы)
+        'compression_level': 6,
+        'touch_batch': 64,  # Сколько обращений к записям копить перед записью времени доступа
+        'default_ttl': 0,  # Адреса без правила не кэшируются
+        'ttl': {  # Время жизни ответа в секундах по префиксу "хост/путь"
+            'catalog.wb.ru/catalog/': 900
+        }
+    }
+
+    # Контрольные точки обхода категорий (для продолжения прерванного парсинга)
+    CHECKPOINT_CONFIG = {
+        'directory': os.getenv('CRAWL_CHECKPOINT_DIR', '.cache/checkpoints'),
+        # Более старый прерванный обход не продолжается: страницы категории уже сместились
+        'max_age_hours': float(os.getenv('CRAWL_CHECKPOINT_MAX_AGE_HOURS', '24'))
+    }
+
+    # История цен: секции по месяцам времени обхода
+    HISTORY_CONFIG = {
+        'enabled': os.getenv('PRICE_HISTORY', '1') == '1',  # PRICE_HISTORY=0 отключает запись истории
+        'premake_months': 2,  # На сколько месяцев вперёд создавать секции
+        'retention_months': 24  # Секции старше этого срока удаляются
+    }
+
+    # Сводная статистика категорий, пересчитываемая после каждого обхода
+    STATS_CONFIG = {
+        'histogram_buckets': 20,  # Интервалов в гистограмме цен (от минимума до максимума категории)
+        'discount_buckets': 10,  # Интервалов скидки от 0 до 100%
+        'rating_buckets': 10,  # Интервалов рейтинга от 0 до 5
+        'top_n': 100  # Сколько товаров с наибольшим числом отзывов хранить
+    }
+
+    # Фоновые задачи парсинга, запускаемые из веб-интерфейса
+    JOB_CONFIG = {
+        'max_workers': int(os.getenv('CRAWL_WORKERS', '2')),  # Сколько категорий парсится одновременно
+        'history_size': 100  # Сколько завершённых задач хранить для просмотра
     }
 
     # HTTP заголовки
@@ -0,0 +1,93 @@
+from typing import Iterable, Iterator, List, Optional, Any, Mapping
+import numpy as np
+
+# Поля, которые записываются как числа с плавающей точкой
+FLOAT_FIELDS = {'price_no_discounts', 'price_with_discount', 'rating'}
+INT_FIELDS = {'number_of_reviews', 'product_id'}
+
+NULL = '\\N'
+_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def format_copy_value(field: str, value: Any) -> str:
+    """Приводит значение к текстовому формату COPY (некорректные числа → NULL)"""
+    if value is None:
+        return NULL
+    if field in FLOAT_FIELDS:
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            return NULL
+        return NULL if number != number else repr(number)
+    if field in INT_FIELDS:
+        try:
+            return str(int(value))
+        except (TypeError, ValueError, OverflowError):
+            return NULL
+    return str(value).translate(_ESCAPES)
+
+
+def format_copy_column(field: str, values: Any) -> List[str]:
+    """Приводит столбец к текстовому формату COPY целиком (NaN и None → NULL)"""
+    if field in FLOAT_FIELDS or field in INT_FIELDS:
+        numbers = np.asarray(values, dtype=np.float64)
+        missing = np.isnan(numbers)
+        if field in INT_FIELDS:
+            if np.abs(numbers[~missing]).max(initial=0) >= 2 ** 63:
+                # Не помещается в int64 - форматируем поштучно, как format_copy_value
+                return [format_copy_value(field, value) for value in numbers.tolist()]
+            text = np.where(missing, 0, numbers).astype(np.int64).astype(str)
+        else:
+            text = numbers.astype(str)
+        return np.where(missing, NULL, text).tolist()
+    return [NULL if value is None else str(value).translate(_ESCAPES) for value in values]
+
+
+class ProductCopyStream:
+    """Файлоподобный объект, отдающий товары построчно для COPY FROM STDIN.
+
+    Строки формируются по мере чтения, поэтому весь набор товаров
+    не нужно держать в памяти в виде DataFrame или одной большой строки.
+    """
+
+    def __init__(self, products: Iterable[Any], fields: List[str]):
+        self.fields = fields
+        self.count = 0
+        self._rows: Iterator[str] = (self._format_row(product) for product in products)
+        self._buffer = ''
+
+    @classmethod
+    def from_columns(cls, columns: Mapping[str, Any], fields: List[str], count: int) -> 'ProductCopyStream':
+        """Поток из столбцов: значения форматируются по столбцу целиком, без объектов на строку"""
+        stream = cls((), fields)
+        formatted = [format_copy_column(field, columns[field]) if field in columns else [NULL] * count
+                     for field in fields]
+        stream._rows = ('\t'.join(row) + '\n' for row in zip(*formatted))
+        stream.count = count
+        return stream
+
+    def _format_row(self, product: Any) -> str:
+        """Формирует одну строку COPY для товара"""
+        self.count += 1
+        return '\t'.join(format_copy_value(field, getattr(product, field, None))
+                         for field in self.fields) + '\n'
+
+    def read(self, size: Optional[int] = -1) -> str:
+        """Возвращает очередную порцию данных размером около size символов"""
+        if size is None or size < 0:
+            data = self._buffer + ''.join(self._rows)
+            self._buffer = ''
+            return data
+
+        chunks = [self._buffer]
+        length = len(self._buffer)
+        while length < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            chunks.append(row)
+            length += len(row)
+
+        data = ''.join(chunks)
+        self._buffer = data[size:]
+        return data[:size]
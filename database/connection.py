@@ -3,6 +3,9 @@ from sqlalchemy import create_engine
 from contextlib import contextmanager
 from typing import Generator
 from config.settings import Config
+from database.schema import SchemaCache
+from database.price_history import PriceHistory, LATEST_TABLE
+from database.product_stats import ProductStats
 
 
 class DatabaseManager:
@@ -12,30 +15,62 @@ class DatabaseManager:
         self.db_config = Config.DB_CONFIG
         self.engine = None
         self._init_engine()
+        self.schema = SchemaCache(self)
+        self.price_history = PriceHistory(self)
+        self.product_stats = ProductStats(self)
 
     def _init_engine(self):
-        """Инициализирует SQLAlchemy engine"""
+        """Инициализирует SQLAlchemy engine с общим пулом соединений.
+
+        Этот же пул обслуживает и pandas/SQLAlchemy, и прямые запросы
+        через psycopg2 в get_connection.
+        """
         connection_string = Config.get_connection_string()
-        self.engine = create_engine(connection_string)
+        pool_config = Config.POOL_CONFIG
+        min_size = pool_config['min_size']
+        self.engine = create_engine(
+            connection_string,
+            pool_size=min_size,
+            max_overflow=max(pool_config['max_size'] - min_size, 0),
+            pool_timeout=pool_config['timeout'],
+            pool_recycle=pool_config['recycle'],
+            pool_pre_ping=pool_config['pre_ping']
+        )
 
     @contextmanager
     def get_connection(self) -> Generator[psycopg2.extensions.connection, None, None]:
-        """Контекстный менеджер для получения соединения с БД"""
+        """Контекстный менеджер для получения соединения с БД из пула"""
         conn = None
         try:
-            conn = psycopg2.connect(**self.db_config)
+            conn = self.engine.raw_connection()
             yield conn
             conn.commit()
         except Exception as e:
             if conn:
-                conn.rollback()
+                if conn.dbapi_connection is None or conn.dbapi_connection.closed:
+                    # Соединение разорвано - убираем его из пула
+                    conn.invalidate()
+                else:
+                    conn.rollback()
             raise e
         finally:
             if conn:
+                # Возвращает соединение в пул, а не закрывает его
                 conn.close()
 
-    def create_tables(self):
-        """Создает необходимые таблицы в базе данных"""
+    def pool_status(self) -> str:
+        """Возвращает состояние пула соединений"""
+        return self.engine.pool.status()
+
+    def create_tables(self) -> bool:
+        """Создает необходимые таблицы в базе данных и применяет миграции.
+
+        Вызывается один раз при запуске приложения, а не перед каждым обходом:
+        ALTER TABLE и CREATE INDEX берут блокировки, которые ждали бы
+        выгрузок и параллельных задач парсинга. Каждый шаг выполняется,
+        только если его результата в базе ещё нет. Возвращает True,
+        если схема изменилась.
+        """
         create_table_query = """
                              CREATE TABLE IF NOT EXISTS wb_products (
                                 id SERIAL PRIMARY KEY,
@@ -46,16 +81,66 @@ class DatabaseManager:
                                 number_of_reviews INTEGER,
                                 shard TEXT,
                                 query_params TEXT,
-                                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                                product_id BIGINT,
+                                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                                  );"""
 
-
-
         with self.get_connection() as conn:
             with conn.cursor() as cur:
-                cur.execute(create_table_query)
+                cur.execute("SELECT to_regclass('wb_products') IS NOT NULL")
+                changed = not cur.fetchone()[0]
+                if changed:
+                    cur.execute(create_table_query)
+
+                cur.execute("SELECT column_name FROM information_schema.columns WHERE table_name = 'wb_products'")
+                columns = {row[0] for row in cur.fetchall()}
+                cur.execute("SELECT indexname FROM pg_indexes WHERE tablename = 'wb_products'")
+                indexes = {row[0] for row in cur.fetchall()}
+
+                # Таблицы, созданные до появления артикула, дополняем столбцами. Таблица,
+                # пересозданная старым pandas.to_sql(if_exists='replace'), содержит только
+                # поля товара - ей нужны и id, и категория до создания индексов по ним.
+                # Уникальный индекс по (артикул, категория) позволяет обновлять товары
+                # вместо дублирования, не отнимая их у пересекающихся категорий.
+                # Все шаги выполняются в одной транзакции: при ошибке схема не меняется
+                migrations = [
+                    ('id' not in columns,
+                     "ALTER TABLE wb_products ADD COLUMN IF NOT EXISTS id BIGSERIAL PRIMARY KEY;"),
+                    ('shard' not in columns,
+                     "ALTER TABLE wb_products ADD COLUMN IF NOT EXISTS shard TEXT;"),
+                    ('query_params' not in columns,
+                     "ALTER TABLE wb_products ADD COLUMN IF NOT EXISTS query_params TEXT;"),
+                    ('created_at' not in columns,
+                     "ALTER TABLE wb_products ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;"),
+                    ('product_id' not in columns,
+                     "ALTER TABLE wb_products ADD COLUMN IF NOT EXISTS product_id BIGINT;"),
+                    ('updated_at' not in columns,
+                     "ALTER TABLE wb_products ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;"),
+                    ('wb_products_product_id_key' in indexes,
+                     "DROP INDEX IF EXISTS wb_products_product_id_key;"),
+                    ('wb_products_product_category_key' not in indexes,
+                     "CREATE UNIQUE INDEX IF NOT EXISTS wb_products_product_category_key "
+                     "ON wb_products (product_id, shard, query_params);"),
+                    # Курсорная пагинация списка товаров категории идёт по этому индексу
+                    ('wb_products_category_id' not in indexes,
+                     "CREATE INDEX IF NOT EXISTS wb_products_category_id ON wb_products (shard, query_params, id);")
+                ]
+                for needed, query in migrations:
+                    if needed:
+                        cur.execute(query)
+                        changed = True
+
+        if self.price_history.enabled:
+            changed = self.price_history.create_tables() or changed
+        self.product_stats.create_tables()
 
+        # Схема изменилась - сбрасываем закэшированные метаданные и тексты запросов
+        if changed:
+            self.schema.invalidate('wb_products')
+            self.schema.invalidate(LATEST_TABLE)
         print("Таблицы созданы успешно")
+        return changed
 
     def close(self):
         """Закрывает соединение с базой данных"""
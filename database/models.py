@@ -1,7 +1,13 @@
-from dataclasses import dataclass
-from typing import Optional, List, Dict, Any
+from dataclasses import dataclass, fields
+from typing import Optional, List, Dict, Any, Iterable, Iterator, Sequence, Tuple, Union, Callable
+import numpy as np
 import pandas as pd
+from psycopg2 import sql
 from database.connection import DatabaseManager
+from database.bulk_copy import ProductCopyStream
+from database.schema import ProductTableSchema
+from database.product_stats import ProductStats
+from config.settings import Config
 
 
 @dataclass
@@ -14,6 +20,7 @@ class Product:
     number_of_reviews: Optional[int]
     shard: Optional[str] = None
     query_params: Optional[str] = None
+    product_id: Optional[int] = None  # Артикул WB (nm)
 
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'Product':
@@ -25,7 +32,8 @@ class Product:
             rating=data.get('rating'),
             number_of_reviews=data.get('number_of_reviews'),
             shard=data.get('shard'),
-            query_params=data.get('query_params')
+            query_params=data.get('query_params'),
+            product_id=data.get('product_id')
         )
 
     def to_dict(self) -> Dict[str, Any]:
@@ -37,33 +45,228 @@ class Product:
             'rating': self.rating,
             'number_of_reviews': self.number_of_reviews,
             'shard': self.shard,
-            'query_params': self.query_params
+            'query_params': self.query_params,
+            'product_id': self.product_id
         }
 
 
+# Цены в ответе API указаны в копейках
+PRICE_SCALE = 100.0
+
+
+def to_float_array(values: Sequence[Any]) -> np.ndarray:
+    """Массив float64; None и нечисловые значения становятся NaN"""
+    try:
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        return np.array([_to_float(value) for value in values], dtype=np.float64)
+
+
+def _to_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def scale_prices(values: Sequence[Any]) -> np.ndarray:
+    """Переводит цены из копеек в рубли; нулевая или отсутствующая цена - NaN"""
+    prices = to_float_array(values)
+    prices[prices == 0] = np.nan
+    return prices / PRICE_SCALE
+
+
+@dataclass
+class ProductBatch:
+    """Пачка товаров в виде столбцов NumPy (поля совпадают с Product).
+
+    Числовые столбцы - float64, отсутствующее значение - NaN;
+    текстовые - массивы объектов, отсутствующее значение - None.
+    """
+    name: np.ndarray
+    price_no_discounts: np.ndarray
+    price_with_discount: np.ndarray
+    rating: np.ndarray
+    number_of_reviews: np.ndarray
+    shard: np.ndarray
+    query_params: np.ndarray
+    product_id: np.ndarray
+
+    @classmethod
+    def from_raw(cls, names: List[Optional[str]], basic_prices: List[Any], discount_prices: List[Any],
+                 ratings: List[Any], reviews: List[Any], shard: Optional[str] = None,
+                 query_params: Optional[str] = None,
+                 product_ids: Optional[List[Any]] = None) -> 'ProductBatch':
+        """Собирает пачку из сырых значений API (цены в копейках)"""
+        size = len(names)
+        return cls(
+            name=np.array(names, dtype=object),
+            price_no_discounts=scale_prices(basic_prices),
+            price_with_discount=scale_prices(discount_prices),
+            rating=to_float_array(ratings),
+            number_of_reviews=to_float_array(reviews),
+            shard=np.full(size, shard, dtype=object),
+            query_params=np.full(size, query_params, dtype=object),
+            product_id=to_float_array(product_ids) if product_ids is not None else np.full(size, np.nan)
+        )
+
+    @classmethod
+    def from_products(cls, products: Sequence[Product]) -> 'ProductBatch':
+        """Преобразует список Product в столбцы"""
+        return cls(
+            name=np.array([p.name for p in products], dtype=object),
+            price_no_discounts=to_float_array([p.price_no_discounts for p in products]),
+            price_with_discount=to_float_array([p.price_with_discount for p in products]),
+            rating=to_float_array([p.rating for p in products]),
+            number_of_reviews=to_float_array([p.number_of_reviews for p in products]),
+            shard=np.array([p.shard for p in products], dtype=object),
+            query_params=np.array([p.query_params for p in products], dtype=object),
+            product_id=to_float_array([p.product_id for p in products])
+        )
+
+    @classmethod
+    def concat(cls, batches: Sequence['ProductBatch']) -> 'ProductBatch':
+        """Объединяет несколько пачек в одну"""
+        return cls(**{field.name: np.concatenate([getattr(batch, field.name) for batch in batches])
+                      for field in fields(cls)})
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Столбцы пачки по именам полей Product"""
+        return {field.name: getattr(self, field.name) for field in fields(self)}
+
+    def __len__(self) -> int:
+        return len(self.name)
+
+    def __getitem__(self, index: slice) -> 'ProductBatch':
+        """Срез пачки (массивы не копируются)"""
+        return ProductBatch(**{name: column[index] for name, column in self.columns().items()})
+
+    def __iter__(self) -> Iterator[Product]:
+        return iter(self.to_products())
+
+    def to_products(self) -> List[Product]:
+        """Преобразует пачку в объекты Product (для кода, которому нужны строки)"""
+        def optional(values: List[float]) -> List[Optional[float]]:
+            return [None if value != value else value for value in values]
+
+        def optional_int(values: List[float]) -> List[Optional[int]]:
+            return [None if value != value else int(value) for value in values]
+
+        return [Product(*row) for row in zip(
+            self.name.tolist(), optional(self.price_no_discounts.tolist()),
+            optional(self.price_with_discount.tolist()), optional(self.rating.tolist()),
+            optional_int(self.number_of_reviews.tolist()), self.shard.tolist(), self.query_params.tolist(),
+            optional_int(self.product_id.tolist())
+        )]
+
+
+@dataclass
+class ProductPage:
+    """Страница списка товаров и курсор следующей страницы (None - страница последняя)"""
+    products: List[Product]
+    next_cursor: Optional[int] = None
+
+
+@dataclass
+class ProductFilter:
+    """Условия отбора товаров: категория (shard, query_params), цена со скидкой и рейтинг"""
+    shard: Optional[str] = None
+    query_params: Optional[str] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    min_rating: Optional[float] = None
+    max_rating: Optional[float] = None
+
+
 class ProductRepository:
     """Репозиторий для работы с товарами в базе данных"""
 
     def __init__(self, db_manager: DatabaseManager):
         self.db_manager = db_manager
 
+    @property
+    def stats(self) -> ProductStats:
+        """Сводная статистика по категориям, пересчитываемая после обходов"""
+        return self.db_manager.product_stats
+
     def _check_column_exists(self, table_name: str, column_name: str) -> bool:
         """Проверяет существование столбца в таблице"""
-        query = """
-                SELECT column_name
-                FROM information_schema.columns
-                WHERE table_name = %s \
-                  AND column_name = %s; \
-                """
+        return column_name in self.db_manager.schema.get_columns(table_name)
 
-        with self.db_manager.get_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute(query, (table_name, column_name))
-                return cur.fetchone() is not None
+    def save_products(self, products: Union[Iterable[Product], ProductBatch], table_name: str = 'wb_products',
+                      if_exists: str = 'append') -> int:
+        """Сохраняет товары в базу данных через COPY FROM STDIN.
+
+        Строки формируются прямо из объектов Product по мере чтения,
+        без промежуточного DataFrame; ProductBatch форматируется по столбцам.
+        Если в таблице есть артикул и категория, товары сливаются с ней
+        по (product_id, shard, query_params) через временную таблицу: известные обновляются, только если изменились,
+        новые добавляются. При if_exists='replace' таблица очищается,
+        а её схема сохраняется. Возвращает число переданных записей.
+        """
+        if isinstance(products, (list, tuple, ProductBatch)) and not len(products):
+            print("Нет данных для сохранения")
+            return 0
+
+        if if_exists not in ('append', 'replace'):
+            raise ValueError(f"Неподдерживаемый режим if_exists: {if_exists}")
+
+        schema = self.db_manager.schema.get_product_schema(table_name)
+        if schema is None:
+            raise ValueError(f"Таблица {table_name} не найдена, вызовите create_tables()")
+        if schema.is_legacy:
+            print("Используется старая схема БД с столбцом 'price_witch_discount'")
+
+        if isinstance(products, ProductBatch):
+            stream = ProductCopyStream.from_columns(products.columns(), list(schema.fields), len(products))
+        else:
+            stream = ProductCopyStream(products, list(schema.fields))
+
+        try:
+            with self.db_manager.get_connection() as conn:
+                with conn.cursor() as cur:
+                    if if_exists == 'replace':
+                        cur.execute(sql.SQL("TRUNCATE {}").format(sql.Identifier(table_name)))
+                    if schema.upsert is None:
+                        cur.copy_expert(schema.copy_query, stream)
+                        changed = stream.count
+                    else:
+                        changed = self._merge(cur, schema, stream)
+
+            if stream.count:
+                print(f"Данные успешно сохранены в таблицу {table_name}. "
+                      f"Записей: {stream.count}, добавлено или изменено: {changed}")
+            else:
+                print("Нет данных для сохранения")
+            return stream.count
 
-    def save_products(self, products: List[Product], table_name: str = 'wb_products',
-                      if_exists: str = 'append') -> None:
-        """Сохраняет список товаров в базу данных"""
+        except Exception as e:
+            print(f"Ошибка при сохранении в базу данных: {e}")
+            raise
+
+    def _merge(self, cur, schema: ProductTableSchema, stream: ProductCopyStream) -> int:
+        """Загружает поток во временную таблицу и сливает с основной по артикулу и категории.
+
+        Изменившиеся цены в той же транзакции попадают в историю цен.
+        Возвращает число добавленных и изменённых строк.
+        """
+        queries = schema.upsert
+        cur.execute(queries.create_staging)
+        cur.copy_expert(queries.copy, stream)
+
+        history = self.db_manager.price_history
+        if history.is_available():
+            cur.execute(history.record_query(queries.staging, dict(zip(schema.fields, schema.write_columns))))
+
+        changed = 0
+        for query in (queries.update, queries.insert, queries.insert_unkeyed):
+            cur.execute(query)
+            changed += max(cur.rowcount, 0)
+        return changed
+
+    def save_products_to_sql(self, products: List[Product], table_name: str = 'wb_products',
+                             if_exists: str = 'append') -> None:
+        """Сохраняет список товаров через pandas.to_sql (прежний способ, для сравнения)"""
         if not products:
             print("Нет данных для сохранения")
             return
@@ -116,9 +319,224 @@ class ProductRepository:
                 index=False,
                 method='multi'
             )
+            if if_exists == 'replace':
+                # pandas пересоздаёт таблицу по столбцам DataFrame
+                self.db_manager.schema.invalidate(table_name)
 
             print(f"Данные успешно сохранены в таблицу {table_name}. Записей: {len(df_to_save)}")
 
         except Exception as e:
             print(f"Ошибка при сохранении в базу данных: {e}")
-            raise
\ No newline at end of file
+            raise
+
+    def save_products_stream(self, products: Iterable[Product], table_name: str = 'wb_products',
+                             if_exists: str = 'append', batch_size: Optional[int] = None) -> int:
+        """Сохраняет поток товаров пачками фиксированного размера.
+
+        Каждая пачка фиксируется отдельной транзакцией, поэтому память не растёт
+        с размером категории, а уже записанные страницы переживают сбой.
+        """
+        with ProductBatchWriter(self, table_name, if_exists, batch_size) as writer:
+            for product in products:
+                writer.add([product])
+        return writer.count
+
+    def get_latest_products(self, limit: Optional[int] = None,
+                            table_name: str = 'wb_products') -> List[Product]:
+        """Возвращает последние сохранённые товары по закэшированному тексту запроса"""
+        schema = self.db_manager.schema.get_product_schema(table_name)
+        if schema is None or schema.select_query is None:
+            print(f"В таблице {table_name} не найдены необходимые столбцы")
+            return []
+
+        with self.db_manager.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(schema.select_query, (limit,))
+                rows = cur.fetchall()
+
+        return [self._row_to_product(schema, row) for row in rows]
+
+    def get_products_page(self, limit: Optional[int] = None, cursor: Optional[int] = None,
+                          filters: Optional[ProductFilter] = None,
+                          table_name: str = 'wb_products') -> ProductPage:
+        """Страница товаров от новых к старым с курсорной пагинацией по id.
+
+        cursor - next_cursor предыдущей страницы. Запрос с фильтром по
+        категории идёт по индексу (shard, query_params, id), без фильтра - по
+        первичному ключу, и читает не больше limit + 1 строк при любом
+        размере таблицы.
+        """
+        limit = limit or Config.STORAGE_CONFIG['page_size']
+        schema = self.db_manager.schema.get_product_schema(table_name)
+        if schema is None or schema.select_columns is None or schema.cursor_column is None:
+            print(f"В таблице {table_name} не найдены необходимые столбцы")
+            return ProductPage([])
+
+        cursor_column = sql.Identifier(schema.cursor_column)
+        conditions, params = self._filter_conditions(schema, filters)
+        if cursor is not None:
+            conditions.append(sql.SQL("{} < %s").format(cursor_column))
+            params.append(cursor)
+        query = sql.SQL("SELECT {}, {} FROM {}{} ORDER BY {} DESC LIMIT %s").format(
+            cursor_column, schema.select_columns, sql.Identifier(table_name), self._where(conditions), cursor_column
+        )
+        params.append(limit + 1)
+
+        with self.db_manager.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                rows = cur.fetchall()
+
+        next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+        return ProductPage([self._row_to_product(schema, row[1:]) for row in rows[:limit]], next_cursor)
+
+    def iter_products(self, filters: Optional[ProductFilter] = None, limit: Optional[int] = None,
+                      table_name: str = 'wb_products') -> Iterator[List[Product]]:
+        """Отдаёт отобранные товары порциями через серверный курсор.
+
+        Строки читаются с сервера по stream_chunk_size за раз, поэтому память
+        не зависит от числа товаров. Соединение занято, пока итератор
+        не исчерпан или не закрыт.
+        """
+        schema = self.db_manager.schema.get_product_schema(table_name)
+        if schema is None or schema.select_columns is None:
+            print(f"В таблице {table_name} не найдены необходимые столбцы")
+            return
+
+        conditions, params = self._filter_conditions(schema, filters)
+        query = sql.SQL("SELECT {} FROM {}{}").format(
+            schema.select_columns, sql.Identifier(table_name), self._where(conditions)
+        )
+        if limit is not None:
+            query += sql.SQL(" LIMIT %s")
+            params.append(limit)
+
+        chunk_size = Config.STORAGE_CONFIG['stream_chunk_size']
+        with self.db_manager.get_connection() as conn:
+            # Именованный курсор - серверный: строки остаются в базе до fetchmany
+            with conn.cursor(name='wb_products_stream') as cur:
+                cur.itersize = chunk_size
+                cur.execute(query, params)
+                while True:
+                    rows = cur.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield [self._row_to_product(schema, row) for row in rows]
+
+    @staticmethod
+    def _filter_conditions(schema: ProductTableSchema,
+                           filters: Optional[ProductFilter]) -> Tuple[List[sql.Composable], List[Any]]:
+        """Условия отбора и их параметры"""
+        conditions, params = [], []
+        if filters is None:
+            return conditions, params
+
+        price_column = schema.price_column or 'price_with_discount'
+        checks = (
+            ('shard', '=', filters.shard),
+            ('query_params', '=', filters.query_params),
+            (price_column, '>=', filters.min_price),
+            (price_column, '<=', filters.max_price),
+            ('rating', '>=', filters.min_rating),
+            ('rating', '<=', filters.max_rating),
+        )
+        for column, operator, value in checks:
+            if value is None:
+                continue
+            if column not in schema.columns:
+                raise ValueError(f"В таблице {schema.table_name} нет столбца {column}")
+            conditions.append(sql.SQL("{} {} %s").format(sql.Identifier(column), sql.SQL(operator)))
+            params.append(value)
+        return conditions, params
+
+    @staticmethod
+    def _where(conditions: List[sql.Composable]) -> sql.Composable:
+        if not conditions:
+            return sql.SQL("")
+        return sql.SQL(" WHERE ") + sql.SQL(" AND ").join(conditions)
+
+    @staticmethod
+    def _row_to_product(schema: ProductTableSchema, row: Sequence[Any]) -> Product:
+        """Товар из строки, прочитанной по schema.read_fields"""
+        product_data = dict(zip(schema.read_fields, row))
+        for field in ('price_no_discounts', 'price_with_discount', 'rating'):
+            if product_data.get(field) is not None:
+                product_data[field] = float(product_data[field])
+        return Product.from_dict(product_data)
+
+
+class ProductBatchWriter:
+    """Накапливает товары и сбрасывает их в базу пачками по batch_size.
+
+    Принимает как списки Product, так и столбцовые ProductBatch:
+    последние объединяются и режутся на пачки без создания объектов.
+    on_write вызывается после каждой записанной пачки с общим числом записей.
+    """
+
+    def __init__(self, repository: ProductRepository, table_name: str = 'wb_products',
+                 if_exists: str = 'append', batch_size: Optional[int] = None,
+                 on_write: Optional[Callable[[int], None]] = None):
+        self.repository = repository
+        self.table_name = table_name
+        self.if_exists = if_exists
+        self.batch_size = batch_size or Config.STORAGE_CONFIG['batch_size']
+        self.on_write = on_write
+        self.count = 0
+        self._batch: List[Product] = []
+        self._columnar: List[ProductBatch] = []
+        self._columnar_size = 0
+
+    def add(self, products: Union[Iterable[Product], ProductBatch]) -> None:
+        """Добавляет товары и записывает заполненные пачки"""
+        if isinstance(products, ProductBatch):
+            self._add_columnar(products)
+            return
+        self._batch.extend(products)
+        while len(self._batch) >= self.batch_size:
+            batch = self._batch[:self.batch_size]
+            self._batch = self._batch[self.batch_size:]
+            self._write(batch)
+
+    def _add_columnar(self, batch: ProductBatch) -> None:
+        """Копит столбцовые пачки и записывает их частями по batch_size"""
+        if not len(batch):
+            return
+        self._columnar.append(batch)
+        self._columnar_size += len(batch)
+        if self._columnar_size < self.batch_size:
+            return
+
+        merged = ProductBatch.concat(self._columnar)
+        start = 0
+        while len(merged) - start >= self.batch_size:
+            self._write(merged[start:start + self.batch_size])
+            start += self.batch_size
+        rest = merged[start:]
+        self._columnar = [rest] if len(rest) else []
+        self._columnar_size = len(rest)
+
+    def flush(self) -> None:
+        """Записывает оставшиеся товары"""
+        if self._batch:
+            batch, self._batch = self._batch, []
+            self._write(batch)
+        if self._columnar:
+            batches, self._columnar, self._columnar_size = self._columnar, [], 0
+            self._write(ProductBatch.concat(batches))
+
+    def _write(self, batch: Union[List[Product], ProductBatch]) -> None:
+        """Записывает одну пачку; 'replace' применяется только к первой"""
+        self.count += self.repository.save_products(batch, self.table_name, self.if_exists)
+        self.if_exists = 'append'
+        if self.on_write:
+            self.on_write(self.count)
+
+    def __enter__(self) -> 'ProductBatchWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        # При ошибке недописанный остаток не сохраняется: сбой его записи заменил бы
+        # исходное исключение, а контрольная точка не подтверждает эти страницы,
+        # и продолженный обход запросит их заново
+        if exc_type is None:
+            self.flush()
@@ -0,0 +1,203 @@
+import re
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+from psycopg2 import sql
+from config.settings import Config
+
+HISTORY_TABLE = 'wb_price_history'
+LATEST_TABLE = 'wb_price_latest'
+# Отслеживаемые значения; изменение любого из первых трёх даёт новую запись истории
+TRACKED_FIELDS = ('price_no_discounts', 'price_with_discount', 'rating')
+HISTORY_FIELDS = TRACKED_FIELDS + ('number_of_reviews',)
+_PARTITION_NAME = re.compile(rf"^{HISTORY_TABLE}_y(\d{{4}})m(\d{{2}})$")
+
+
+def month_start(day: date, offset: int = 0) -> date:
+    """Первое число месяца, отстоящего от day на offset месяцев"""
+    index = day.year * 12 + day.month - 1 + offset
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(start: date) -> str:
+    return f"{HISTORY_TABLE}_y{start.year:04d}m{start.month:02d}"
+
+
+class PriceHistory:
+    """История цен и рейтингов товаров.
+
+    Наблюдения пишутся только добавлением в таблицу, секционированную по
+    месяцам времени обхода, с индексом (product_id, ts): запрос истории
+    одного товара за период затрагивает лишь нужные секции. Последнее
+    наблюдение каждого товара хранится отдельно в wb_price_latest, поэтому
+    неизменившиеся цены отсеиваются без чтения самой истории. Секции
+    создаются заранее и удаляются по истечении срока хранения.
+    """
+
+    def __init__(self, db_manager, config: Optional[Dict[str, Any]] = None):
+        self.db_manager = db_manager
+        self.config = config or Config.HISTORY_CONFIG
+        self._rotated_month: Optional[date] = None  # Месяц последнего обновления секций
+
+    @property
+    def enabled(self) -> bool:
+        return self.config['enabled']
+
+    def create_tables(self) -> bool:
+        """Создаёт таблицы истории и обновляет набор секций.
+
+        Возвращает True, если таблицы были созданы.
+        """
+        queries = [
+            f"""CREATE TABLE IF NOT EXISTS {HISTORY_TABLE} (
+                    product_id BIGINT NOT NULL,
+                    ts TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    price_no_discounts DECIMAL(10, 2),
+                    price_with_discount DECIMAL(10, 2),
+                    rating DECIMAL(3, 2),
+                    number_of_reviews INTEGER
+                ) PARTITION BY RANGE (ts);""",
+            # Индекс на секционированной таблице создаётся и во всех её секциях
+            f"CREATE INDEX IF NOT EXISTS {HISTORY_TABLE}_product_ts ON {HISTORY_TABLE} (product_id, ts);",
+            f"""CREATE TABLE IF NOT EXISTS {LATEST_TABLE} (
+                    product_id BIGINT PRIMARY KEY,
+                    ts TIMESTAMP NOT NULL,
+                    price_no_discounts DECIMAL(10, 2),
+                    price_with_discount DECIMAL(10, 2),
+                    rating DECIMAL(3, 2),
+                    number_of_reviews INTEGER
+                );"""
+        ]
+        with self.db_manager.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT to_regclass(%s) IS NOT NULL AND to_regclass(%s) IS NOT NULL",
+                            (HISTORY_TABLE, LATEST_TABLE))
+                created = not cur.fetchone()[0]
+                if created:
+                    for query in queries:
+                        cur.execute(query)
+        self.rotate_partitions()
+        return created
+
+    def ensure_partitions(self) -> None:
+        """Обновляет набор секций при смене месяца; в остальное время ничего не делает.
+
+        Вызывается перед обходом, чтобы долго работающее приложение не
+        осталось без секции на новый месяц.
+        """
+        if self._rotated_month != month_start(date.today()) and self.is_available():
+            self.rotate_partitions()
+
+    def rotate_partitions(self) -> List[str]:
+        """Создаёт недостающие секции на текущий и следующие месяцы и удаляет устаревшие.
+
+        Возвращает имена удалённых секций.
+        """
+        with self.db_manager.get_connection() as conn:
+            with conn.cursor() as cur:
+                # Границы считаются по часам базы, которые ставят ts
+                cur.execute("SELECT LOCALTIMESTAMP")
+                now: datetime = cur.fetchone()[0]
+                current = month_start(now.date())
+                existing = self._partitions(cur)
+
+                for offset in range(self.config['premake_months'] + 1):
+                    start = month_start(current, offset)
+                    if partition_name(start) in existing:
+                        continue
+                    cur.execute(sql.SQL(
+                        "CREATE TABLE IF NOT EXISTS {} PARTITION OF {} FOR VALUES FROM (%s) TO (%s)"
+                    ).format(sql.Identifier(partition_name(start)), sql.Identifier(HISTORY_TABLE)),
+                        (start, month_start(start, 1)))
+
+                dropped = []
+                oldest = month_start(current, -self.config['retention_months'])
+                for name in existing:
+                    match = _PARTITION_NAME.match(name)
+                    if match and date(int(match.group(1)), int(match.group(2)), 1) < oldest:
+                        cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
+                        dropped.append(name)
+
+        self._rotated_month = current
+        if dropped:
+            print(f"Удалены устаревшие секции истории цен: {', '.join(dropped)}")
+        return dropped
+
+    @staticmethod
+    def _partitions(cur) -> List[str]:
+        """Имена секций таблицы истории"""
+        cur.execute("""
+                    SELECT child.relname
+                    FROM pg_inherits
+                             JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+                             JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                    WHERE parent.relname = %s
+                    ORDER BY child.relname;
+                    """, (HISTORY_TABLE,))
+        return [row[0] for row in cur.fetchall()]
+
+    def is_available(self) -> bool:
+        """Включена ли история и созданы ли её таблицы"""
+        return self.enabled and bool(self.db_manager.schema.get_columns(LATEST_TABLE))
+
+    def record_query(self, staging: str, columns: Dict[str, str]) -> sql.Composed:
+        """Запрос, переносящий изменившиеся наблюдения из промежуточной таблицы.
+
+        columns сопоставляет поля истории со столбцами промежуточной таблицы.
+        Последнее наблюдение обновляется, только если цена или рейтинг
+        изменились; обновлённые строки и попадают в историю.
+        """
+        fields = sql.SQL(', ').join(map(sql.Identifier, HISTORY_FIELDS))
+        return sql.SQL("""
+            WITH incoming AS (
+                SELECT DISTINCT ON (product_id) product_id, {source}
+                FROM {staging}
+                WHERE product_id IS NOT NULL
+            ), changed AS (
+                INSERT INTO {latest} AS l (product_id, ts, {fields})
+                SELECT product_id, LOCALTIMESTAMP, {fields} FROM incoming
+                ON CONFLICT (product_id) DO UPDATE
+                    SET ts = EXCLUDED.ts, {assignments}
+                    WHERE ({current}) IS DISTINCT FROM ({incoming})
+                RETURNING product_id, ts, {fields}
+            )
+            INSERT INTO {history} (product_id, ts, {fields})
+            SELECT product_id, ts, {fields} FROM changed
+        """).format(
+            source=sql.SQL(', ').join(
+                sql.SQL("{} AS {}").format(sql.Identifier(columns[field]), sql.Identifier(field))
+                for field in HISTORY_FIELDS
+            ),
+            staging=sql.Identifier(staging),
+            latest=sql.Identifier(LATEST_TABLE),
+            history=sql.Identifier(HISTORY_TABLE),
+            fields=fields,
+            assignments=sql.SQL(', ').join(
+                sql.SQL("{} = EXCLUDED.{}").format(sql.Identifier(field), sql.Identifier(field))
+                for field in HISTORY_FIELDS
+            ),
+            current=sql.SQL(', ').join(sql.SQL("l.{}").format(sql.Identifier(f)) for f in TRACKED_FIELDS),
+            incoming=sql.SQL(', ').join(sql.SQL("EXCLUDED.{}").format(sql.Identifier(f)) for f in TRACKED_FIELDS)
+        )
+
+    def get_price_trend(self, product_id: int, days: int = 90) -> List[Dict[str, Any]]:
+        """Изменения цены и рейтинга товара за последние days дней, от старых к новым"""
+        query = sql.SQL("""
+            SELECT ts, {fields}
+            FROM {history}
+            WHERE product_id = %s AND ts >= LOCALTIMESTAMP - make_interval(days => %s)
+            ORDER BY ts
+        """).format(fields=sql.SQL(', ').join(map(sql.Identifier, HISTORY_FIELDS)),
+                    history=sql.Identifier(HISTORY_TABLE))
+
+        with self.db_manager.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, (product_id, days))
+                rows = cur.fetchall()
+
+        trend = []
+        for ts, *values in rows:
+            point = {'ts': ts}
+            for field, value in zip(HISTORY_FIELDS, values):
+                point[field] = float(value) if value is not None and field in TRACKED_FIELDS else value
+            trend.append(point)
+        return trend
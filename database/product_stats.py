@@ -0,0 +1,218 @@
+from typing import Any, Dict, List, Optional
+from psycopg2 import sql
+from config.settings import Config
+
+SUMMARY_TABLE = 'wb_product_summary'
+HISTOGRAM_TABLE = 'wb_product_histograms'
+TOP_TABLE = 'wb_top_reviewed'
+
+
+class ProductStats:
+    """Сводная статистика товаров по категориям (shard, query_params).
+
+    Распределения цен, глубины скидки и рейтингов считаются в SQL и
+    сохраняются в сводные таблицы после каждого обхода категории, поэтому
+    запросы дашборда читают несколько готовых строк вместо полного
+    просмотра wb_products. Пересчёт категории выполняется одной
+    транзакцией: читатели до её завершения видят прежние значения.
+    """
+
+    def __init__(self, db_manager, config: Optional[Dict[str, Any]] = None):
+        self.db_manager = db_manager
+        self.config = config or Config.STATS_CONFIG
+
+    def create_tables(self) -> None:
+        """Создаёт сводные таблицы"""
+        queries = [
+            f"""CREATE TABLE IF NOT EXISTS {SUMMARY_TABLE} (
+                    shard TEXT NOT NULL,
+                    query_params TEXT NOT NULL,
+                    product_count INTEGER NOT NULL,
+                    rated_count INTEGER NOT NULL,
+                    price_min DOUBLE PRECISION,
+                    price_p10 DOUBLE PRECISION,
+                    price_p25 DOUBLE PRECISION,
+                    price_median DOUBLE PRECISION,
+                    price_p75 DOUBLE PRECISION,
+                    price_p90 DOUBLE PRECISION,
+                    price_max DOUBLE PRECISION,
+                    price_avg DOUBLE PRECISION,
+                    discount_avg DOUBLE PRECISION,
+                    discount_median DOUBLE PRECISION,
+                    discount_max DOUBLE PRECISION,
+                    rating_avg DOUBLE PRECISION,
+                    rating_median DOUBLE PRECISION,
+                    reviews_total BIGINT,
+                    refreshed_at TIMESTAMP NOT NULL,
+                    PRIMARY KEY (shard, query_params)
+                );""",
+            f"""CREATE TABLE IF NOT EXISTS {HISTOGRAM_TABLE} (
+                    shard TEXT NOT NULL,
+                    query_params TEXT NOT NULL,
+                    metric TEXT NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    lower_bound DOUBLE PRECISION NOT NULL,
+                    upper_bound DOUBLE PRECISION NOT NULL,
+                    product_count INTEGER NOT NULL,
+                    PRIMARY KEY (shard, query_params, metric, bucket)
+                );""",
+            f"""CREATE TABLE IF NOT EXISTS {TOP_TABLE} (
+                    shard TEXT NOT NULL,
+                    query_params TEXT NOT NULL,
+                    rank INTEGER NOT NULL,
+                    product_id BIGINT,
+                    name TEXT,
+                    number_of_reviews INTEGER,
+                    price_with_discount DOUBLE PRECISION,
+                    rating DOUBLE PRECISION,
+                    PRIMARY KEY (shard, query_params, rank)
+                );"""
+        ]
+        with self.db_manager.get_connection() as conn:
+            with conn.cursor() as cur:
+                for query in queries:
+                    cur.execute(query)
+
+    def refresh(self, shard: str, query_params: str, table_name: str = 'wb_products') -> bool:
+        """Пересчитывает сводку, гистограммы и топ по отзывам для категории.
+
+        Возвращает False, если в таблице товаров нет нужных столбцов.
+        """
+        schema = self.db_manager.schema.get_product_schema(table_name)
+        required = ('shard', 'query_params', 'product_id')
+        if schema is None or schema.price_column is None or not all(c in schema.columns for c in required):
+            print(f"В таблице {table_name} не найдены столбцы для статистики")
+            return False
+
+        params = {'shard': shard, 'query': query_params}
+        base = self._base_query(table_name, schema.price_column)
+        with self.db_manager.get_connection() as conn:
+            with conn.cursor() as cur:
+                for table in (SUMMARY_TABLE, HISTOGRAM_TABLE, TOP_TABLE):
+                    cur.execute(sql.SQL("DELETE FROM {} WHERE shard = %(shard)s AND query_params = %(query)s")
+                                .format(sql.Identifier(table)), params)
+
+                cur.execute(self._summary_query(base), params)
+                for metric, (lower, upper, buckets) in self._histogram_ranges().items():
+                    cur.execute(self._histogram_query(base, metric, lower, upper),
+                                {**params, 'metric': metric, 'buckets': buckets})
+                cur.execute(self._top_query(base), {**params, 'top_n': self.config['top_n']})
+
+        print(f"Статистика категории {shard}/{query_params} пересчитана")
+        return True
+
+    def _histogram_ranges(self) -> Dict[str, tuple]:
+        """Границы гистограмм: None - по минимуму и максимуму категории"""
+        buckets = self.config['histogram_buckets']
+        return {
+            'price': (None, None, buckets),
+            'discount': (0, 100, self.config['discount_buckets']),  # Проценты
+            'rating': (0, 5, self.config['rating_buckets'])
+        }
+
+    @staticmethod
+    def _base_query(table_name: str, price_column: str) -> sql.Composed:
+        """Товары категории с вычисленной глубиной скидки (%).
+
+        Нулевой рейтинг у WB означает отсутствие оценок и в статистику не входит.
+        """
+        return sql.SQL("""
+            SELECT product_id, name, number_of_reviews,
+                   {price}::float8 AS price,
+                   CASE WHEN price_no_discounts > 0 AND {price} IS NOT NULL
+                        THEN ((price_no_discounts - {price}) / price_no_discounts * 100)::float8
+                   END AS discount,
+                   NULLIF(rating, 0)::float8 AS rating,
+                   id
+            FROM {table}
+            WHERE shard = %(shard)s AND query_params = %(query)s
+        """).format(price=sql.Identifier(price_column), table=sql.Identifier(table_name))
+
+    @staticmethod
+    def _summary_query(base: sql.Composed) -> sql.Composed:
+        percentiles = sql.SQL(', ').join(
+            sql.SQL("percentile_cont({}) WITHIN GROUP (ORDER BY price)").format(sql.Literal(fraction))
+            for fraction in (0.1, 0.25, 0.5, 0.75, 0.9)
+        )
+        return sql.SQL("""
+            INSERT INTO {summary} (shard, query_params, product_count, rated_count,
+                                   price_min, price_p10, price_p25, price_median, price_p75, price_p90,
+                                   price_max, price_avg, discount_avg, discount_median, discount_max,
+                                   rating_avg, rating_median, reviews_total, refreshed_at)
+            SELECT %(shard)s, %(query)s, count(*), count(rating),
+                   min(price), {percentiles}, max(price), avg(price),
+                   avg(discount), percentile_cont(0.5) WITHIN GROUP (ORDER BY discount), max(discount),
+                   avg(rating), percentile_cont(0.5) WITHIN GROUP (ORDER BY rating),
+                   sum(number_of_reviews), LOCALTIMESTAMP
+            FROM ({base}) AS base
+            HAVING count(*) > 0
+        """).format(summary=sql.Identifier(SUMMARY_TABLE), percentiles=percentiles, base=base)
+
+    @staticmethod
+    def _histogram_query(base: sql.Composed, metric: str, lower: Optional[float],
+                         upper: Optional[float]) -> sql.Composed:
+        """Гистограмма metric в %(buckets)s равных интервалах; крайние значения
+        попадают в крайние интервалы"""
+        column = sql.Identifier(metric)
+        bounds = (sql.SQL("SELECT min({0}) AS lo, max({0}) AS hi FROM observed").format(column)
+                  if lower is None else
+                  sql.SQL("SELECT {}::float8 AS lo, {}::float8 AS hi").format(sql.Literal(lower), sql.Literal(upper)))
+        return sql.SQL("""
+            WITH observed AS (
+                SELECT {column} FROM ({base}) AS base WHERE {column} IS NOT NULL
+            ), bounds AS ({bounds})
+            INSERT INTO {histogram} (shard, query_params, metric, bucket, lower_bound, upper_bound, product_count)
+            SELECT %(shard)s, %(query)s, %(metric)s, bucket,
+                   lo + (hi - lo) / %(buckets)s * (bucket - 1),
+                   lo + (hi - lo) / %(buckets)s * bucket,
+                   count(*)
+            FROM (
+                SELECT CASE WHEN hi > lo
+                            THEN LEAST(GREATEST(width_bucket({column}, lo, hi, %(buckets)s), 1), %(buckets)s)
+                            ELSE 1
+                       END AS bucket, lo, hi
+                FROM observed, bounds
+            ) AS buckets
+            GROUP BY bucket, lo, hi
+        """).format(column=column, base=base, bounds=bounds, histogram=sql.Identifier(HISTOGRAM_TABLE))
+
+    @staticmethod
+    def _top_query(base: sql.Composed) -> sql.Composed:
+        return sql.SQL("""
+            INSERT INTO {top} (shard, query_params, rank, product_id, name, number_of_reviews,
+                               price_with_discount, rating)
+            SELECT %(shard)s, %(query)s,
+                   row_number() OVER (ORDER BY number_of_reviews DESC, id),
+                   product_id, name, number_of_reviews, price, rating
+            FROM ({base}) AS base
+            WHERE number_of_reviews IS NOT NULL
+            ORDER BY number_of_reviews DESC, id
+            LIMIT %(top_n)s
+        """).format(top=sql.Identifier(TOP_TABLE), base=base)
+
+    def get_summary(self, shard: str, query_params: str) -> Optional[Dict[str, Any]]:
+        """Сводка по категории или None, если она ещё не посчитана"""
+        rows = self._fetch(sql.SQL("SELECT * FROM {} WHERE shard = %s AND query_params = %s")
+                           .format(sql.Identifier(SUMMARY_TABLE)), (shard, query_params))
+        return rows[0] if rows else None
+
+    def get_histogram(self, shard: str, query_params: str, metric: str) -> List[Dict[str, Any]]:
+        """Непустые интервалы гистограммы metric ('price', 'discount', 'rating') по возрастанию"""
+        return self._fetch(sql.SQL(
+            "SELECT bucket, lower_bound, upper_bound, product_count FROM {} "
+            "WHERE shard = %s AND query_params = %s AND metric = %s ORDER BY bucket"
+        ).format(sql.Identifier(HISTOGRAM_TABLE)), (shard, query_params, metric))
+
+    def get_top_reviewed(self, shard: str, query_params: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Товары категории с наибольшим числом отзывов (не больше STATS_CONFIG['top_n'])"""
+        return self._fetch(sql.SQL(
+            "SELECT rank, product_id, name, number_of_reviews, price_with_discount, rating FROM {} "
+            "WHERE shard = %s AND query_params = %s ORDER BY rank LIMIT %s"
+        ).format(sql.Identifier(TOP_TABLE)), (shard, query_params, limit))
+
+    def _fetch(self, query: sql.Composed, params: tuple) -> List[Dict[str, Any]]:
+        with self.db_manager.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                names = [column[0] for column in cur.description]
+                return [dict(zip(names, row)) for row in cur.fetchall()]
@@ -0,0 +1,227 @@
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from psycopg2 import sql
+
+# Поля Product в порядке записи и чтения
+PRODUCT_FIELDS = ('name', 'price_no_discounts', 'price_with_discount', 'rating', 'number_of_reviews')
+OPTIONAL_FIELDS = ('shard', 'query_params', 'product_id')
+LEGACY_PRICE_COLUMN = 'price_witch_discount'
+# Ключ строки товара: артикул WB в своей категории - товар обновляется, а не дублируется
+KEY_COLUMNS = ('product_id', 'shard', 'query_params')
+
+
+@dataclass(frozen=True)
+class UpsertQueries:
+    """Запросы записи через промежуточную таблицу: COPY во временную
+    таблицу, затем слияние с основной по артикулу"""
+    staging: str  # Имя временной таблицы
+    create_staging: sql.Composed
+    copy: sql.Composed
+    update: sql.Composed  # Обновляет только изменившиеся товары
+    insert: sql.Composed  # Добавляет новые товары
+    insert_unkeyed: sql.Composed  # Товары без артикула или категории добавляются как есть
+
+
+@dataclass(frozen=True)
+class ProductTableSchema:
+    """Схема таблицы товаров и собранные по ней тексты запросов.
+
+    Это кэш текста SQL, а не подготовленные на сервере операторы: запрос
+    отправляется серверу целиком при каждом выполнении, экономится лишь
+    интроспекция таблицы и сборка запроса.
+    """
+    table_name: str
+    columns: Tuple[str, ...]
+    fields: Tuple[str, ...]  # Поля Product, которые пишутся в таблицу
+    write_columns: Tuple[str, ...]  # Соответствующие им столбцы таблицы
+    read_fields: Tuple[str, ...]  # Поля Product, которые читаются из таблицы
+    price_column: Optional[str]
+    order_column: str
+    copy_query: sql.Composed
+    select_query: Optional[sql.Composed]
+    select_columns: Optional[sql.Composed] = None  # Столбцы read_fields с псевдонимами полей Product
+    cursor_column: Optional[str] = None  # Уникальный возрастающий столбец для курсорной пагинации
+    upsert: Optional[UpsertQueries] = None  # None - в таблице нет артикула, только COPY
+
+    @property
+    def is_legacy(self) -> bool:
+        """Используется ли старое имя столбца цены со скидкой"""
+        return self.price_column == LEGACY_PRICE_COLUMN
+
+
+class SchemaCache:
+    """Кэш метаданных таблиц и текстов запросов: каждая таблица интроспектируется один раз.
+
+    Кэш сбрасывается через invalidate() только после действительного
+    изменения схемы (миграция в create_tables, пересоздание таблицы).
+    """
+
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+        self._columns: Dict[str, Tuple[str, ...]] = {}
+        self._product_schemas: Dict[str, ProductTableSchema] = {}
+        self._lock = threading.Lock()
+
+    def get_columns(self, table_name: str) -> Tuple[str, ...]:
+        """Возвращает столбцы таблицы в порядке их объявления"""
+        columns = self._columns.get(table_name)
+        if columns is None:
+            query = """
+                    SELECT column_name
+                    FROM information_schema.columns
+                    WHERE table_name = %s
+                    ORDER BY ordinal_position;
+                    """
+            with self.db_manager.get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(query, (table_name,))
+                    columns = tuple(row[0] for row in cur.fetchall())
+
+            # Отсутствующую таблицу не кэшируем - её могут создать позже
+            if columns:
+                with self._lock:
+                    self._columns[table_name] = columns
+        return columns
+
+    def get_product_schema(self, table_name: str = 'wb_products') -> Optional[ProductTableSchema]:
+        """Возвращает схему таблицы товаров или None, если таблицы нет"""
+        schema = self._product_schemas.get(table_name)
+        if schema is None:
+            columns = self.get_columns(table_name)
+            if not columns:
+                return None
+            schema = self._build_product_schema(table_name, columns)
+            with self._lock:
+                self._product_schemas[table_name] = schema
+        return schema
+
+    def invalidate(self, table_name: Optional[str] = None) -> None:
+        """Сбрасывает кэш для таблицы или целиком"""
+        with self._lock:
+            if table_name is None:
+                self._columns.clear()
+                self._product_schemas.clear()
+            else:
+                self._columns.pop(table_name, None)
+                self._product_schemas.pop(table_name, None)
+
+    @staticmethod
+    def _build_product_schema(table_name: str, columns: Tuple[str, ...]) -> ProductTableSchema:
+        """Сопоставляет поля Product со столбцами и собирает тексты запросов"""
+        if 'price_with_discount' in columns:
+            price_column = 'price_with_discount'
+        elif LEGACY_PRICE_COLUMN in columns:
+            price_column = LEGACY_PRICE_COLUMN
+        else:
+            price_column = None
+
+        column_for_field = {field: field for field in PRODUCT_FIELDS + OPTIONAL_FIELDS}
+        column_for_field['price_with_discount'] = price_column or 'price_with_discount'
+
+        # Для записи обязательные поля нужны всегда, необязательные - если есть столбец
+        fields = PRODUCT_FIELDS + tuple(f for f in OPTIONAL_FIELDS if f in columns)
+        write_columns = tuple(column_for_field[f] for f in fields)
+        copy_query = sql.SQL("COPY {} ({}) FROM STDIN").format(
+            sql.Identifier(table_name),
+            sql.SQL(', ').join(map(sql.Identifier, write_columns))
+        )
+
+        # Для чтения берём только существующие столбцы
+        read_fields = tuple(f for f in PRODUCT_FIELDS + OPTIONAL_FIELDS if column_for_field[f] in columns)
+        if 'created_at' in columns:
+            order_column = 'created_at'
+        elif 'id' in columns:
+            order_column = 'id'
+        else:
+            order_column = columns[0]
+
+        select_query = None
+        select_columns = None
+        if price_column and read_fields:
+            select_columns = sql.SQL(', ').join(
+                sql.SQL("{} AS {}").format(sql.Identifier(column_for_field[f]), sql.Identifier(f))
+                for f in read_fields
+            )
+            select_query = sql.SQL("SELECT {} FROM {} ORDER BY {} DESC LIMIT %s").format(
+                select_columns,
+                sql.Identifier(table_name),
+                sql.Identifier(order_column)
+            )
+
+        upsert = None
+        if all(c in write_columns for c in KEY_COLUMNS):
+            upsert = SchemaCache._build_upsert_queries(table_name, columns, write_columns)
+
+        return ProductTableSchema(
+            table_name=table_name,
+            columns=columns,
+            fields=fields,
+            write_columns=write_columns,
+            read_fields=read_fields,
+            price_column=price_column,
+            order_column=order_column,
+            copy_query=copy_query,
+            select_query=select_query,
+            select_columns=select_columns,
+            cursor_column='id' if 'id' in columns else None,
+            upsert=upsert
+        )
+
+    @staticmethod
+    def _build_upsert_queries(table_name: str, columns: Tuple[str, ...],
+                              write_columns: Tuple[str, ...]) -> UpsertQueries:
+        """Собирает запросы слияния по ключу (артикул, категория).
+
+        Один артикул может входить в несколько категорий (разделы меню WB
+        пересекаются), поэтому строка товара своя в каждой категории, и
+        обновление не трогает столбцы категории. Существующие строки
+        обновляются, только если значения изменились, а новые добавляются
+        отдельно: INSERT ... ON CONFLICT тратил бы значение последовательности
+        id на каждый уже известный товар. Повторы ключа внутри пачки (страницы
+        сдвигаются во время обхода) схлопываются DISTINCT ON.
+        """
+        table = sql.Identifier(table_name)
+        staging = sql.Identifier(f"{table_name}_staging")
+        keys = sql.SQL(', ').join(map(sql.Identifier, KEY_COLUMNS))
+        column_list = sql.SQL(', ').join(map(sql.Identifier, write_columns))
+        values = [c for c in write_columns if c not in KEY_COLUMNS]
+
+        def key_match(left: str, right: str) -> sql.Composed:
+            return sql.SQL(' AND ').join(
+                sql.SQL("{0}.{2} = {1}.{2}").format(sql.Identifier(left), sql.Identifier(right), sql.Identifier(c))
+                for c in KEY_COLUMNS
+            )
+
+        keyed = sql.SQL(' AND ').join(sql.SQL("{} IS NOT NULL").format(sql.Identifier(c)) for c in KEY_COLUMNS)
+        unkeyed = sql.SQL(' OR ').join(sql.SQL("{} IS NULL").format(sql.Identifier(c)) for c in KEY_COLUMNS)
+
+        assignments = [sql.SQL("{} = s.{}").format(sql.Identifier(c), sql.Identifier(c)) for c in values]
+        if 'updated_at' in columns:
+            assignments.append(sql.SQL("updated_at = CURRENT_TIMESTAMP"))
+        distinct_rows = sql.SQL("SELECT DISTINCT ON ({keys}) {columns} FROM {staging} WHERE {keyed}").format(
+            keys=keys, columns=column_list, staging=staging, keyed=keyed)
+
+        return UpsertQueries(
+            staging=f"{table_name}_staging",
+            create_staging=sql.SQL("CREATE TEMP TABLE IF NOT EXISTS {staging} ON COMMIT DROP AS "
+                                   "SELECT {columns} FROM {table} WITH NO DATA").format(
+                staging=staging, columns=column_list, table=table),
+            copy=sql.SQL("COPY {} ({}) FROM STDIN").format(staging, column_list),
+            update=sql.SQL("UPDATE {table} AS t SET {assignments} FROM ({rows}) AS s "
+                           "WHERE {match} AND ({current}) IS DISTINCT FROM ({incoming})").format(
+                table=table,
+                assignments=sql.SQL(', ').join(assignments),
+                rows=distinct_rows,
+                match=key_match('t', 's'),
+                current=sql.SQL(', ').join(sql.SQL("t.{}").format(sql.Identifier(c)) for c in values),
+                incoming=sql.SQL(', ').join(sql.SQL("s.{}").format(sql.Identifier(c)) for c in values)
+            ),
+            insert=sql.SQL("INSERT INTO {table} ({columns}) SELECT {columns} FROM ({rows}) AS s "
+                           "WHERE NOT EXISTS (SELECT 1 FROM {table} AS t WHERE {match}) "
+                           "ON CONFLICT ({keys}) DO NOTHING").format(
+                table=table, columns=column_list, rows=distinct_rows, match=key_match('t', 's'), keys=keys),
+            insert_unkeyed=sql.SQL("INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging} "
+                                   "WHERE {unkeyed}").format(
+                table=table, columns=column_list, staging=staging, unkeyed=unkeyed)
+        )
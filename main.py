@@ -1,3 +1,4 @@
+from itertools import chain
 from database.connection import DatabaseManager
 from database.models import ProductRepository
 from parsing.wb_parser import WBParser
@@ -14,15 +15,13 @@ def main():
         # Создаем таблицы
         db_manager.create_tables()
 
-        # Парсим данные
-        products = parser.parse_all_pages(
+        # Парсим данные и сохраняем их пачками по мере получения страниц
+        pages = parser.iter_pages(
             delay=0.5,
             skip_errors=True,
             max_pages=5
         )
-
-        # Сохраняем в базу данных
-        repository.save_products(products)
+        repository.save_products_stream(chain.from_iterable(pages))
         print("Данные успешно загружены в базу данных")
 
     except Exception as e:
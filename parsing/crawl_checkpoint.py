@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from config.settings import Config
+from utils.helpers import default_file_mode
+
+
+@dataclass
+class CrawlCheckpoint:
+    """Состояние обхода одной категории (shard, query).
+
+    Страница считается выполненной, только когда все её товары записаны
+    в базу: парсер сообщает о полученных страницах, а запись - о числе
+    сохранённых строк. Страницы подтверждаются строго по порядку, поэтому
+    last_page - курсор, после которого продолжается прерванный обход.
+    """
+    shard: str
+    query: str
+    completed_pages: List[int] = field(default_factory=list)
+    error_pages: List[int] = field(default_factory=list)
+    last_page: int = 0  # Все страницы до неё включительно выполнены или ошибочны
+    finished: bool = False
+    updated_at: float = 0.0
+    # (страница, номер последней строки, ошибка) - ещё не подтверждённые записью
+    _pending: Deque[Tuple[int, int, bool]] = field(default_factory=deque, init=False, repr=False)
+    _rows: int = field(default=0, init=False, repr=False)  # Строк передано на запись в этой сессии
+    _written: int = field(default=0, init=False, repr=False)  # Строк записано в этой сессии
+
+    @property
+    def start_page(self) -> int:
+        """Страница, с которой продолжается обход"""
+        return self.last_page + 1
+
+    @property
+    def retry_pages(self) -> List[int]:
+        """Страницы, которые нужно запросить повторно"""
+        return sorted(self.error_pages)
+
+    def page_fetched(self, page: int, rows: int) -> None:
+        """Страница получена, её rows товаров переданы на запись"""
+        self._rows += rows
+        self._pending.append((page, self._rows, False))
+        self._commit()
+
+    def page_failed(self, page: int) -> None:
+        """Страницу не удалось получить"""
+        self._pending.append((page, self._rows, True))
+        self._commit()
+
+    def rows_written(self, written: int) -> None:
+        """Запись подтвердила сохранение written строк с начала сессии"""
+        self._written = written
+        self._commit()
+
+    def finish(self) -> None:
+        """Обход дошёл до последней страницы"""
+        self.finished = True
+
+    def _commit(self) -> None:
+        """Подтверждает страницы, все товары которых уже записаны"""
+        while self._pending and self._pending[0][1] <= self._written:
+            page, _, failed = self._pending.popleft()
+            if failed:
+                if page not in self.error_pages:
+                    self.error_pages.append(page)
+            else:
+                if page in self.error_pages:
+                    self.error_pages.remove(page)
+                if page not in self.completed_pages:
+                    self.completed_pages.append(page)
+            self.last_page = max(self.last_page, page)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Сохраняемая часть состояния"""
+        return {
+            'shard': self.shard,
+            'query': self.query,
+            'completed_pages': self.completed_pages,
+            'error_pages': self.error_pages,
+            'last_page': self.last_page,
+            'finished': self.finished,
+            'updated_at': self.updated_at
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'CrawlCheckpoint':
+        return cls(
+            shard=data['shard'],
+            query=data['query'],
+            completed_pages=list(data.get('completed_pages', [])),
+            error_pages=list(data.get('error_pages', [])),
+            last_page=data.get('last_page', 0),
+            finished=data.get('finished', False),
+            updated_at=data.get('updated_at', 0.0)
+        )
+
+
+class CheckpointStore:
+    """Хранит контрольные точки обходов в JSON-файлах, по файлу на (shard, query)"""
+
+    def __init__(self, directory: Optional[str] = None, max_age_hours: Optional[float] = None):
+        config = Config.CHECKPOINT_CONFIG
+        self.directory = directory or config['directory']
+        self.max_age = (max_age_hours if max_age_hours is not None else config['max_age_hours']) * 3600
+
+    def _path(self, shard: str, query: str) -> str:
+        key = hashlib.sha1(f"{shard}\n{query}".encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.directory, f"{key}.json")
+
+    def load(self, shard: str, query: str) -> Optional[CrawlCheckpoint]:
+        """Загружает контрольную точку или None, если её нет"""
+        try:
+            with open(self._path(shard, query), encoding='utf-8') as f:
+                return CrawlCheckpoint.from_dict(json.load(f))
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError) as e:
+            print(f"Повреждённая контрольная точка обхода {shard}/{query}: {e}")
+            return None
+
+    def resume_or_start(self, shard: str, query: str) -> Tuple[CrawlCheckpoint, bool]:
+        """Незавершённый обход или обход с ошибочными страницами продолжается,
+        если он не старше max_age_hours, иначе начинается новый.
+        Возвращает контрольную точку и признак продолжения.
+        """
+        checkpoint = self.load(shard, query)
+        if checkpoint is not None and (not checkpoint.finished or checkpoint.error_pages):
+            if time.time() - checkpoint.updated_at <= self.max_age:
+                checkpoint.finished = False
+                return checkpoint, True
+            print(f"Контрольная точка обхода {shard}/{query} устарела - начинаем обход заново")
+        checkpoint = CrawlCheckpoint(shard, query)
+        self.save(checkpoint)
+        return checkpoint, False
+
+    def save(self, checkpoint: CrawlCheckpoint) -> None:
+        """Атомарно записывает контрольную точку.
+
+        Временный файл у каждой записи свой, поэтому одновременные записи
+        не портят друг другу файл: сохраняется последняя из них.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        checkpoint.updated_at = time.time()
+        path = self._path(checkpoint.shard, checkpoint.query)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=os.path.basename(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(checkpoint.to_dict(), f, ensure_ascii=False)
+            # Обход может продолжить процесс другого пользователя
+            os.chmod(tmp_path, default_file_mode())
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def delete(self, shard: str, query: str) -> None:
+        """Удаляет контрольную точку"""
+        try:
+            os.remove(self._path(shard, query))
+        except FileNotFoundError:
+            pass
@@ -1,9 +1,15 @@
 # Python
 import requests
 import json
+import sys
 from pathlib import Path
 from pprint import pprint
 
+# Добавляем корневую папку проекта в путь для импортов
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.utils.category_index import write_index, index_path, source_signature
+
 # URL исходного JSON
 URL = "https://static-basket-01.wbbasket.ru/vol0/data/main-menu-ru-ru-v3.json"
 
@@ -30,6 +36,23 @@ def clean_nodes(nodes: list[dict]) -> list[dict]:
     return cleaned
 
 
+def save_menu(data_clean: list[dict], out_path: Path) -> None:
+    """Атомарно записывает меню и скомпилированный индекс рядом с ним."""
+    tmp_path = out_path.with_suffix(".json.tmp")
+    tmp_path.write_text(
+        json.dumps(data_clean, ensure_ascii=False, separators=(",", ":")),
+        encoding="utf-8"
+    )
+    tmp_path.replace(out_path)
+    print(f"Файл {out_path.name} успешно создан")
+
+    # Скомпилированный индекс для быстрого старта CategoryTreeLoader. Он пишется
+    # в файл новой версии меню: индекс, открытый работающим деревом, не заменяется
+    idx_path = Path(index_path(str(out_path), source_signature(str(out_path))))
+    write_index(data_clean, str(idx_path), str(out_path))
+    print(f"Индекс {idx_path.name} успешно создан")
+
+
 def main() -> None:
     response = requests.get(URL, timeout=10)
     if response.status_code != 200:
@@ -39,12 +62,7 @@ def main() -> None:
     data_raw = response.json()
     data_clean = clean_nodes(data_raw)
 
-    out_path = Path("../app/json/main-menu-ru-ru-v3.json")
-    out_path.write_text(
-        json.dumps(data_clean, ensure_ascii=False, indent=2),
-        encoding="utf-8"
-    )
-    print(f"Файл {out_path.name} успешно создан")
+    save_menu(data_clean, Path("../app/json/main-menu-ru-ru-v3.json"))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
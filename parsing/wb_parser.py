@@ -1,18 +1,68 @@
+import asyncio
+import threading
 import time
 import random
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from typing import List, Dict, Any, Optional, Iterator, AsyncIterator, Tuple, Union
 from parsing.base_parser import BaseParser
-from database.models import Product
+from database.models import Product, ProductBatch
 from utils.http_client import HTTPClient
+from utils.async_http_client import AsyncHTTPClient
 from config.settings import Config
+from parsing.crawl_checkpoint import CrawlCheckpoint
+
+# Товары одной страницы: список Product или столбцовая пачка (columnar=True)
+PageProducts = Union[List[Product], ProductBatch]
+CANCEL_POLL_INTERVAL = 0.5  # Как часто ожидание проверяет флаг отмены, с
+
+
+async def wait_unless_cancelled(task: asyncio.Future, cancel: Optional[threading.Event]) -> bool:
+    """Ждёт завершения задачи, проверяя флаг отмены.
+
+    При отмене задача снимается (вместе с её повторами и паузами
+    ограничителя запросов) и возвращается False.
+    """
+    if cancel is not None:
+        while not task.done():
+            if cancel.is_set():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                return False
+            await asyncio.wait({task}, timeout=CANCEL_POLL_INTERVAL)
+    return True
+
+
+async def sleep_unless_cancelled(seconds: float, cancel: Optional[threading.Event]) -> None:
+    """asyncio.sleep, который заканчивается раньше, если выставлен флаг отмены"""
+    if cancel is None:
+        await asyncio.sleep(seconds)
+        return
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + seconds
+    while not cancel.is_set():
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        await asyncio.sleep(min(remaining, CANCEL_POLL_INTERVAL))
+
+
+def extract_prices(product_data: Dict[str, Any]) -> Tuple[Optional[int], Optional[int]]:
+    """Базовая цена и цена со скидкой (в копейках) из первого размера, где указана цена"""
+    for size in product_data.get("sizes") or ():
+        price = size.get("price")
+        if price:
+            return price.get("basic"), price.get("product")
+    return None, None
 
 
 class WBParser(BaseParser):
     """Парсер для Wildberries"""
 
-    def __init__(self, shard: str, query: str):
+    def __init__(self, shard: str, query: str, use_cache: bool = True, columnar: bool = False):
         self.shard = shard
         self.query = query
+        self.use_cache = use_cache  # False - всегда запрашивать свежие страницы
+        self.columnar = columnar  # True - страницы разбираются в ProductBatch вместо списков Product
         self.base_url = f'https://catalog.wb.ru/catalog/{shard}/v2/catalog'
         self.params = {
             'ab_testing': 'false',
@@ -26,7 +76,11 @@ class WBParser(BaseParser):
             **self._parse_query(query)
         }
         self.http_client = HTTPClient()
+        self.async_http_client: Optional[AsyncHTTPClient] = None
         self.config = Config.PARSER_CONFIG
+        self.unchanged_pages: List[int] = []  # Страницы последнего обхода без изменений
+        self.error_pages: List[int] = []  # Страницы последнего обхода, завершившиеся ошибкой
+        self._probed: Dict[int, PageProducts] = {}  # Страницы, загруженные find_last_page
 
     def _parse_query(self, query: str) -> Dict[str, str]:
         """Парсит строку параметров запроса"""
@@ -44,87 +98,238 @@ class WBParser(BaseParser):
         query_string = '&'.join([f"{k}={v}" for k, v in params.items()])
         return f"{self.base_url}?{query_string}"
 
-    def parse_response(self, response: Dict[str, Any]) -> List[Product]:
-        """Парсит ответ от API и возвращает список товаров"""
+    def parse_response(self, response: Dict[str, Any]) -> PageProducts:
+        """Парсит ответ от API и возвращает список товаров (или пачку при columnar=True)"""
+        if self.columnar:
+            return self.parse_response_batch(response)
         if not response:
             return []
 
-        products_raw = response.get("data", {}).get("products") or []
+        products_raw = (response.get("data") or {}).get("products") or []
+        shard, query = self.shard, self.query
         products = []
 
         for product_data in products_raw:
-            # Извлекаем информацию о цене
-            price_dict = {}
-            for size in product_data.get("sizes", []):
-                price_dict = size.get("price") or {}
-                if price_dict:
-                    break
+            basic, price = extract_prices(product_data)
 
             # Создаем объект товара
-            product = Product(
+            products.append(Product(
                 name=product_data.get("name"),
-                price_no_discounts=float(price_dict.get("basic")) / 100 if price_dict.get("basic") else None,
-                price_with_discount=price_dict.get("product") / 100 if price_dict.get("product") else None,
+                price_no_discounts=float(basic) / 100 if basic else None,
+                price_with_discount=price / 100 if price else None,
                 rating=product_data.get("rating"),
                 number_of_reviews=product_data.get("nmFeedbacks"),
-                shard=self.shard,
-                query_params=self.query
-            )
-            products.append(product)
+                shard=shard,
+                query_params=query,
+                product_id=product_data.get("id")
+            ))
 
         return products
 
-    def parse_page(self, page: int) -> List[Product]:
+    def parse_response_batch(self, response: Dict[str, Any]) -> ProductBatch:
+        """Разбирает ответ сразу в столбцы: цены переводятся в рубли для всей страницы разом"""
+        products_raw = ((response or {}).get("data") or {}).get("products") or []
+        prices = [extract_prices(product_data) for product_data in products_raw]
+        return ProductBatch.from_raw(
+            names=[product_data.get("name") for product_data in products_raw],
+            basic_prices=[basic for basic, _ in prices],
+            discount_prices=[price for _, price in prices],
+            ratings=[product_data.get("rating") for product_data in products_raw],
+            reviews=[product_data.get("nmFeedbacks") for product_data in products_raw],
+            shard=self.shard,
+            query_params=self.query,
+            product_ids=[product_data.get("id") for product_data in products_raw]
+        )
+
+    def parse_page(self, page: int) -> PageProducts:
         """Парсит одну страницу"""
         url = self.build_url(page)
-        response = self.http_client.get_json(url)
+        response = self.http_client.get_json(url, use_cache=self.use_cache)
         return self.parse_response(response)
 
-    def find_last_page(self, start_page: int = 1, max_check: int = 500) -> int:
-        """Находит последнюю доступную страницу методом бинарного поиска"""
+    def parse_page_if_changed(self, page: int) -> Optional[PageProducts]:
+        """Парсит страницу, только если она изменилась с прошлого запроса, иначе None"""
+        changed, response = self.http_client.get_json_if_changed(self.build_url(page))
+        return self._parse_if_changed(changed, response)
+
+    def _parse_if_changed(self, changed: bool, response: Optional[Dict[str, Any]]) -> Optional[PageProducts]:
+        """Разбирает страницу, если она изменилась.
+
+        Пустая страница разбирается всегда, чтобы обход остановился на последней странице.
+        """
+        if changed or not response or not (response.get("data") or {}).get("products"):
+            return self.parse_response(response)
+        return None
+
+    def find_last_page(self, start_page: int = 1, max_check: int = 500,
+                       concurrency: Optional[int] = None, cancel: Optional[threading.Event] = None) -> int:
+        """Находит последнюю непустую страницу.
+
+        Если первый ответ содержит общее число товаров, число страниц
+        вычисляется сразу. Иначе кандидаты проверяются пачками параллельно:
+        сначала с экспоненциальным шагом, затем равномерно внутри найденного
+        интервала. Загруженные страницы отдаются iter_pages и iter_pages_async
+        без повторного запроса. Если первую страницу загрузить не удалось
+        или выставлен флаг cancel, возвращается max_check: новые проверки
+        после отмены не отправляются, а ожидающие в очереди снимаются.
+        """
+        if concurrency is None:
+            concurrency = self.config.get('max_concurrency', 1)
+        concurrency = max(concurrency, 1)
+        self._probed = {}
         print(f"Ищем последнюю страницу, начиная с {start_page}...")
 
-        left, right = start_page, start_page
-
-        # Находим верхнюю границу
-        while right <= max_check:
-            print(f"Проверяем страницу {right}...")
-            products = self.parse_page(right)
-
-            if products:
-                left = right
-                right *= 2
-                print(f"Страница {left} не пустая, проверяем дальше...")
-            else:
-                print(f"Страница {right} пустая, ищем между {left} и {right}")
+        response = self.http_client.get_json(self.build_url(start_page), use_cache=self.use_cache)
+        if response is None:
+            # Без первой страницы граница неизвестна: обход остановится на пустой странице
+            print(f"Не удалось загрузить страницу {start_page}")
+            return max_check
+        self._probed[start_page] = self.parse_response(response)
+        page_size = len(self._probed.get(start_page, ()))
+        if not page_size:
+            print(f"Страница {start_page} пустая")
+            return start_page
+
+        total = self._total_from_response(response)
+        if total is not None:
+            last_page = min(max(start_page, -(-total // page_size)), max_check)
+            print(f"Всего товаров: {total}, по {page_size} на странице. Последняя страница: {last_page}")
+            return last_page
+
+        # Экспоненциальный поиск верхней границы: несколько кандидатов за раз
+        left, right = start_page, None
+        candidate = start_page
+        while right is None and left < max_check:
+            if cancel is not None and cancel.is_set():
+                print("Поиск последней страницы отменён")
+                return max_check
+            candidates = []
+            while len(candidates) < concurrency and candidate < max_check:
+                candidate = min(candidate * 2, max_check)
+                candidates.append(candidate)
+            if not candidates:
                 break
+            print(f"Проверяем страницы {candidates}...")
+            left, right = self._narrow(self._probe_pages(candidates, concurrency, cancel), left, right)
 
-            time.sleep(1)
+        if right is None:
+            right = max_check
 
-        # Бинарный поиск точной границы
+        # Делим интервал (left, right] равномерно; при concurrency=1 это бинарный поиск
         while left < right:
-            mid = (left + right + 1) // 2
-            print(f"Проверяем страницу {mid} (между {left} и {right})...")
-
-            products = self.parse_page(mid)
-
-            if products:
-                left = mid
-                print(f"Страница {mid} не пустая")
-            else:
-                right = mid - 1
-                print(f"Страница {mid} пустая")
-
-            time.sleep(1)
+            if cancel is not None and cancel.is_set():
+                print("Поиск последней страницы отменён")
+                return max_check
+            parts = min(concurrency, right - left) + 1
+            candidates = sorted({left - (-(right - left) * i // parts) for i in range(1, parts)})
+            print(f"Проверяем страницы {candidates} (между {left} и {right})...")
+            left, right = self._narrow(self._probe_pages(candidates, concurrency, cancel), left, right)
+            if right is None:
+                right = left
 
         print(f"Последняя страница: {left}")
         return left
 
+    @staticmethod
+    def _total_from_response(response: Dict[str, Any]) -> Optional[int]:
+        """Общее число товаров из метаданных ответа, если API его сообщает"""
+        for container in (response.get("data") or {}, response):
+            total = container.get("total")
+            if isinstance(total, int) and total >= 0:
+                return total
+        return None
+
+    @staticmethod
+    def _narrow(results: Dict[int, bool], left: int, right: Optional[int]) -> Tuple[int, Optional[int]]:
+        """Сужает интервал поиска по результатам проверки страниц.
+
+        left - последняя известная непустая страница, right - последняя
+        страница, которая ещё может быть непустой (None - граница не найдена).
+        """
+        for page, has_products in sorted(results.items()):
+            if has_products:
+                left = max(left, page)
+            elif right is None or page - 1 < right:
+                right = page - 1
+        if right is not None and right < left:
+            right = left
+        return left, right
+
+    def _probe_pages(self, pages: List[int], concurrency: int,
+                     cancel: Optional[threading.Event] = None) -> Dict[int, bool]:
+        """Параллельно загружает страницы и возвращает, какие из них не пустые.
+
+        При отмене ожидающие запросы снимаются, а выполняющиеся не ожидаются;
+        результат тогда содержит лишь уже проверенные страницы.
+        """
+        results = {page: bool(self._probed[page]) for page in pages if page in self._probed}
+        pending = [page for page in pages if page not in self._probed]
+        if not pending:
+            return results
+
+        executor = ThreadPoolExecutor(max_workers=min(concurrency, len(pending)))
+        futures = {page: executor.submit(self.http_client.get_json, self.build_url(page), use_cache=self.use_cache)
+                   for page in pending}
+        cancelled = False
+        try:
+            for page, future in futures.items():
+                while cancel is not None and not future.done() and not cancel.is_set():
+                    wait([future], timeout=CANCEL_POLL_INTERVAL)
+                if cancel is not None and cancel.is_set():
+                    cancelled = True
+                    break
+                response = future.result()
+                products = self.parse_response(response)
+                # Неудачный запрос считается пустой страницей, но не сохраняется,
+                # чтобы обход запросил страницу заново
+                if response is not None:
+                    self._probed[page] = products
+                results[page] = bool(products)
+                print(f"Страница {page} {'не пустая' if products else 'пустая'}")
+        finally:
+            executor.shutdown(wait=not cancelled, cancel_futures=True)
+        return results
+
+    def _take_probed(self, page: int) -> Optional[PageProducts]:
+        """Забирает страницу, уже загруженную при поиске последней страницы"""
+        return self._probed.pop(page, None)
+
     def parse_all_pages(self, delay: float = 0.5, skip_errors: bool = True,
-                        max_pages: Optional[int] = None) -> List[Product]:
+                        max_pages: Optional[int] = None,
+                        concurrency: Optional[int] = None,
+                        skip_unchanged: bool = False) -> List[Product]:
         """Парсит все доступные страницы"""
         all_products = []
-        page = 1
+        for products in self.iter_pages(delay, skip_errors, max_pages, concurrency, skip_unchanged):
+            all_products.extend(products)
+        return all_products
+
+    def iter_pages(self, delay: float = 0.5, skip_errors: bool = True,
+                   max_pages: Optional[int] = None,
+                   concurrency: Optional[int] = None,
+                   skip_unchanged: bool = False,
+                   checkpoint: Optional[CrawlCheckpoint] = None) -> Iterator[PageProducts]:
+        """Парсит страницы и отдаёт товары каждой страницы сразу после её получения.
+
+        При skip_unchanged=True страницы проверяются условными запросами:
+        неизменившиеся не разбираются и не отдаются, а попадают в unchanged_pages.
+        С checkpoint сначала повторяются ошибочные страницы прошлого обхода,
+        затем обход продолжается с его курсора; о каждой странице сообщается
+        в контрольную точку.
+        """
+        if concurrency is None:
+            concurrency = self.config.get('max_concurrency', 1)
+        self.unchanged_pages = []
+        self.error_pages = []
+        if checkpoint:
+            yield from self._retry_failed_pages(checkpoint, skip_unchanged)
+        if concurrency > 1:
+            yield from self._iter_pages_concurrent(delay, skip_errors, max_pages, concurrency,
+                                                   skip_unchanged, checkpoint)
+            return
+
+        total_products = 0
+        first_page = page = checkpoint.start_page if checkpoint else 1
         consecutive_errors = 0
         total_errors = 0
         max_consecutive_errors = self.config['max_consecutive_errors']
@@ -140,22 +345,40 @@ class WBParser(BaseParser):
             # Проверяем лимит страниц
             if max_pages and page > max_pages:
                 print(f"Достигнут лимит в {max_pages} страниц, завершаем парсинг")
+                if checkpoint:
+                    checkpoint.finish()
                 break
 
             try:
-                products = self.parse_page(page)
+                products = self._take_probed(page)
+                if products is None:
+                    products = self.parse_page_if_changed(page) if skip_unchanged else self.parse_page(page)
 
-                if not products:
+                if products is None:
+                    consecutive_errors = 0
+                    self.unchanged_pages.append(page)
+                    print(f"Страница {page} не изменилась - пропускаем")
+                    if checkpoint:
+                        checkpoint.page_fetched(page, 0)
+                elif not products:
                     print(f"Страница {page} пуста - завершаем парсинг")
+                    if checkpoint:
+                        checkpoint.finish()
                     break
-
-                consecutive_errors = 0
-                all_products.extend(products)
-                print(f"Найдено {len(products)} товаров на странице {page}")
+                else:
+                    consecutive_errors = 0
+                    total_products += len(products)
+                    print(f"Найдено {len(products)} товаров на странице {page}")
+                    if checkpoint:
+                        checkpoint.page_fetched(page, len(products))
+                    yield products
 
             except Exception as e:
                 consecutive_errors += 1
                 total_errors += 1
+                self.error_pages.append(page)
+                if checkpoint:
+                    checkpoint.page_failed(page)
                 print(f"Ошибка на странице {page} (подряд: {consecutive_errors}): {e}")
 
                 if consecutive_errors >= max_consecutive_errors:
@@ -175,10 +398,304 @@ class WBParser(BaseParser):
             time.sleep(delay_time)
             page += 1
 
-        print(f"Парсинг завершён. Всего собрано {len(all_products)} товаров с {page - 1} страниц")
+        print(f"Парсинг завершён. Всего собрано {total_products} товаров с {page - first_page} страниц")
+        if self.unchanged_pages:
+            print(f"Без изменений: {len(self.unchanged_pages)} страниц")
+        print(f"Всего ошибок: {total_errors}")
+
+    def _retry_failed_pages(self, checkpoint: CrawlCheckpoint, skip_unchanged: bool) -> Iterator[PageProducts]:
+        """Повторно запрашивает страницы, на которых прошлый обход завершился ошибкой"""
+        for page in checkpoint.retry_pages:
+            print(f"Повторяем страницу {page} с ошибкой в прошлом обходе")
+            try:
+                products = self.parse_page_if_changed(page) if skip_unchanged else self.parse_page(page)
+            except Exception as e:
+                print(f"Ошибка на странице {page}: {e}")
+                self.error_pages.append(page)
+                checkpoint.page_failed(page)
+                continue
+            checkpoint.page_fetched(page, len(products or ()))
+            if products:
+                yield products
+
+    def _fetch_page(self, page: int, delay: float, skip_unchanged: bool = False) -> Optional[PageProducts]:
+        """Загружает страницу в рабочем потоке со случайной задержкой"""
+        probed = self._take_probed(page)
+        if probed is not None:
+            return probed
+        time.sleep(random.uniform(0, delay))
+        return self.parse_page_if_changed(page) if skip_unchanged else self.parse_page(page)
+
+    def _iter_pages_concurrent(self, delay: float, skip_errors: bool, max_pages: Optional[int],
+                               concurrency: int, skip_unchanged: bool = False,
+                               checkpoint: Optional[CrawlCheckpoint] = None) -> Iterator[PageProducts]:
+        """Парсит страницы, держа в работе не более concurrency запросов одновременно.
+
+        Результаты обрабатываются строго по порядку страниц, поэтому остановка
+        на первой пустой странице и счётчик ошибок подряд работают так же,
+        как в последовательном режиме.
+        """
+        total_products = 0
+        first_page = page = next_page = checkpoint.start_page if checkpoint else 1
+        consecutive_errors = 0
+        total_errors = 0
+        max_consecutive_errors = self.config['max_consecutive_errors']
+        in_flight: Dict[int, Future] = {}
+
+        if max_pages:
+            print(f"Начинаем параллельный парсинг (максимум {max_pages} страниц, "
+                  f"одновременно {concurrency})...")
+        else:
+            print(f"Начинаем параллельный парсинг (одновременно {concurrency})...")
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            try:
+                while True:
+                    # Дозаполняем окно запросов
+                    while len(in_flight) < concurrency and not (max_pages and next_page > max_pages):
+                        in_flight[next_page] = executor.submit(self._fetch_page, next_page, delay, skip_unchanged)
+                        next_page += 1
+
+                    if page not in in_flight:
+                        print(f"Достигнут лимит в {max_pages} страниц, завершаем парсинг")
+                        if checkpoint:
+                            checkpoint.finish()
+                        break
+
+                    future = in_flight.pop(page)
+                    print(f"Парсим страницу {page}")
+
+                    try:
+                        products = future.result()
+
+                        if products is None:
+                            consecutive_errors = 0
+                            self.unchanged_pages.append(page)
+                            print(f"Страница {page} не изменилась - пропускаем")
+                            if checkpoint:
+                                checkpoint.page_fetched(page, 0)
+                        elif not products:
+                            print(f"Страница {page} пуста - завершаем парсинг")
+                            if checkpoint:
+                                checkpoint.finish()
+                            break
+                        else:
+                            consecutive_errors = 0
+                            total_products += len(products)
+                            print(f"Найдено {len(products)} товаров на странице {page}")
+                            if checkpoint:
+                                checkpoint.page_fetched(page, len(products))
+                            yield products
+
+                    except Exception as e:
+                        consecutive_errors += 1
+                        total_errors += 1
+                        self.error_pages.append(page)
+                        if checkpoint:
+                            checkpoint.page_failed(page)
+                        print(f"Ошибка на странице {page} (подряд: {consecutive_errors}): {e}")
+
+                        if consecutive_errors >= max_consecutive_errors:
+                            print(f"Слишком много ошибок подряд ({consecutive_errors})")
+                            if not skip_errors:
+                                break
+                            consecutive_errors = 0
+                            time.sleep(delay * 3)
+
+                        if skip_errors:
+                            time.sleep(delay * 2)
+                        else:
+                            break
+
+                    page += 1
+            finally:
+                # Отменяем запросы к страницам за пределами найденной границы, в том числе
+                # когда потребитель прекратил обход раньше: иначе пул ждал бы их все
+                for pending in in_flight.values():
+                    pending.cancel()
+
+        print(f"Парсинг завершён. Всего собрано {total_products} товаров с {page - first_page} страниц")
+        if self.unchanged_pages:
+            print(f"Без изменений: {len(self.unchanged_pages)} страниц")
         print(f"Всего ошибок: {total_errors}")
+
+    async def parse_page_async(self, page: int) -> PageProducts:
+        """Асинхронно парсит одну страницу"""
+        if self.async_http_client is None:
+            self.async_http_client = AsyncHTTPClient()
+        url = self.build_url(page)
+        response = await self.async_http_client.get_json(url, use_cache=self.use_cache)
+        return self.parse_response(response)
+
+    async def parse_page_if_changed_async(self, page: int) -> Optional[PageProducts]:
+        """Асинхронно парсит страницу, только если она изменилась, иначе None"""
+        if self.async_http_client is None:
+            self.async_http_client = AsyncHTTPClient()
+        changed, response = await self.async_http_client.get_json_if_changed(self.build_url(page))
+        return self._parse_if_changed(changed, response)
+
+    async def _retry_failed_pages_async(self, checkpoint: CrawlCheckpoint, skip_unchanged: bool,
+                                        cancel: Optional[threading.Event] = None) -> AsyncIterator[PageProducts]:
+        """Асинхронно повторяет страницы, на которых прошлый обход завершился ошибкой"""
+        for page in checkpoint.retry_pages:
+            print(f"Повторяем страницу {page} с ошибкой в прошлом обходе")
+            task = asyncio.ensure_future(self.parse_page_if_changed_async(page) if skip_unchanged
+                                         else self.parse_page_async(page))
+            if not await wait_unless_cancelled(task, cancel):
+                return
+            try:
+                products = await task
+            except Exception as e:
+                print(f"Ошибка на странице {page}: {e}")
+                self.error_pages.append(page)
+                checkpoint.page_failed(page)
+                continue
+            checkpoint.page_fetched(page, len(products or ()))
+            if products:
+                yield products
+
+    async def _fetch_page_async(self, page: int, delay: float,
+                                skip_unchanged: bool = False) -> Optional[PageProducts]:
+        """Загружает страницу в отдельной задаче со случайной задержкой"""
+        probed = self._take_probed(page)
+        if probed is not None:
+            return probed
+        await asyncio.sleep(random.uniform(0, delay))
+        if skip_unchanged:
+            return await self.parse_page_if_changed_async(page)
+        return await self.parse_page_async(page)
+
+    async def parse_all_pages_async(self, delay: float = 0.5, skip_errors: bool = True,
+                                    max_pages: Optional[int] = None,
+                                    concurrency: Optional[int] = None,
+                                    skip_unchanged: bool = False) -> List[Product]:
+        """Асинхронно парсит все доступные страницы"""
+        all_products = []
+        async for products in self.iter_pages_async(delay, skip_errors, max_pages, concurrency, skip_unchanged):
+            all_products.extend(products)
         return all_products
 
+    async def iter_pages_async(self, delay: float = 0.5, skip_errors: bool = True,
+                               max_pages: Optional[int] = None,
+                               concurrency: Optional[int] = None,
+                               skip_unchanged: bool = False,
+                               checkpoint: Optional[CrawlCheckpoint] = None,
+                               cancel: Optional[threading.Event] = None) -> AsyncIterator[PageProducts]:
+        """Асинхронно парсит страницы в общем цикле событий и отдаёт их по одной.
+
+        Семантика совпадает с iter_pages: страницы обрабатываются по
+        порядку, не более concurrency запросов выполняются одновременно.
+        Выставленный флаг cancel останавливает обход, не дожидаясь ответа
+        на текущий запрос, его повторов и пауз ограничителя запросов.
+        """
+        if concurrency is None:
+            concurrency = self.config.get('max_concurrency', 1)
+        concurrency = max(concurrency, 1)
+        self.unchanged_pages = []
+        self.error_pages = []
+        if checkpoint:
+            async for products in self._retry_failed_pages_async(checkpoint, skip_unchanged, cancel):
+                yield products
+        if cancel is not None and cancel.is_set():
+            print("Обход отменён")
+            return
+
+        total_products = 0
+        first_page = page = next_page = checkpoint.start_page if checkpoint else 1
+        consecutive_errors = 0
+        total_errors = 0
+        max_consecutive_errors = self.config['max_consecutive_errors']
+        in_flight: Dict[int, asyncio.Task] = {}
+
+        if max_pages:
+            print(f"Начинаем асинхронный парсинг (максимум {max_pages} страниц, "
+                  f"одновременно {concurrency})...")
+        else:
+            print(f"Начинаем асинхронный парсинг (одновременно {concurrency})...")
+
+        try:
+            while True:
+                # Дозаполняем окно запросов
+                while len(in_flight) < concurrency and not (max_pages and next_page > max_pages):
+                    in_flight[next_page] = asyncio.create_task(
+                        self._fetch_page_async(next_page, delay, skip_unchanged))
+                    next_page += 1
+
+                if page not in in_flight:
+                    print(f"Достигнут лимит в {max_pages} страниц, завершаем парсинг")
+                    if checkpoint:
+                        checkpoint.finish()
+                    break
+
+                task = in_flight.pop(page)
+                print(f"Парсим страницу {page}")
+                if not await wait_unless_cancelled(task, cancel):
+                    print("Обход отменён")
+                    break
+
+                try:
+                    products = await task
+
+                    if products is None:
+                        consecutive_errors = 0
+                        self.unchanged_pages.append(page)
+                        print(f"Страница {page} не изменилась - пропускаем")
+                        if checkpoint:
+                            checkpoint.page_fetched(page, 0)
+                    elif not products:
+                        print(f"Страница {page} пуста - завершаем парсинг")
+                        if checkpoint:
+                            checkpoint.finish()
+                        break
+                    else:
+                        consecutive_errors = 0
+                        total_products += len(products)
+                        print(f"Найдено {len(products)} товаров на странице {page}")
+                        if checkpoint:
+                            checkpoint.page_fetched(page, len(products))
+                        yield products
+
+                except Exception as e:
+                    consecutive_errors += 1
+                    total_errors += 1
+                    self.error_pages.append(page)
+                    if checkpoint:
+                        checkpoint.page_failed(page)
+                    print(f"Ошибка на странице {page} (подряд: {consecutive_errors}): {e}")
+
+                    if consecutive_errors >= max_consecutive_errors:
+                        print(f"Слишком много ошибок подряд ({consecutive_errors})")
+                        if not skip_errors:
+                            break
+                        consecutive_errors = 0
+                        await sleep_unless_cancelled(delay * 3, cancel)
+
+                    if skip_errors:
+                        await sleep_unless_cancelled(delay * 2, cancel)
+                    else:
+                        break
+
+                page += 1
+
+        finally:
+            # Отменяем запросы к страницам за пределами найденной границы
+            for pending in in_flight.values():
+                pending.cancel()
+            if in_flight:
+                await asyncio.gather(*in_flight.values(), return_exceptions=True)
+
+        print(f"Парсинг завершён. Всего собрано {total_products} товаров с {page - first_page} страниц")
+        if self.unchanged_pages:
+            print(f"Без изменений: {len(self.unchanged_pages)} страниц")
+        print(f"Всего ошибок: {total_errors}")
+
     def close(self):
         """Закрывает HTTP клиент"""
-        self.http_client.close()
\ No newline at end of file
+        self.http_client.close()
+
+    async def aclose(self):
+        """Закрывает синхронный и асинхронный HTTP клиенты"""
+        self.close()
+        if self.async_http_client is not None:
+            await self.async_http_client.close()
+            self.async_http_client = None
\ No newline at end of file
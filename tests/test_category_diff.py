@@ -0,0 +1,62 @@
+import copy
+
+from app.utils.category_diff import diff_category_indexes
+from app.utils.category_index import CategoryIndex, compile_index
+
+MENU = [
+    {'id': 1, 'name': 'Женщинам', 'url': '/catalog/zhenshchinam', 'shard': 'women', 'query': 'cat=1',
+     'childs': [
+         {'id': 11, 'name': 'Платья', 'url': '/catalog/zhenshchinam/platya', 'shard': 'women', 'query': 'cat=11'},
+         {'id': 12, 'name': 'Юбки', 'url': '/catalog/zhenshchinam/yubki', 'shard': 'women', 'query': 'cat=12'},
+     ]},
+    {'id': 2, 'name': 'Мужчинам', 'url': '/catalog/muzhchinam', 'shard': 'men', 'query': 'cat=2',
+     'childs': [
+         {'id': 21, 'name': 'Брюки', 'url': '/catalog/muzhchinam/bryuki', 'shard': 'men', 'query': 'cat=21'},
+     ]},
+]
+
+
+def diff(old_menu, new_menu):
+    return diff_category_indexes(CategoryIndex(compile_index(old_menu)), CategoryIndex(compile_index(new_menu)))
+
+
+def test_identical_menus():
+    result = diff(MENU, copy.deepcopy(MENU))
+    assert result.is_empty
+    assert result.summary() == "добавлено 0, удалено 0, изменено 0"
+
+
+def test_added_and_removed():
+    menu = copy.deepcopy(MENU)
+    menu[0]['childs'].pop()
+    menu[1]['childs'].append({'id': 22, 'name': 'Рубашки', 'url': '/catalog/muzhchinam/rubashki',
+                              'shard': 'men', 'query': 'cat=22'})
+    result = diff(MENU, menu)
+    assert result.added == [22]
+    assert result.removed == [12]
+    assert result.changed == []
+    assert not result.reordered
+
+
+def test_renamed_node_is_changed():
+    menu = copy.deepcopy(MENU)
+    menu[0]['childs'][0]['name'] = 'Платья и сарафаны'
+    result = diff(MENU, menu)
+    assert result.changed == [11]
+    assert not (result.added or result.removed)
+
+
+def test_moved_node_is_changed():
+    menu = copy.deepcopy(MENU)
+    menu[1]['childs'].append(menu[0]['childs'].pop())
+    result = diff(MENU, menu)
+    assert result.changed == [12]
+    assert not (result.added or result.removed)
+
+
+def test_reordered_roots():
+    result = diff(MENU, list(reversed(copy.deepcopy(MENU))))
+    assert result.reordered
+    assert not (result.added or result.removed or result.changed)
+    assert not result.is_empty
+    assert result.summary().endswith(", изменён порядок")
@@ -0,0 +1,71 @@
+import pytest
+
+from app.utils.category_index import CategoryIndex, compile_index
+from app.utils.category_search import CategorySearchIndex, normalize_name, url_slug
+
+MENU = [
+    {'id': 10, 'name': 'Электроника', 'url': '/catalog/elektronika', 'shard': 'electronic', 'query': 'cat=10',
+     'childs': [
+         {'id': 12, 'name': 'Смартфоны и гаджеты', 'url': '/catalog/elektronika/smartfony-i-gadzhety',
+          'shard': 'electronic', 'query': 'cat=12'},
+         {'id': 11, 'name': 'Смартфоны', 'url': '/catalog/elektronika/smartfony',
+          'shard': 'electronic', 'query': 'cat=11'},
+         {'id': 13, 'name': 'Телефоны', 'url': '/catalog/elektronika/fony', 'shard': 'electronic', 'query': 'cat=13'},
+     ]},
+    {'id': 5, 'name': 'Ёлки', 'url': '/catalog/elki', 'shard': 'holiday', 'query': 'cat=5'},
+]
+
+
+@pytest.fixture(scope='module')
+def search():
+    return CategorySearchIndex(CategoryIndex(compile_index(MENU)))
+
+
+def ids(search, positions):
+    return [search.index.node_id(pos) for pos in positions]
+
+
+def test_normalization():
+    assert normalize_name('  Ёлки   И  ИГРУШКИ ') == 'елки и игрушки'
+    assert url_slug('https://www.wildberries.ru/catalog/elektronika/smartfony/?sort=popular') == 'smartfony'
+
+
+def test_exact_match_before_prefix(search):
+    assert ids(search, search.search_names('смартфоны')) == [11, 12]
+    assert search.find_by_name('СМАРТФОНЫ') == search.search_names('смартфоны')[0]
+
+
+def test_prefix_before_substring(search):
+    assert ids(search, search.search_names('Смарт')) == [11, 12]
+    # Внутри группы более короткие названия выше
+    assert ids(search, search.search_names('фоны')) == [13, 11, 12]
+
+
+def test_yo_is_normalized(search):
+    assert ids(search, search.search_names('елки')) == [5]
+    assert ids(search, search.search_names('ЁЛ')) == [5, 13]
+
+
+def test_short_and_missing_queries(search):
+    assert ids(search, search.search_names('и')) == [5, 10, 12]
+    assert search.search_names('') == []
+    assert search.search_names('   ') == []
+    assert search.search_names('ноутбуки') == []
+    assert search.find_by_name('ноутбуки') == -1
+
+
+def test_limit(search):
+    assert ids(search, search.search_names('фоны', limit=2)) == [13, 11]
+
+
+def test_match_url_ranking(search):
+    # Точный сегмент, затем содержащие его (короче - выше), затем входящие в него (длиннее - выше)
+    assert ids(search, search.match_url('/catalog/x/smartfony/')) == [11, 12, 13]
+    assert ids(search, search.match_url('smartfony-i-gadzhety?page=2')) == [12, 11, 13]
+    assert ids(search, search.match_url('smart')) == [11, 12]
+
+
+def test_match_url_without_matches(search):
+    assert search.match_url('/catalog/') == []
+    assert search.match_url('') == []
+    assert search.match_url('noutbuki', limit=3) == []
@@ -0,0 +1,128 @@
+import json
+import os
+import time
+
+import pytest
+
+from parsing.crawl_checkpoint import CheckpointStore, CrawlCheckpoint
+from utils.helpers import default_file_mode
+
+
+def test_pages_are_confirmed_in_order_after_write():
+    checkpoint = CrawlCheckpoint('shard', 'query')
+    checkpoint.page_fetched(1, 10)
+    checkpoint.page_fetched(2, 5)
+    assert checkpoint.completed_pages == []
+    assert checkpoint.start_page == 1
+
+    checkpoint.rows_written(12)
+    assert checkpoint.completed_pages == [1]
+    assert checkpoint.start_page == 2
+
+    checkpoint.rows_written(15)
+    assert checkpoint.completed_pages == [1, 2]
+    assert checkpoint.last_page == 2
+
+
+def test_failed_page_is_retried_until_fetched():
+    checkpoint = CrawlCheckpoint('shard', 'query')
+    checkpoint.page_fetched(1, 3)
+    checkpoint.page_failed(2)
+    checkpoint.page_fetched(3, 2)
+    checkpoint.rows_written(3)
+    # Ошибочная страница подтверждается вместе с предыдущей, но не раньше её
+    assert checkpoint.error_pages == [2]
+    assert checkpoint.last_page == 2
+
+    checkpoint.rows_written(5)
+    assert checkpoint.retry_pages == [2]
+    assert checkpoint.start_page == 4
+
+    checkpoint.page_fetched(2, 1)
+    checkpoint.rows_written(6)
+    assert checkpoint.retry_pages == []
+    assert sorted(checkpoint.completed_pages) == [1, 2, 3]
+
+
+def test_round_trip():
+    checkpoint = CrawlCheckpoint('shard', 'query', completed_pages=[1, 3], error_pages=[2],
+                                 last_page=3, finished=True, updated_at=123.0)
+    assert CrawlCheckpoint.from_dict(json.loads(json.dumps(checkpoint.to_dict()))) == checkpoint
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CheckpointStore(directory=str(tmp_path), max_age_hours=1)
+
+
+def test_new_crawl_is_not_resumed(store):
+    checkpoint, resumed = store.resume_or_start('shard', 'query')
+    assert not resumed
+    assert checkpoint.start_page == 1
+    assert store.load('shard', 'query') is not None
+
+
+def test_unfinished_crawl_is_resumed(store):
+    checkpoint, _ = store.resume_or_start('shard', 'query')
+    checkpoint.page_fetched(1, 4)
+    checkpoint.rows_written(4)
+    store.save(checkpoint)
+
+    resumed_checkpoint, resumed = store.resume_or_start('shard', 'query')
+    assert resumed
+    assert resumed_checkpoint.start_page == 2
+    assert store.resume_or_start('other', 'query')[1] is False
+
+
+def test_finished_crawl_starts_over(store):
+    checkpoint, _ = store.resume_or_start('shard', 'query')
+    checkpoint.page_fetched(1, 4)
+    checkpoint.rows_written(4)
+    checkpoint.finish()
+    store.save(checkpoint)
+
+    checkpoint, resumed = store.resume_or_start('shard', 'query')
+    assert not resumed
+    assert checkpoint.start_page == 1
+
+
+def test_finished_crawl_with_errors_is_resumed(store):
+    checkpoint, _ = store.resume_or_start('shard', 'query')
+    checkpoint.page_failed(1)
+    checkpoint.finish()
+    store.save(checkpoint)
+
+    checkpoint, resumed = store.resume_or_start('shard', 'query')
+    assert resumed
+    assert not checkpoint.finished
+    assert checkpoint.retry_pages == [1]
+
+
+def test_stale_crawl_starts_over(store):
+    checkpoint = CrawlCheckpoint('shard', 'query', last_page=5, updated_at=time.time() - 2 * 3600)
+    with open(store._path('shard', 'query'), 'w', encoding='utf-8') as f:
+        json.dump(checkpoint.to_dict(), f)
+
+    checkpoint, resumed = store.resume_or_start('shard', 'query')
+    assert not resumed
+    assert checkpoint.start_page == 1
+
+
+def test_corrupted_checkpoint_starts_over(store):
+    with open(store._path('shard', 'query'), 'w', encoding='utf-8') as f:
+        f.write('{')
+    assert store.resume_or_start('shard', 'query')[1] is False
+
+
+def test_delete(store):
+    store.resume_or_start('shard', 'query')
+    store.delete('shard', 'query')
+    store.delete('shard', 'query')
+    assert store.load('shard', 'query') is None
+
+
+@pytest.mark.skipif(os.name != 'posix', reason="права файлов проверяются только в POSIX")
+def test_saved_file_uses_umask(store):
+    checkpoint, _ = store.resume_or_start('shard', 'query')
+    assert os.stat(store._path('shard', 'query')).st_mode & 0o777 == default_file_mode()
+    assert os.listdir(store.directory) == [os.path.basename(store._path('shard', 'query'))]
@@ -0,0 +1,69 @@
+from psycopg2 import sql
+from database.schema import KEY_COLUMNS, SchemaCache
+
+PRODUCT_COLUMNS = ('id', 'name', 'price_no_discounts', 'price_with_discount', 'rating', 'number_of_reviews',
+                   'shard', 'query_params', 'product_id', 'created_at', 'updated_at')
+
+
+def render(query: sql.Composable) -> str:
+    """Текст запроса без соединения с базой (идентификаторы в двойных кавычках)"""
+    if isinstance(query, sql.Composed):
+        return ''.join(render(part) for part in query.seq)
+    if isinstance(query, sql.Identifier):
+        return '.'.join(f'"{name}"' for name in query.strings)
+    if isinstance(query, sql.SQL):
+        return query.string
+    raise TypeError(f"Неожиданная часть запроса: {query!r}")
+
+
+def build(columns=PRODUCT_COLUMNS):
+    return SchemaCache._build_product_schema('wb_products', columns)
+
+
+def test_upsert_requires_all_key_columns():
+    assert build().upsert is not None
+    for key in KEY_COLUMNS:
+        assert build(tuple(c for c in PRODUCT_COLUMNS if c != key)).upsert is None
+
+
+def test_update_matches_full_key_and_keeps_category():
+    update = render(build().upsert.update)
+    assert 'DISTINCT ON ("product_id", "shard", "query_params")' in update
+    for key in KEY_COLUMNS:
+        assert f'"t"."{key}" = "s"."{key}"' in update
+
+    assignments = update.split(' SET ', 1)[1].split(' FROM ', 1)[0]
+    for key in KEY_COLUMNS:
+        assert f'"{key}" =' not in assignments
+    assert '"price_with_discount" = s."price_with_discount"' in assignments
+    assert 'updated_at = CURRENT_TIMESTAMP' in assignments
+
+
+def test_update_skips_unchanged_rows():
+    update = render(build().upsert.update)
+    assert 'IS DISTINCT FROM' in update
+    current = update.rsplit(' AND (', 1)[1].split(') IS DISTINCT FROM', 1)[0]
+    for key in KEY_COLUMNS:
+        assert f'"{key}"' not in current
+
+
+def test_insert_conflicts_on_full_key():
+    insert = render(build().upsert.insert)
+    assert insert.endswith('ON CONFLICT ("product_id", "shard", "query_params") DO NOTHING')
+    assert ('WHERE NOT EXISTS (SELECT 1 FROM "wb_products" AS t WHERE "t"."product_id" = "s"."product_id" '
+            'AND "t"."shard" = "s"."shard" AND "t"."query_params" = "s"."query_params")') in insert
+
+
+def test_rows_without_full_key_are_inserted_as_is():
+    upsert = build().upsert
+    assert render(upsert.insert_unkeyed).endswith(
+        'WHERE "product_id" IS NULL OR "shard" IS NULL OR "query_params" IS NULL')
+    assert 'WHERE "product_id" IS NOT NULL AND "shard" IS NOT NULL AND "query_params" IS NOT NULL' in render(
+        upsert.insert)
+
+
+def test_legacy_price_column_is_written():
+    columns = tuple('price_witch_discount' if c == 'price_with_discount' else c for c in PRODUCT_COLUMNS)
+    schema = build(columns)
+    assert schema.is_legacy
+    assert '"price_witch_discount"' in render(schema.upsert.copy)
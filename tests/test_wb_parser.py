@@ -0,0 +1,91 @@
+import asyncio
+import threading
+
+import pytest
+
+from parsing.wb_parser import WBParser
+
+PAGE_SIZE = 3
+
+
+def product(product_id):
+    return {'id': product_id, 'name': f'Товар {product_id}', 'rating': 5, 'nmFeedbacks': 1,
+            'sizes': [{'price': {'basic': 10000, 'product': 9000}}]}
+
+
+def make_parser(last_page, total=None, fail=()):
+    """Парсер, который вместо запросов к API отдаёт last_page страниц по PAGE_SIZE товаров"""
+    parser = WBParser('electronic', 'cat=1')
+    requested = []
+
+    def get_json(url, use_cache=True):
+        page = int(url.rsplit('page=', 1)[1])
+        requested.append(page)
+        if page in fail:
+            return None
+        count = PAGE_SIZE if page <= last_page else 0
+        data = {'products': [product(page * 100 + i) for i in range(count)]}
+        if total is not None:
+            data['total'] = total
+        return {'data': data}
+
+    parser.http_client.get_json = get_json
+    return parser, requested
+
+
+@pytest.mark.parametrize('total, expected', [(7, 3), (9, 3), (1, 1), (10_000, 50)])
+def test_last_page_from_total(total, expected):
+    parser, requested = make_parser(last_page=1, total=total)
+    assert parser.find_last_page(max_check=50) == expected
+    assert requested == [1]
+
+
+@pytest.mark.parametrize('concurrency', [1, 4])
+@pytest.mark.parametrize('last_page', [1, 2, 7, 16, 37, 100])
+def test_last_page_search(last_page, concurrency):
+    parser, requested = make_parser(last_page)
+    assert parser.find_last_page(max_check=100, concurrency=concurrency) == last_page
+    assert len(requested) == len(set(requested))
+
+
+def test_last_page_search_from_start_page():
+    parser, _ = make_parser(last_page=23)
+    assert parser.find_last_page(start_page=10, max_check=100, concurrency=2) == 23
+
+
+def test_empty_first_page():
+    parser, _ = make_parser(last_page=0)
+    assert parser.find_last_page(max_check=100) == 1
+
+
+def test_failed_first_page_returns_max_check():
+    parser, requested = make_parser(last_page=5, fail={1})
+    assert parser.find_last_page(max_check=100) == 100
+    assert requested == [1]
+
+
+def test_cancelled_search_returns_max_check():
+    parser, requested = make_parser(last_page=5)
+    cancel = threading.Event()
+    cancel.set()
+    assert parser.find_last_page(max_check=100, concurrency=4, cancel=cancel) == 100
+    assert requested == [1]
+
+
+def test_probed_pages_are_reused():
+    parser, requested = make_parser(last_page=3)
+    assert parser.find_last_page(max_check=100, concurrency=1) == 3
+    fetched = []
+
+    async def parse_page_async(page):
+        fetched.append(page)
+        return parser.parse_response(parser.http_client.get_json(parser.build_url(page)))
+
+    parser.parse_page_async = parse_page_async
+
+    async def crawl():
+        return [products async for products in parser.iter_pages_async(delay=0, concurrency=1)]
+
+    pages = asyncio.run(crawl())
+    assert [products[0].product_id // 100 for products in pages] == [1, 2, 3]
+    assert 1 not in fetched
@@ -0,0 +1,116 @@
+import asyncio
+import random
+from typing import Optional, Dict, Any, Tuple
+import httpx
+from config.settings import Config
+from utils.rate_limiter import rate_limiter
+from utils.response_cache import get_response_cache
+from utils import json_codec
+
+
+class AsyncHTTPClient:
+    """Асинхронный HTTP клиент с той же логикой повторов, что и HTTPClient"""
+
+    def __init__(self, headers: Optional[Dict[str, str]] = None):
+        self.config = Config.PARSER_CONFIG
+        self.client = httpx.AsyncClient(
+            headers=headers or Config.DEFAULT_HEADERS,
+            timeout=self.config['timeout']
+        )
+
+    async def get_json(self, url: str, retries: Optional[int] = None,
+                       use_cache: bool = True) -> Optional[Dict[str, Any]]:
+        """Выполняет GET запрос и возвращает JSON.
+
+        Ответы берутся из дискового кэша, пока не истёк их TTL, а устаревшие
+        проверяются условным запросом; use_cache=False выполняет запрос в обход кэша.
+        """
+        _, data = await self._fetch_json(url, retries, use_cache)
+        return data
+
+    async def get_json_if_changed(self, url: str,
+                                  retries: Optional[int] = None) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """Проверяет страницу условным запросом, даже если кэш ещё свежий.
+
+        Возвращает (False, JSON), если сервер ответил 304 или прислал то же
+        содержимое, что сохранено в кэше, иначе (True, JSON).
+        """
+        return await self._fetch_json(url, retries, use_cache=True, revalidate=True)
+
+    async def _fetch_json(self, url: str, retries: Optional[int], use_cache: bool,
+                          revalidate: bool = False) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """Запрос с учётом кэша: возвращает признак изменения и JSON"""
+        if retries is None:
+            retries = self.config['retries']
+
+        cache = get_response_cache() if use_cache else None
+        # Кэш - синхронный SQLite, поэтому обращения к нему выполняются в потоке,
+        # не блокируя цикл событий
+        cached = await asyncio.to_thread(cache.lookup, url) if cache else None
+        if cached and cached.fresh and not revalidate:
+            data = await self._decode_cached(cache, url, cached)
+            if data is not None:
+                return False, data
+            cached = None
+        headers = cached.conditional_headers() if cached else {}
+
+        for attempt in range(retries):
+            try:
+                await rate_limiter.acquire_async(url)
+                response = await self.client.get(url, headers=headers)
+
+                if response.status_code == 200:
+                    rate_limiter.report_success(url)
+                    # Тело разбирается один раз прямо из байтов, без декодирования в строку
+                    body = response.content
+                    if body.strip():
+                        data = json_codec.loads(body)
+                        changed = (await asyncio.to_thread(cache.update, url, body, response.headers, cached)
+                                   if cache else True)
+                        return changed, data
+                    else:
+                        print(f"Пустой ответ, попытка {attempt + 1}")
+                elif response.status_code == 304 and cached:
+                    rate_limiter.report_success(url)
+                    data = await self._decode_cached(cache, url, cached)
+                    if data is not None:
+                        await asyncio.to_thread(cache.refresh, url, response.headers)
+                        return False, data
+                    # Сохранённое тело непригодно - запрашиваем страницу заново без валидаторов
+                    cached, headers = None, {}
+                    continue
+                elif response.status_code == 429:
+                    wait = rate_limiter.report_rate_limited(url, response.headers.get('Retry-After'))
+                    print(f"Слишком много запросов, ждём {wait:.0f} с...")
+                    # Паузу выдержит общий ограничитель перед следующим запросом
+                    continue
+                else:
+                    print(f"HTTP {response.status_code}, попытка {attempt + 1}")
+
+            except httpx.TimeoutException:
+                print(f"Таймаут, попытка {attempt + 1}")
+            except json_codec.JSONDecodeError:
+                print(f"Некорректный JSON, попытка {attempt + 1}")
+            except Exception as e:
+                print(f"Ошибка запроса, попытка {attempt + 1}: {e}")
+
+            # Ждём перед повторной попыткой
+            if attempt < retries - 1:
+                delay_range = self.config['delay_range']
+                await asyncio.sleep(random.uniform(delay_range[0], delay_range[1]))
+
+        return True, None
+
+    @staticmethod
+    async def _decode_cached(cache, url: str, cached) -> Optional[Dict[str, Any]]:
+        """Разбирает тело из кэша; повреждённая запись удаляется, и возвращается None"""
+        try:
+            return json_codec.loads(cached.body)
+        except (json_codec.JSONDecodeError, ValueError):
+            print(f"Некорректный JSON в кэше, запись удалена: {url}")
+            await asyncio.to_thread(cache.delete, url)
+            return None
+
+    async def close(self):
+        """Закрывает сессию"""
+        await self.client.aclose()
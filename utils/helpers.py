@@ -0,0 +1,15 @@
+import functools
+import os
+
+
+@functools.lru_cache(maxsize=None)
+def default_file_mode() -> int:
+    """Права нового файла по umask процесса, как у open().
+
+    tempfile.mkstemp создаёт файлы с правами 0600, и os.replace их сохраняет;
+    файлы, которые читают другие пользователи, нужно привести к этим правам.
+    Значение считается один раз: чтение umask ненадолго её меняет.
+    """
+    mask = os.umask(0)
+    os.umask(mask)
+    return 0o666 & ~mask
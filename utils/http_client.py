@@ -1,8 +1,11 @@
 import requests
 import time
 import random
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from config.settings import Config
+from utils.rate_limiter import rate_limiter
+from utils.response_cache import get_response_cache
+from utils import json_codec
 
 
 class HTTPClient:
@@ -18,29 +21,75 @@ class HTTPClient:
         else:
             self.session.headers.update(Config.DEFAULT_HEADERS)
 
-    def get_json(self, url: str, retries: Optional[int] = None) -> Optional[Dict[str, Any]]:
-        """Выполняет GET запрос и возвращает JSON"""
+    def get_json(self, url: str, retries: Optional[int] = None,
+                 use_cache: bool = True) -> Optional[Dict[str, Any]]:
+        """Выполняет GET запрос и возвращает JSON.
+
+        Ответы берутся из дискового кэша, пока не истёк их TTL, а устаревшие
+        проверяются условным запросом; use_cache=False выполняет запрос в обход кэша.
+        """
+        _, data = self._fetch_json(url, retries, use_cache)
+        return data
+
+    def get_json_if_changed(self, url: str,
+                            retries: Optional[int] = None) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """Проверяет страницу условным запросом, даже если кэш ещё свежий.
+
+        Возвращает (False, JSON), если сервер ответил 304 или прислал то же
+        содержимое, что сохранено в кэше, иначе (True, JSON).
+        """
+        return self._fetch_json(url, retries, use_cache=True, revalidate=True)
+
+    def _fetch_json(self, url: str, retries: Optional[int], use_cache: bool,
+                    revalidate: bool = False) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """Запрос с учётом кэша: возвращает признак изменения и JSON"""
         if retries is None:
             retries = self.config['retries']
 
+        cache = get_response_cache() if use_cache else None
+        cached = cache.lookup(url) if cache else None
+        if cached and cached.fresh and not revalidate:
+            data = self._decode_cached(cache, url, cached)
+            if data is not None:
+                return False, data
+            cached = None
+        headers = cached.conditional_headers() if cached else {}
+
         for attempt in range(retries):
             try:
-                response = self.session.get(url, timeout=self.config['timeout'])
+                rate_limiter.acquire(url)
+                response = self.session.get(url, headers=headers, timeout=self.config['timeout'])
 
                 if response.status_code == 200:
-                    if response.text.strip():
-                        return response.json()
+                    rate_limiter.report_success(url)
+                    # Тело разбирается один раз прямо из байтов, без декодирования в строку
+                    body = response.content
+                    if body.strip():
+                        data = json_codec.loads(body)
+                        changed = cache.update(url, body, response.headers, cached) if cache else True
+                        return changed, data
                     else:
                         print(f"Пустой ответ, попытка {attempt + 1}")
+                elif response.status_code == 304 and cached:
+                    rate_limiter.report_success(url)
+                    data = self._decode_cached(cache, url, cached)
+                    if data is not None:
+                        cache.refresh(url, response.headers)
+                        return False, data
+                    # Сохранённое тело непригодно - запрашиваем страницу заново без валидаторов
+                    cached, headers = None, {}
+                    continue
                 elif response.status_code == 429:
-                    print("Слишком много запросов, ждём...")
-                    time.sleep(self.config['rate_limit_delay'])
+                    wait = rate_limiter.report_rate_limited(url, response.headers.get('Retry-After'))
+                    print(f"Слишком много запросов, ждём {wait:.0f} с...")
+                    # Паузу выдержит общий ограничитель перед следующим запросом
+                    continue
                 else:
                     print(f"HTTP {response.status_code}, попытка {attempt + 1}")
 
             except requests.exceptions.Timeout:
                 print(f"Таймаут, попытка {attempt + 1}")
-            except requests.exceptions.JSONDecodeError:
+            except json_codec.JSONDecodeError:
                 print(f"Некорректный JSON, попытка {attempt + 1}")
             except Exception as e:
                 print(f"Ошибка запроса, попытка {attempt + 1}: {e}")
@@ -50,7 +99,17 @@ class HTTPClient:
                 delay_range = self.config['delay_range']
                 time.sleep(random.uniform(delay_range[0], delay_range[1]))
 
-        return None
+        return True, None
+
+    @staticmethod
+    def _decode_cached(cache, url: str, cached) -> Optional[Dict[str, Any]]:
+        """Разбирает тело из кэша; повреждённая запись удаляется, и возвращается None"""
+        try:
+            return json_codec.loads(cached.body)
+        except (json_codec.JSONDecodeError, ValueError):
+            print(f"Некорректный JSON в кэше, запись удалена: {url}")
+            cache.delete(url)
+            return None
 
     def close(self):
         """Закрывает сессию"""
@@ -0,0 +1,18 @@
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен: без него используется стандартный json
+    orjson = None
+
+# Ошибка разбора для обоих вариантов: orjson.JSONDecodeError наследует json.JSONDecodeError
+JSONDecodeError = json.JSONDecodeError
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+
+def loads(data: Union[bytes, bytearray, str]) -> Any:
+    """Разбирает JSON прямо из байтов ответа, без промежуточной строки"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -0,0 +1,134 @@
+import asyncio
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Optional, Dict
+from urllib.parse import urlparse
+from config.settings import Config
+
+
+class TokenBucket:
+    """Адаптивное ведро токенов для одного хоста.
+
+    Скорость растёт понемногу после каждого успешного ответа и уменьшается
+    в несколько раз при ответе 429 (AIMD). Retry-After блокирует выдачу
+    токенов всем клиентам хоста до указанного момента.
+    """
+
+    def __init__(self, rate: float, capacity: float, min_rate: float, max_rate: float,
+                 increase_step: float, decrease_factor: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.tokens = capacity
+        self.last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        """Начисляет токены за прошедшее время"""
+        if now > self.last:
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+
+    def reserve(self) -> float:
+        """Забирает токен и возвращает, сколько секунд нужно подождать перед запросом"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            # last уходит в будущее, пока действует блокировка по Retry-After
+            wait = max(0.0, self.last - now)
+            if self.tokens < 0:
+                wait += -self.tokens / self.rate
+            return wait
+
+    def on_success(self) -> None:
+        """Плавно увеличивает скорость после успешного ответа"""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def on_rate_limited(self, retry_after: float) -> None:
+        """Снижает скорость и блокирует выдачу токенов на retry_after секунд"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            blocked_until = now + retry_after
+            # Одновременные 429 от уже отправленных запросов снижают скорость только один раз
+            if self.last <= now:
+                self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            self.tokens = min(self.tokens, 0.0)
+            self.last = max(self.last, blocked_until)
+
+
+class RateLimiter:
+    """Общий для процесса ограничитель запросов с отдельным ведром на каждый хост"""
+
+    def __init__(self, config: Optional[Dict[str, float]] = None):
+        self.config = config or Config.RATE_LIMIT_CONFIG
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def get_bucket(self, url: str) -> TokenBucket:
+        """Возвращает ведро токенов для хоста из URL"""
+        host = urlparse(url).netloc
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(
+                    rate=self.config['requests_per_second'],
+                    capacity=self.config['burst'],
+                    min_rate=self.config['min_rate'],
+                    max_rate=self.config['max_rate'],
+                    increase_step=self.config['increase_step'],
+                    decrease_factor=self.config['decrease_factor']
+                )
+                self._buckets[host] = bucket
+            return bucket
+
+    def acquire(self, url: str) -> None:
+        """Блокирует поток до получения разрешения на запрос"""
+        wait = self.get_bucket(url).reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, url: str) -> None:
+        """Ожидает разрешения на запрос, не блокируя цикл событий"""
+        wait = self.get_bucket(url).reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def report_success(self, url: str) -> None:
+        """Сообщает об успешном ответе сервера"""
+        self.get_bucket(url).on_success()
+
+    def report_rate_limited(self, url: str, retry_after: Optional[str] = None) -> float:
+        """Сообщает об ответе 429 и возвращает время ожидания в секундах"""
+        delay = self.parse_retry_after(retry_after)
+        if delay is None:
+            delay = Config.PARSER_CONFIG['rate_limit_delay']
+        self.get_bucket(url).on_rate_limited(delay)
+        return delay
+
+    @staticmethod
+    def parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """Разбирает заголовок Retry-After (секунды или HTTP-дата)"""
+        if not value:
+            return None
+        value = value.strip()
+        if value.isdigit():
+            return float(value)
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+# Единый ограничитель для всех HTTP клиентов процесса
+rate_limiter = RateLimiter()
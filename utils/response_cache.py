@@ -0,0 +1,246 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, Mapping, List, Tuple
+from urllib.parse import urlsplit, parse_qsl, urlencode
+from config.settings import Config
+
+
+def normalize_url(url: str) -> str:
+    """Приводит URL к каноническому виду: регистр хоста, порядок параметров"""
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return f"{parts.scheme.lower()}://{parts.netloc.lower()}{parts.path}?{query}"
+
+
+def content_hash(body: bytes) -> str:
+    """Хэш тела ответа для сравнения версий страницы"""
+    return hashlib.sha256(body).hexdigest()
+
+
+@dataclass
+class CachedResponse:
+    """Сохранённый ответ вместе с валидаторами для условного запроса"""
+    body: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content_hash: Optional[str]
+    fresh: bool  # TTL ещё не истёк
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Заголовки If-None-Match / If-Modified-Since для повторной проверки"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """Дисковый кэш ответов API с TTL по адресам и вытеснением LRU.
+
+    Тела ответов хранятся сжатыми (zlib) в SQLite-файле. Общий размер
+    ограничен max_size_mb: при превышении удаляются давно не читавшиеся записи.
+    Устаревшие записи не удаляются сразу: их валидаторы (ETag, Last-Modified,
+    хэш содержимого) позволяют проверить страницу условным запросом.
+    Время последнего доступа копится в памяти и записывается пачками,
+    чтобы чтение из кэша не превращалось в запись в SQLite.
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        self.config = config or Config.CACHE_CONFIG
+        self.max_size = int(self.config['max_size_mb'] * 1024 * 1024)
+        path = self.config['path']
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._touched: Dict[str, float] = {}  # Ключ -> время доступа, ещё не записанное в базу
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+                           CREATE TABLE IF NOT EXISTS responses (
+                               key TEXT PRIMARY KEY,
+                               body BLOB NOT NULL,
+                               size INTEGER NOT NULL,
+                               expires_at REAL NOT NULL,
+                               last_access REAL NOT NULL
+                           )""")
+        # Кэш, созданный до появления валидаторов, дополняем колонками
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(responses)")}
+        for column in ('etag', 'last_modified', 'content_hash'):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE responses ADD COLUMN {column} TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._conn.commit()
+        self._total_size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def ttl_for(self, url: str) -> float:
+        """TTL для адреса: самое длинное подходящее правило из настроек"""
+        parts = urlsplit(url)
+        target = f"{parts.netloc.lower()}{parts.path}"
+        best_prefix, ttl = '', self.config['default_ttl']
+        for prefix, prefix_ttl in self.config['ttl'].items():
+            if target.startswith(prefix) and len(prefix) > len(best_prefix):
+                best_prefix, ttl = prefix, prefix_ttl
+        return ttl
+
+    def lookup(self, url: str) -> Optional[CachedResponse]:
+        """Возвращает сохранённый ответ, в том числе устаревший"""
+        key = normalize_url(url)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, expires_at, etag, last_modified, content_hash FROM responses WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            body, expires_at, etag, last_modified, stored_hash = row
+            try:
+                body = zlib.decompress(body)
+            except zlib.error:
+                print(f"Повреждённая запись кэша удалена: {key}")
+                self._delete(key)
+                self._conn.commit()
+                return None
+            self._touched[key] = now
+            if len(self._touched) >= self.config['touch_batch']:
+                self._flush_touched()
+        return CachedResponse(body, etag, last_modified, stored_hash, expires_at > now)
+
+    def get(self, url: str) -> Optional[bytes]:
+        """Возвращает тело ответа из кэша, если оно есть и не устарело"""
+        cached = self.lookup(url)
+        return cached.body if cached and cached.fresh else None
+
+    def set(self, url: str, body: bytes, headers: Optional[Mapping[str, str]] = None) -> None:
+        """Сохраняет тело ответа и его валидаторы, если для адреса задан TTL"""
+        ttl = self.ttl_for(url)
+        if ttl <= 0:
+            return
+
+        key = normalize_url(url)
+        compressed = zlib.compress(body, self.config['compression_level'])
+        if len(compressed) > self.max_size:
+            return
+
+        headers = headers or {}
+        now = time.time()
+        with self._lock:
+            self._delete(key)
+            self._conn.execute(
+                "INSERT INTO responses (key, body, size, expires_at, last_access, etag, last_modified, content_hash) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, compressed, len(compressed), now + ttl, now,
+                 headers.get('ETag'), headers.get('Last-Modified'), content_hash(body))
+            )
+            self._total_size += len(compressed)
+            self._flush_touched()
+            self._evict(now)
+            self._conn.commit()
+
+    def refresh(self, url: str, headers: Optional[Mapping[str, str]] = None) -> None:
+        """Продлевает TTL записи, подтверждённой сервером (304 или тот же хэш)"""
+        headers = headers or {}
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE responses SET expires_at = ?, last_access = ?, "
+                "etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified) WHERE key = ?",
+                (now + self.ttl_for(url), now, headers.get('ETag'), headers.get('Last-Modified'),
+                 normalize_url(url))
+            )
+            self._conn.commit()
+
+    def update(self, url: str, body: bytes, headers: Optional[Mapping[str, str]] = None,
+               cached: Optional[CachedResponse] = None) -> bool:
+        """Сохраняет новый ответ и возвращает True, если содержимое изменилось"""
+        if cached is not None and cached.content_hash == content_hash(body):
+            self.refresh(url, headers)
+            return False
+        self.set(url, body, headers)
+        return True
+
+    def recorded(self, prefix: str = '') -> List[Tuple[str, bytes]]:
+        """Сохранённые ответы (URL, тело), чьи адреса начинаются с prefix"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, body FROM responses WHERE substr(key, 1, ?) = ? ORDER BY key", (len(prefix), prefix)
+            ).fetchall()
+        return [(key, zlib.decompress(body)) for key, body in rows]
+
+    def delete(self, url: str) -> None:
+        """Удаляет запись (например, с непригодным для разбора телом)"""
+        key = normalize_url(url)
+        with self._lock:
+            self._touched.pop(key, None)
+            self._delete(key)
+            self._conn.commit()
+
+    def clear(self) -> None:
+        """Очищает кэш"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._touched.clear()
+            self._total_size = 0
+
+    def _flush_touched(self) -> None:
+        """Записывает накопленные времена доступа (вызывается под блокировкой)"""
+        if not self._touched:
+            return
+        self._conn.executemany("UPDATE responses SET last_access = ? WHERE key = ?",
+                               [(accessed, key) for key, accessed in self._touched.items()])
+        self._touched.clear()
+        self._conn.commit()
+
+    def _delete(self, key: str) -> None:
+        row = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        if row:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._total_size -= row[0]
+
+    def _evict(self, now: float) -> None:
+        """Удаляет устаревшие записи, затем самые давно читавшиеся до нужного размера"""
+        if self._total_size <= self.max_size:
+            return
+        self._conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        self._total_size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+        cursor = self._conn.execute("SELECT key, size FROM responses ORDER BY last_access")
+        to_delete = []
+        while self._total_size > self.max_size:
+            row = cursor.fetchone()
+            if row is None:
+                break
+            to_delete.append((row[0],))
+            self._total_size -= row[1]
+        cursor.close()
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", to_delete)
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_touched()
+            self._conn.close()
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Общий для процесса кэш ответов или None, если кэш отключён"""
+    global _response_cache
+    if not Config.CACHE_CONFIG['enabled']:
+        return None
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = ResponseCache()
+    return _response_cache